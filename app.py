@@ -1,23 +1,55 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, abort, Response, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from config import config
 from models import db
 from models.user import User
 from models.question import Question
-from models.wrong_question import WrongQuestion
 from models.paper import Paper
-from services.llm_service import generate_questions_from_material
-from services.pdf_service import generate_paper_pdf, generate_wrong_pdf
+from models.generation_job import GenerationJob
+from models.export_job import ExportJob
+from models.routing import replica_reads, record_write
+from services.job_service import init_job_queue, submit_generation_job, JobLimitExceeded
+from services.export_job_service import init_export_jobs, submit_wrong_export, is_stale
+from services.ingest_service import ingest_material, IngestError
+from services.cache_service import generation_cache_stats
+from services.question_service import query_question_page, QUESTION_TYPES
+from services.grading_service import get_submitted_answer, submit_attempt
+from services.rating_service import rate_questions
+from services.dedup_service import dedupe_question_bank
+from services.search_service import search_questions, rebuild_search_index
+from services.transfer_service import iter_questions_jsonl, import_questions_jsonl
+from services.content_cache import get_paper_view, content_cache_stats
+from services.metrics_service import init_metrics
+from services.llm_gateway import get_gateway
+from services.assembly_service import assemble_paper, AssemblyError
+from services.review_service import (get_due_reviews, count_due_reviews, submit_review, create_review_paper,
+                                     query_wrong_page, load_wrong_export)
+from services.stats_service import get_user_dashboard
+from migrations import upgrade
+from services.pdf_service import export_paper_pdf, export_wrong_book, PDFExportError, RENDER_OPTIONS
+from services.export_cache import paper_export_key, wrong_export_key, get_cached_export, store_export
+from datetime import datetime, timedelta
+from io import BytesIO
+import click
 import json
 import os
-import chardet
+import time
 
 # 初始化Flask应用
 app = Flask(__name__)
-app.config.from_object(config['default'])  # 加载配置
+app.config.from_object(config[os.getenv('APP_CONFIG', 'default')])  # 加载配置
 
-# 初始化数据库
+# 初始化数据库（配置了只读副本时，写入后短时间内该用户的只读页面读主库）
 db.init_app(app)
+app.after_request(record_write)
+
+# 运行指标（METRICS_ENABLED=True时注册请求/SQL钩子和/metrics）
+init_metrics(app, db)
+
+# 初始化后台出题任务队列和后台导出任务
+init_job_queue(app)
+init_export_jobs(app)
 
 # 初始化登录管理
 login_manager = LoginManager()
@@ -29,10 +61,62 @@ login_manager.login_view = 'login'  # 未登录时跳转的页面
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-# 创建数据库表（首次运行时执行）
-with app.app_context():
-    db.create_all()  # 若已手动创建表，注释此行
-    pass
+# 创建数据库表/执行迁移：部署时运行一次 flask --app app init-db，导入应用时不再访问数据库
+@app.cli.command('init-db')
+def init_db():
+    db.create_all(bind_key=None)  # 只在主库上创建不存在的表
+    for version in upgrade():  # 执行已有表的结构变更
+        print(f'已执行迁移：{version}')
+    print('数据库已是最新结构')
+
+@app.cli.command('dedupe-questions')
+def dedupe_questions():
+    # 为已有题目补建SimHash指纹，并把近似重复的题目标记为重复（不删除）
+    indexed, marked = dedupe_question_bank()
+    print(f'补建指纹：{indexed} 道，标记重复：{marked} 道')
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    # 重建SQLite的全文检索表（MySQL的FULLTEXT索引由数据库自动维护）
+    print(f'已索引：{rebuild_search_index()} 道')
+
+@app.cli.command('export-questions')
+@click.argument('path', default='-')
+@click.option('--type', 'question_type', default='', type=click.Choice(['', *QUESTION_TYPES]), help='只导出该题型')
+@click.option('--creator', default=None, help='只导出该用户名创建的题目')
+@click.option('--include-duplicates', is_flag=True, help='包含被标记为近似重复的题目')
+def export_questions_command(path, question_type, creator, include_duplicates):
+    # 把题库导出为JSONL文件（PATH为-时输出到标准输出）
+    creator_id = None
+    if creator:
+        user = User.query.filter_by(username=creator).first()
+        if user is None:
+            raise click.ClickException(f'用户不存在：{creator}')
+        creator_id = user.id
+    count = 0
+    with click.open_file(path, 'w', encoding='utf-8') as output:
+        for chunk in iter_questions_jsonl(question_type, creator_id, include_duplicates):
+            output.write(chunk)
+            count += chunk.count('\n')
+    click.echo(f'已导出：{count} 道', err=True)
+
+@app.cli.command('import-questions')
+@click.argument('path')
+@click.option('--user', 'username', required=True, help='导入题目的创建者（用户名）')
+@click.option('--batch-size', type=int, default=None, help='每批插入并提交的题目数（默认IMPORT_BATCH_SIZE）')
+@click.option('--dedupe', is_flag=True, help='把与题库中已有题目近似重复的标记为重复')
+def import_questions_command(path, username, batch_size, dedupe):
+    # 从JSONL文件批量导入题目（PATH为-时从标准输入读取）
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f'用户不存在：{username}')
+    start = time.perf_counter()
+    with click.open_file(path, 'rb') as stream:
+        result = import_questions_jsonl(stream, user.id, batch_size, dedupe)
+    for error in result['errors']:
+        click.echo(error, err=True)
+    print(f'导入：{result["imported"]} 道，标记重复：{result["duplicates"]} 道，跳过：{result["skipped"]} 行，'
+          f'耗时{time.perf_counter() - start:.1f}秒')
 
 # ---------------------- 首页路由 ----------------------
 @app.route('/')
@@ -92,86 +176,249 @@ def logout():
 @login_required
 def upload_material():
     if request.method == 'POST':
-        # 接收用户上传的资料（文本或文件）
-        material_text = request.form.get('material_text')  # 文本输入
-        material_file = request.files.get('material_file')  # 文件上传
-
-        # 处理资料内容
-        material = ""
-        if material_file and material_file.filename:
-            # 读取文件内容（支持txt、md等文本文件）
-            material = material_file.read().decode('utf-8')
-        elif material_text:
-            material = material_text
+        # 接收用户上传的资料（文本输入 + 多个txt/md文件或zip压缩包），分块读取并自动识别编码
+        try:
+            material = ingest_material(request.files.getlist('material_file'), request.form.get('material_text'))
+        except IngestError as e:
+            flash(str(e))
+            return redirect(url_for('upload_material'))
 
         if not material:
             flash('请输入或上传资料内容！')
             return redirect(url_for('upload_material'))
 
-        # 调用LLM生成题目
-        questions = generate_questions_from_material(material, question_count=10)
-        if "error" in questions:
-            flash(questions["error"])
+        # 创建后台出题任务，立即返回任务页面（生成过程不再占用请求线程）
+        try:
+            job = submit_generation_job(current_user.id, material, question_count=10,
+                                        use_cache=not request.form.get('regenerate'))
+        except JobLimitExceeded as e:
+            flash(str(e))
             return redirect(url_for('upload_material'))
 
-        # 保存题目到数据库
-        for q in questions:
-            new_question = Question(
-                question_type=q['type'],
-                content=q['content'],
-                options=json.dumps(q['options'],ensure_ascii=False) if 'options' in q else None,
-                correct_answer=q['correct_answer'],
-                source_material=material[:500] + "..." if len(material) > 500 else material,  # 截取前500字
-                creator_id=current_user.id
-            )
-            db.session.add(new_question)
-        db.session.commit()
+        flash('资料已提交，正在后台生成题目...')
+        return redirect(url_for('job_detail', job_id=job.id))
 
-        flash(f'成功生成{len(questions)}道题目！')
+    return render_template('upload.html')
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    # 请求体超过MAX_CONTENT_LENGTH时Flask不会读取剩余内容
+    limit_mb = app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024)
+    if request.endpoint == 'upload_material':
+        flash(f'上传的文件过大（超过{limit_mb}MB）')
+        return redirect(url_for('upload_material'))
+    if request.endpoint == 'import_questions':
+        flash(f'上传的文件过大（超过{limit_mb}MB），请使用flask import-questions命令导入')
         return redirect(url_for('question_list'))
+    return e
 
-    return render_template('upload.html')
+def get_own_job_or_404(job_id):
+    # 只能查看自己的出题任务
+    job = GenerationJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        abort(404)
+    return job
 
-@app.route('/questions')
+@app.route('/job/<int:job_id>')
 @login_required
-def question_list():
-    # 筛选题目（支持按类型、评分排序）
-    question_type = request.args.get('type', '')
-    sort_by = request.args.get('sort', 'score_desc')  # 按评分降序
+def job_detail(job_id):
+    job = get_own_job_or_404(job_id)
+    # 已入库的题目直接渲染，之后生成的题目通过SSE推送
+    questions = Question.query.filter(Question.id.in_(job.get_question_ids())).order_by(Question.id).all()
+    return render_template('job_status.html', job=job, questions=questions, current_user=current_user)
+
+@app.route('/job/<int:job_id>/events')
+@login_required
+def job_events(job_id):
+    # SSE推送新入库的题目和任务结束事件，事件ID为已推送的题目数；
+    # 单次连接最多保持JOB_EVENTS_MAX_SECONDS秒，浏览器会带Last-Event-ID自动重连，不长期占用worker
+    get_own_job_or_404(job_id)
+    last_event_id = request.headers.get('Last-Event-ID', '').strip()  # 不是数字时忽略
+    sent = int(last_event_id) if last_event_id.isdigit() else max(request.args.get('after', 0, type=int), 0)
+
+    def generate():
+        nonlocal sent
+        deadline = time.monotonic() + app.config['JOB_EVENTS_MAX_SECONDS']
+        while True:
+            db.session.expire_all()  # 重新读取后台线程提交的最新进度
+            job = db.session.get(GenerationJob, job_id)
+            new_ids = job.get_question_ids()[sent:]
+            if new_ids:
+                question_map = {q.id: q for q in Question.query.filter(Question.id.in_(new_ids)).all()}
+                for qid in new_ids:
+                    sent += 1
+                    payload = json.dumps(question_map[qid].to_dict(), ensure_ascii=False)
+                    yield f'id: {sent}\nevent: question\ndata: {payload}\n\n'
+            if job.is_finished():
+                yield f'event: done\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n'
+                return
+            if time.monotonic() > deadline:
+                return
+            time.sleep(0.5)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/job/<int:job_id>')
+@login_required
+def job_status(job_id):
+    # 任务状态与进度（供结果页轮询）
+    job = get_own_job_or_404(job_id)
+    return jsonify(job.to_dict())
+
+@app.route('/api/cache/stats')
+@login_required
+def cache_stats():
+    # 出题缓存、题目/卷子缓存的命中率统计
+    return jsonify(dict(generation_cache_stats(), content=content_cache_stats()))
 
-    query = Question.query
-    if question_type:
-        query = query.filter_by(question_type=question_type)
+@app.route('/api/llm/stats')
+@login_required
+def llm_stats():
+    # LLM各后端的延迟、错误率和熔断状态
+    return jsonify(get_gateway().stats())
 
-    # 排序
-    if sort_by == 'score_desc':
-        query = query.order_by(Question.score.desc())
-    elif sort_by == 'create_time_desc':
-        query = query.order_by(Question.create_time.desc())
+@app.route('/questions')
+@login_required
+@replica_reads
+def question_list():
+    # 带检索词时按相关度全文检索（按页码分页）
+    if request.args.get('q', '').strip():
+        page = max(request.args.get('page', 1, type=int), 1)
+        questions, has_next = search_questions(
+            request.args['q'],
+            question_type=request.args.get('type', ''),
+            creator_id=get_creator_filter(),
+            min_score=request.args.get('min_score', type=float),
+            page=page,
+            limit=app.config['QUESTION_PAGE_SIZE']
+        )
+        return render_template('question_list.html', questions=questions, page=page, has_next=has_next, current_user=current_user)
+
+    # 筛选题目（支持按类型、创建者筛选，按评分/创建时间排序），键集分页
+    questions, next_cursor = query_question_page(
+        question_type=request.args.get('type', ''),
+        creator_id=get_creator_filter(),
+        sort_by=request.args.get('sort', 'score_desc'),  # 按评分降序
+        cursor=request.args.get('cursor'),
+        limit=app.config['QUESTION_PAGE_SIZE']
+    )
+    return render_template('question_list.html', questions=questions, next_cursor=next_cursor, current_user=current_user)
+
+def get_creator_filter():
+    # creator=me表示只看自己创建的题目，也可以传用户ID
+    creator = request.args.get('creator', '')
+    if creator == 'me':
+        return current_user.id
+    return int(creator) if creator.isdigit() else None
+
+@app.route('/api/questions')
+@login_required
+@replica_reads
+def api_question_list():
+    # 题库JSON接口（组卷页面按需加载）
+    limit = min(request.args.get('limit', app.config['QUESTION_PAGE_SIZE'], type=int), app.config['QUESTION_PAGE_SIZE_MAX'])
+    questions, next_cursor = query_question_page(
+        question_type=request.args.get('type', ''),
+        creator_id=get_creator_filter(),
+        sort_by=request.args.get('sort', 'score_desc'),
+        cursor=request.args.get('cursor'),
+        limit=max(limit, 1)
+    )
+    return jsonify({'items': [q.to_dict() for q in questions], 'next_cursor': next_cursor})
+
+@app.route('/api/questions/search')
+@login_required
+@replica_reads
+def api_question_search():
+    # 全文检索JSON接口：q=检索词，可按type/creator/min_score筛选，page分页
+    limit = min(request.args.get('limit', app.config['QUESTION_PAGE_SIZE'], type=int), app.config['QUESTION_PAGE_SIZE_MAX'])
+    page = max(request.args.get('page', 1, type=int), 1)
+    questions, has_next = search_questions(
+        request.args.get('q', ''),
+        question_type=request.args.get('type', ''),
+        creator_id=get_creator_filter(),
+        min_score=request.args.get('min_score', type=float),
+        page=page,
+        limit=max(limit, 1)
+    )
+    return jsonify({'items': [q.to_dict() for q in questions], 'page': page, 'has_next': has_next})
+
+@app.route('/export/questions.jsonl')
+@login_required
+def export_questions():
+    # 流式导出题库（JSONL，每行一道题），可按type/creator筛选；duplicates=1时包含近似重复题
+    generate = iter_questions_jsonl(
+        question_type=request.args.get('type', ''),
+        creator_id=get_creator_filter(),
+        include_duplicates=request.args.get('duplicates') == '1'
+    )
+    return Response(stream_with_context(generate), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=questions.jsonl'})
+
+@app.route('/questions/import', methods=['POST'])
+@login_required
+def import_questions():
+    # 上传JSONL文件批量导入题目（创建者为当前用户），较大的文件用flask import-questions命令导入
+    file = request.files.get('questions_file')
+    if not file or not file.filename:
+        flash('请选择要导入的JSONL文件！')
+        return redirect(url_for('question_list'))
+    result = import_questions_jsonl(file.stream, current_user.id, dedupe=bool(request.form.get('dedupe')))
+    flash(f'导入：{result["imported"]} 道，标记重复：{result["duplicates"]} 道，跳过：{result["skipped"]} 行'
+          + (f'（{result["errors"][0]}）' if result['errors'] else ''))
+    return redirect(url_for('question_list', creator='me', sort='create_time_desc'))
 
-    questions = query.all()
-    return render_template('question_list.html', questions=questions, current_user=current_user)
+@app.route('/api/questions/import', methods=['POST'])
+@login_required
+def api_import_questions():
+    # JSONL导入接口：请求体即JSONL内容（或multipart中的questions_file），返回导入结果
+    file = request.files.get('questions_file')
+    stream = file.stream if file else request.stream
+    return jsonify(import_questions_jsonl(stream, current_user.id, dedupe=request.args.get('dedupe') == '1'))
 
 @app.route('/question/score/<int:question_id>', methods=['POST'])
 @login_required
 def score_question(question_id):
-    # 给题目评分
-    question = Question.query.get_or_404(question_id)
-    new_score = float(request.form.get('score'))
-    if 1.0 <= new_score <= 5.0:
-        question.update_score(new_score)
-        flash('评分成功！')
+    # 给题目评分（每个用户每道题只能评一次）
+    Question.query.get_or_404(question_id)
+    new_score = request.form.get('score', type=float)
+    if new_score is not None and 1.0 <= new_score <= 5.0:
+        rated, _ = rate_questions(current_user.id, {question_id: new_score})
+        flash('评分成功！' if rated else '您已经评过这道题了！')
     else:
         flash('评分必须在1-5分之间！')
     return redirect(url_for('question_list'))
 
+@app.route('/api/questions/score', methods=['POST'])
+@login_required
+def score_questions_batch():
+    # 批量评分：{"ratings": [{"question_id": 1, "score": 4}, ...]}，一个事务完成
+    data = request.get_json(silent=True) or {}
+    ratings, invalid = {}, []
+    for r in data.get('ratings', []):
+        try:
+            qid, score = int(r['question_id']), float(r['score'])
+        except (KeyError, TypeError, ValueError):
+            invalid.append(r)
+            continue
+        if 1.0 <= score <= 5.0:
+            ratings[qid] = score
+        else:
+            invalid.append(r)
+    rated, skipped = rate_questions(current_user.id, ratings)
+    return jsonify({'rated': rated, 'skipped': skipped, 'invalid': invalid})
+
 # ---------------------- 卷子相关路由 ----------------------
 @app.route('/paper/create', methods=['GET', 'POST'])
 @login_required
 def create_paper():
     if request.method == 'POST':
         paper_name = request.form.get('paper_name')
-        question_ids = request.form.getlist('question_ids')  # 选中的题目ID列表
+        # 选中的题目ID列表（去重并保持勾选顺序，只保留存在的题目）
+        selected_ids = list(dict.fromkeys(int(qid) for qid in request.form.getlist('question_ids') if qid.isdigit()))
+        existing_ids = {row.id for row in db.session.query(Question.id).filter(Question.id.in_(selected_ids))} if selected_ids else set()
+        question_ids = [qid for qid in selected_ids if qid in existing_ids]
 
         if not paper_name or len(question_ids) == 0:
             flash('请输入卷子名称并选择题目！')
@@ -181,134 +428,277 @@ def create_paper():
         new_paper = Paper(
             paper_name=paper_name,
             creator_id=current_user.id,
-            question_ids=','.join(question_ids)
+            total_score=100
         )
+        new_paper.set_questions(question_ids)
         db.session.add(new_paper)
         db.session.commit()
 
         flash(f'卷子创建成功！共{len(question_ids)}道题')
         return redirect(url_for('paper_detail', paper_id=new_paper.id))
 
-    # GET请求：加载所有题目供选择
-    questions = Question.query.order_by(Question.score.desc()).all()
-    return render_template('paper_create.html', questions=questions)
+    # GET请求：题目列表由页面通过/api/questions分页加载
+    return render_template('paper_create.html', current_user=current_user)
+
+def parse_assembly_options(data):
+    # 自动组卷参数（表单和JSON通用）：count、ratio（如"4:3:3"或[4,3,3]）、min_score、creator、exclude_mastered、seed
+    ratio = data.get('ratio') or '4:3:3'
+    if isinstance(ratio, str):
+        ratio = ratio.replace('：', ':').split(':')
+    creator = str(data.get('creator') or '')
+    try:
+        return {
+            'count': int(data['count']) if data.get('count') not in (None, '') else 10,
+            'ratio': [int(r) for r in ratio],
+            'min_score': float(data['min_score']) if data.get('min_score') not in (None, '') else None,
+            'creator_id': current_user.id if creator == 'me' else (int(creator) if creator.isdigit() else None),
+            'exclude_mastered_for': current_user.id if data.get('exclude_mastered') in (True, 'true', 'on', '1') else None,
+            'seed': int(data['seed']) if data.get('seed') not in (None, '') else None,
+        }
+    except (TypeError, ValueError):
+        raise AssemblyError('组卷参数格式不正确')
+
+@app.route('/paper/auto', methods=['POST'])
+@login_required
+def auto_paper():
+    # 按题型比例/评分/创建者等条件自动组卷
+    try:
+        paper, seed = assemble_paper(current_user.id, request.form.get('paper_name'), **parse_assembly_options(request.form))
+    except AssemblyError as e:
+        flash(str(e))
+        return redirect(url_for('create_paper'))
+    flash(f'卷子创建成功！共{len(paper.items)}道题（随机种子：{seed}）')
+    return redirect(url_for('paper_detail', paper_id=paper.id))
+
+@app.route('/api/paper/auto', methods=['POST'])
+@login_required
+def api_auto_paper():
+    # 自动组卷JSON接口，返回卷子ID、题目ID和随机种子（传入同一种子可复现）
+    data = request.get_json(silent=True) or {}
+    try:
+        paper, seed = assemble_paper(current_user.id, data.get('paper_name'), **parse_assembly_options(data))
+    except AssemblyError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'paper_id': paper.id, 'question_ids': paper.get_question_ids(), 'seed': seed})
 
 @app.route('/paper/<int:paper_id>')
 @login_required
+@replica_reads
 def paper_detail(paper_id):
-    paper = Paper.query.get_or_404(paper_id)
-    # 获取卷子对应的题目
-    question_ids = paper.get_question_ids()
-    questions = Question.query.filter(Question.id.in_(question_ids)).all()
-    return render_template('paper_detail.html', paper=paper, questions=questions)
+    # 卷子及其有序题目从读穿缓存读取，考试时同一张卷子不必每次查库
+    paper = get_paper_view_or_404(paper_id)
+    return render_template('paper_detail.html', paper=paper, current_user=current_user)
+
+def get_paper_view_or_404(paper_id):
+    paper = get_paper_view(paper_id)
+    if paper is None:
+        abort(404)
+    return paper
 
 @app.route('/paper/do/<int:paper_id>')
 @login_required
+@replica_reads
 def do_paper(paper_id):
-    paper = Paper.query.get_or_404(paper_id)
-    question_ids = paper.get_question_ids()
-    questions = Question.query.filter(Question.id.in_(question_ids)).all()
-    return render_template('paper_do.html', paper=paper, questions=questions)
+    paper = get_paper_view_or_404(paper_id)
+    return render_template('paper_do.html', paper=paper, questions=[item['question'] for item in paper['items']])
 
 @app.route('/paper/submit/<int:paper_id>', methods=['POST'])
 @login_required
 def submit_paper(paper_id):
-    paper = Paper.query.get_or_404(paper_id)
-    question_ids = paper.get_question_ids()
-    questions = Question.query.filter(Question.id.in_(question_ids)).all()
-    correct_count = 0
-    wrong_question_ids = []
-
-    # 判分并记录错题
-    for question in questions:
-        user_answer = request.form.get(f'answer_{question.id}')
-        if not user_answer:
-            wrong_question_ids.append(question.id)
-            continue
-
-        # 验证答案（不同题型处理）
-        if question.question_type == 'fill_blank':
-            # 填空题：忽略空格和大小写（可根据需求调整）
-            if user_answer.strip().lower() == question.correct_answer.strip().lower():
-                correct_count += 1
-            else:
-                wrong_question_ids.append(question.id)
-        elif question.question_type == 'single_choice':
-            # 单选题：直接对比
-            if user_answer == question.correct_answer:
-                correct_count += 1
-            else:
-                wrong_question_ids.append(question.id)
-        elif question.question_type == 'multiple_choice':
-            # 多选题：按逗号分隔后排序对比
-            user_ans_list = sorted(user_answer.split(','))
-            correct_ans_list = sorted(question.correct_answer.split(','))
-            if user_ans_list == correct_ans_list:
-                correct_count += 1
-            else:
-                wrong_question_ids.append(question.id)
-
-    # 记录错题到错题本
-    for qid in wrong_question_ids:
-        existing_wrong = WrongQuestion.query.filter_by(user_id=current_user.id, question_id=qid).first()
-        if existing_wrong:
-            existing_wrong.increment_count()  # 已有错题，增加次数
-        else:
-            new_wrong = WrongQuestion(user_id=current_user.id, question_id=qid)
-            db.session.add(new_wrong)
-    db.session.commit()
-
-    # 计算得分
-    total_questions = len(questions)
-    score = int((correct_count / total_questions) * paper.total_score) if total_questions > 0 else 0
-    flash(f'提交成功！得分：{score}/{paper.total_score} 分 | 正确{correct_count}道 | 错误{len(wrong_question_ids)}道')
+    paper = get_paper_view_or_404(paper_id)
+    answers = {item['question_id']: get_submitted_answer(request.form, item['question_id'], item['question']['question_type'])
+               for item in paper['items']}
+
+    # 判分、记录本次作答、批量更新错题本，一个事务完成
+    attempt = submit_attempt(current_user.id, paper, answers)
+    wrong_count = attempt.question_count - attempt.correct_count
+    flash(f'提交成功！得分：{attempt.score}/{paper["total_score"]} 分 | 正确{attempt.correct_count}道 | 错误{wrong_count}道')
     return redirect(url_for('paper_detail', paper_id=paper_id))
 
+@app.route('/api/question/<int:question_id>/papers')
+@login_required
+@replica_reads
+def question_papers(question_id):
+    # 反查使用了该题目的卷子（走paper_questions(question_id, paper_id)索引）
+    papers = Paper.papers_using_question(question_id)
+    return jsonify([{'id': p.id, 'paper_name': p.paper_name} for p in papers])
+
 # ---------------------- 错题本与PDF导出路由 ----------------------
 @app.route('/wrong')
 @login_required
+@replica_reads
 def wrong_list():
-    # 查看个人错题本
-    wrong_questions = WrongQuestion.query.filter_by(user_id=current_user.id).order_by(WrongQuestion.last_wrong_time.desc()).all()
-    # 获取对应的题目信息
-    question_ids = [wq.question_id for wq in wrong_questions]
-    questions = Question.query.filter(Question.id.in_(question_ids)).all()
-    # 映射错题与题目（保持顺序一致）
-    question_map = {q.id: q for q in questions}
-    wrong_with_questions = [(wq, question_map[wq.question_id]) for wq in wrong_questions]
-    return render_template('wrong_list.html', wrong_with_questions=wrong_with_questions)
+    # 查看个人错题本（按最近错误时间倒序，键集分页，可按题型/时间筛选）
+    question_type, since, until = get_wrong_filters()
+    wrong_with_questions, next_cursor = query_wrong_page(
+        current_user.id, question_type, since, until,
+        cursor=request.args.get('cursor'),
+        limit=app.config['WRONG_PAGE_SIZE']
+    )
+    return render_template('wrong_list.html', wrong_with_questions=wrong_with_questions, next_cursor=next_cursor,
+                           due_count=count_due_reviews(current_user.id))
+
+@app.route('/api/wrong')
+@login_required
+@replica_reads
+def api_wrong_list():
+    # 错题本JSON接口：参数同错题本页面，cursor分页
+    question_type, since, until = get_wrong_filters()
+    limit = min(request.args.get('limit', app.config['WRONG_PAGE_SIZE'], type=int), app.config['QUESTION_PAGE_SIZE_MAX'])
+    wrong_with_questions, next_cursor = query_wrong_page(
+        current_user.id, question_type, since, until,
+        cursor=request.args.get('cursor'),
+        limit=max(limit, 1)
+    )
+    return jsonify({'items': [dict(question.to_dict(), wrong_count=wq.wrong_count,
+                                   last_wrong_time=wq.last_wrong_time.isoformat() if wq.last_wrong_time else None,
+                                   next_due_at=wq.next_due_at.isoformat())
+                              for wq, question in wrong_with_questions],
+                    'next_cursor': next_cursor})
+
+def get_wrong_filters():
+    # 错题本筛选：type=题型，since/until=最近错误日期（YYYY-MM-DD，含until当天），格式不对时忽略
+    def parse_date(name, days=0):
+        try:
+            return datetime.strptime(request.args.get(name, ''), '%Y-%m-%d') + timedelta(days=days)
+        except ValueError:
+            return None
+    return request.args.get('type', ''), parse_date('since'), parse_date('until', days=1)
+
+@app.route('/stats')
+@login_required
+@replica_reads
+def stats_dashboard():
+    # 学习统计：读取交卷时增量维护的汇总表，不扫描作答记录
+    return render_template('stats.html', stats=get_user_dashboard(current_user.id))
+
+@app.route('/api/stats')
+@login_required
+@replica_reads
+def api_stats():
+    return jsonify(get_user_dashboard(current_user.id))
+
+@app.route('/review')
+@login_required
+def review():
+    # 间隔重复复习：只取最早到期的一批错题
+    due = get_due_reviews(current_user.id, app.config['REVIEW_BATCH_SIZE'])
+    questions = {q.id: q for q in Question.query.filter(Question.id.in_([wq.question_id for wq in due]))} if due else {}
+    return render_template('review.html', questions=[questions[wq.question_id] for wq in due])
+
+@app.route('/review/submit', methods=['POST'])
+@login_required
+def submit_review_answers():
+    # 判分并按SM-2重新安排复习时间，一个事务完成
+    question_ids = request.form.getlist('question_ids', type=int)
+    types = dict(db.session.query(Question.id, Question.question_type).filter(Question.id.in_(question_ids))) if question_ids else {}
+    answers = {qid: get_submitted_answer(request.form, qid, types[qid]) for qid in question_ids if qid in types}
+    correct, total = submit_review(current_user.id, answers)
+    flash(f'复习完成！共{total}道，答对{correct}道')
+    return redirect(url_for('review'))
+
+@app.route('/review/paper', methods=['POST'])
+@login_required
+def create_review_paper_route():
+    # 用到期错题生成"今日复习"卷子
+    paper = create_review_paper(current_user.id, app.config['REVIEW_BATCH_SIZE'])
+    if paper is None:
+        flash('今天没有需要复习的错题！')
+        return redirect(url_for('wrong_list'))
+    return redirect(url_for('paper_detail', paper_id=paper.id))
+
+@app.route('/api/review/due')
+@login_required
+def api_due_reviews():
+    # 到期错题JSON接口
+    limit = min(request.args.get('limit', app.config['REVIEW_BATCH_SIZE'], type=int), app.config['QUESTION_PAGE_SIZE_MAX'])
+    due = get_due_reviews(current_user.id, max(limit, 1))
+    return jsonify([{'question_id': wq.question_id, 'next_due_at': wq.next_due_at.isoformat(),
+                     'interval_days': wq.interval_days, 'repetitions': wq.repetitions, 'ease': round(wq.ease, 2)}
+                    for wq in due])
 
 @app.route('/export/paper/<int:paper_id>')
 @login_required
+@replica_reads
 def export_paper(paper_id):
-    # 导出卷子为PDF
-    paper = Paper.query.get_or_404(paper_id)
-    question_ids = paper.get_question_ids()
-    questions = Question.query.filter(Question.id.in_(question_ids)).all()
-    
-    # 生成PDF临时文件
-    pdf_path = f'/tmp/paper_{paper_id}_{current_user.id}.pdf'
-    generate_paper_pdf(paper, questions, pdf_path)
-    
-    # 发送PDF文件给用户（自动删除临时文件）
-    return send_file(pdf_path, as_attachment=True, download_name=f'{paper.paper_name}.pdf', mimetype='application/pdf')
+    # 导出卷子为PDF（按内容哈希缓存，支持ETag/If-None-Match；在进程池中渲染）
+    paper = get_paper_view_or_404(paper_id)
+    key = paper_export_key(paper, RENDER_OPTIONS)
+    cached, _ = get_cached_export(key)
+    if cached is None:
+        try:
+            data = export_paper_pdf(paper)
+        except PDFExportError as e:
+            flash(str(e))
+            return redirect(url_for('paper_detail', paper_id=paper_id))
+        store_export(key, data)
+        cached = BytesIO(data)
+    return send_export(cached, '.pdf', key, f'{paper["paper_name"]}.pdf')
 
 @app.route('/export/wrong')
 @login_required
+@replica_reads
 def export_wrong():
-    # 导出错题本为PDF
-    wrong_questions = WrongQuestion.query.filter_by(user_id=current_user.id).all()
+    # 导出错题本为PDF，筛选条件同错题本页面；
+    # 错题超过PDF_BATCH_SIZE道时分册渲染、打包为zip（每册一个PDF），在后台导出任务中执行，跳转到任务页下载
+    question_type, since, until = get_wrong_filters()
+    wrong_questions, ordered_questions = load_wrong_export(current_user.id, question_type, since, until)
     if not wrong_questions:
         flash('没有错题可导出！')
-        return redirect(url_for('wrong_list'))
-    
-    question_ids = [wq.question_id for wq in wrong_questions]
-    questions = Question.query.filter(Question.id.in_(question_ids)).all()
-    question_map = {q.id: q for q in questions}
-    ordered_questions = [question_map[wq.question_id] for wq in wrong_questions]
-    
-    # 生成PDF临时文件
-    pdf_path = f'/tmp/wrong_{current_user.id}.pdf'
-    generate_wrong_pdf(current_user.id, wrong_questions, ordered_questions, pdf_path)
-    
-    return send_file(pdf_path, as_attachment=True, download_name=f'错题本_{current_user.username}.pdf', mimetype='application/pdf')
+        return redirect(url_for('wrong_list', **request.args))
+
+    key = wrong_export_key(current_user.id, wrong_questions, ordered_questions, RENDER_OPTIONS)
+    cached, suffix = get_cached_export(key)
+    if cached is None and len(wrong_questions) > app.config['PDF_BATCH_SIZE']:
+        job = submit_wrong_export(current_user.id, question_type, since, until, len(wrong_questions))
+        return redirect(url_for('export_job_detail', job_id=job.id))
+    if cached is None:
+        try:
+            data, is_zip = export_wrong_book(current_user.id, wrong_questions, ordered_questions)
+        except PDFExportError as e:
+            flash(str(e))
+            return redirect(url_for('wrong_list'))
+        suffix = '.zip' if is_zip else '.pdf'
+        store_export(key, data, suffix)
+        cached = BytesIO(data)
+    return send_export(cached, suffix, key, f'错题本_{current_user.username}{suffix}')
+
+def get_own_export_job_or_404(job_id):
+    # 只能查看自己的导出任务
+    job = ExportJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        abort(404)
+    return job
+
+@app.route('/export/job/<int:job_id>')
+@login_required
+def export_job_detail(job_id):
+    # 后台导出任务页：进行中时自动刷新，完成后给出下载链接
+    job = get_own_export_job_or_404(job_id)
+    return render_template('export_job.html', job=job, stale=is_stale(job), current_user=current_user)
+
+@app.route('/api/export/job/<int:job_id>')
+@login_required
+def export_job_status(job_id):
+    job = get_own_export_job_or_404(job_id)
+    return jsonify(dict(job.to_dict(), stale=is_stale(job)))
+
+@app.route('/export/job/<int:job_id>/download')
+@login_required
+def export_job_download(job_id):
+    # 从导出缓存下载；文件已被淘汰时需重新导出
+    job = get_own_export_job_or_404(job_id)
+    cached, suffix = get_cached_export(job.cache_key) if job.status == 'succeeded' else (None, None)
+    if cached is None:
+        flash('导出文件已过期或尚未生成，请重新导出')
+        return redirect(url_for('export_job_detail', job_id=job_id))
+    return send_export(cached, suffix, job.cache_key, f'错题本_{current_user.username}{suffix}')
+
+def send_export(f, suffix, etag, download_name):
+    # f为缓存文件或刚渲染的内存文件；内容哈希即ETag：浏览器带If-None-Match再次下载时直接返回304
+    mimetype = 'application/zip' if suffix == '.zip' else 'application/pdf'
+    response = send_file(f, as_attachment=True, download_name=download_name,
+                         mimetype=mimetype, etag=etag, conditional=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # 每次都要向服务器验证ETag
+    return response
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+连接池/读写分离压测：多线程反复请求只读页面，分几轮进行，轮与轮之间空闲一段时间，统计
+  - 请求错误数（其中"MySQL server has gone away"/"Lost connection"的个数）
+  - 主库和只读副本各执行了多少条SQL
+  - 请求耗时p50/p99
+MySQL：设置MYSQL_*（以及MYSQL_REPLICA_HOST）后运行，--wait-timeout把每个连接的wait_timeout调小，
+       空闲时间超过它时服务器会断开池中的空闲连接；关闭DB_POOL_PRE_PING可复现gone away错误。
+SQLite：python benchmarks/db_load.py --sqlite /tmp/load.db（副本指向同一文件，只演示查询路由）
+输出JSON
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sqlite', help='使用SQLite文件（主库和副本为同一文件）')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=50, help='每轮每个线程的请求数')
+    parser.add_argument('--idle', type=float, default=0, help='每轮之间空闲的秒数')
+    parser.add_argument('--wait-timeout', type=int, default=0, help='MySQL每个连接的wait_timeout（秒），0为不修改')
+    parser.add_argument('--questions', type=int, default=500, help='题库为空时写入的题目数')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.sqlite:
+        os.environ['DATABASE_URL'] = os.environ['DATABASE_REPLICA_URL'] = 'sqlite:///' + os.path.abspath(args.sqlite)
+    os.environ.setdefault('LLM_API_KEY', 'bench')
+    sys.path.insert(0, ROOT)
+
+    from sqlalchemy import event
+    import app as app_module
+    from migrations import upgrade
+    from models import db
+    from models.question import Question
+    from models.routing import routing_stats
+    from models.user import User
+    app = app_module.app
+
+    with app.app_context():
+        db.create_all(bind_key=None)
+        upgrade()
+        if not User.query.filter_by(username='loadtest').first():
+            user = User(username='loadtest', email='loadtest@example.com')
+            user.set_password('loadtest')
+            db.session.add(user)
+            db.session.commit()
+        user_id = User.query.filter_by(username='loadtest').one().id
+        if not Question.query.first():
+            db.session.add_all([Question(question_type=('single_choice', 'multiple_choice', 'fill_blank')[i % 3],
+                                         content=f'压测题目{i}', options='["A. 1", "B. 2"]', correct_answer='A',
+                                         creator_id=user_id) for i in range(args.questions)])
+            db.session.commit()
+
+        # 按引擎统计SQL条数
+        counts = {}
+        for name, engine in db.engines.items():
+            key = 'primary' if name is None else name
+            counts[key] = 0
+            event.listen(engine, 'before_cursor_execute',
+                         lambda *a, key=key: counts.__setitem__(key, counts[key] + 1))
+            if args.wait_timeout and engine.dialect.name == 'mysql':
+                event.listen(engine, 'connect', lambda conn, record: conn.cursor().execute(
+                    f'SET SESSION wait_timeout={args.wait_timeout}'))
+            engine.dispose()
+
+    urls = ['/questions', '/api/questions', '/wrong', '/api/questions/search?q=压测']
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        client.post('/login', data={'username': 'loadtest', 'password': 'loadtest'})
+        for i in range(args.requests):
+            start = time.perf_counter()
+            try:
+                response = client.get(urls[i % len(urls)])
+                error = None if response.status_code < 500 else f'HTTP {response.status_code}'
+            except Exception as e:  # 记录错误继续压测
+                error = str(e)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+                if error:
+                    errors.append(error)
+
+    for round_no in range(args.rounds):
+        if round_no and args.idle:
+            time.sleep(args.idle)
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    latencies.sort()
+    print(json.dumps({
+        'requests': len(latencies),
+        'errors': len(errors),
+        'gone_away_errors': sum(1 for e in errors if 'gone away' in e or 'Lost connection' in e),
+        'statements': counts,
+        'routing': routing_stats(),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 2),
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
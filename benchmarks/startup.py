@@ -0,0 +1,54 @@
+"""
+启动耗时基准：每轮在新的子进程里冷启动，分别测量
+  - import_app：导入app模块（Flask初始化、模型、服务模块）
+  - first_request：第一个请求（GET /login，不访问数据库）
+  - first_pdf：第一次渲染PDF（包含延迟的字体注册）
+用法：python benchmarks/startup.py [--rounds 5]，输出JSON，便于和上一次结果对比
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中执行，打印各阶段耗时（毫秒）
+PROBE = r'''
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+client.get('/login')
+t2 = time.perf_counter()
+from services.pdf_renderer import render_paper_pdf
+render_paper_pdf({'paper_name': 'bench', 'total_score': 100, 'questions': [
+    {'question_type': 'fill_blank', 'content': 'x', 'options': [], 'correct_answer': 'y'}]})
+t3 = time.perf_counter()
+print(json.dumps({'import_app': (t1 - t0) * 1000, 'first_request': (t2 - t1) * 1000, 'first_pdf': (t3 - t2) * 1000}))
+'''
+
+def run_once():
+    env = dict(os.environ)
+    env.setdefault('LLM_API_KEY', 'bench')
+    env.setdefault('DATABASE_URL', 'sqlite://')  # 只测启动，不需要真实数据库
+    proc = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.rounds)]
+    result = {name: {'median_ms': round(statistics.median(s[name] for s in samples), 1),
+                     'max_ms': round(max(s[name] for s in samples), 1)}
+              for name in samples[0]}
+    print(json.dumps({'rounds': args.rounds, 'startup': result}, indent=2))
+
+if __name__ == '__main__':
+    main()
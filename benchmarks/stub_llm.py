@@ -0,0 +1,125 @@
+"""
+本地OpenAI兼容桩服务：代替DeepSeek接口，用于离线基准测试
+  POST /v1/chat/completions，支持stream=true（SSE分片输出）和普通返回，带usage
+  --latency：返回前（流式为首个分片前）等待的秒数；--jitter：在此基础上随机增加的秒数
+  --chunk-delay：流式分片之间的间隔；--questions：每次返回的题目数；--fail-rate：返回HTTP 500的比例
+题目内容带递增序号，不会被判重合并
+用法：python benchmarks/stub_llm.py --port 8001 --latency 0.5，然后设置LLM_API_BASE=http://127.0.0.1:8001/v1
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_serial = itertools.count(1)
+
+def build_questions(count):
+    questions = []
+    for _ in range(count):
+        n = next(_serial)
+        kind = ('single_choice', 'multiple_choice', 'fill_blank')[n % 3]
+        if kind == 'fill_blank':
+            questions.append({'type': kind, 'content': f'桩服务第{n}题：光合作用需要____作为能量来源。', 'correct_answer': '光能'})
+        else:
+            questions.append({'type': kind, 'content': f'桩服务第{n}题：以下关于光合作用的说法哪些正确？',
+                              'options': ['A. 发生在叶绿体', 'B. 产生氧气', 'C. 消耗氮气', 'D. 只在夜间进行'],
+                              'correct_answer': 'A' if kind == 'single_choice' else 'A,B'})
+    return questions
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    options = None  # 由make_server设置
+
+    def log_message(self, format, *args):  # 不输出访问日志
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        opts = self.options
+        if not self.path.endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': 'not found'}})
+        time.sleep(opts.latency + random.uniform(0, opts.jitter))
+        if random.random() < opts.fail_rate:
+            return self._send_json(500, {'error': {'message': 'stub failure'}})
+
+        content = json.dumps({'questions': build_questions(opts.questions)}, ensure_ascii=False)
+        prompt_tokens = len(json.dumps(request.get('messages', []), ensure_ascii=False)) // 2
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 2,
+                 'total_tokens': prompt_tokens + len(content) // 2}
+        base = {'id': f'stub-{next(_serial)}', 'created': int(time.time()), 'model': request.get('model', 'stub')}
+
+        if not request.get('stream'):
+            return self._send_json(200, dict(base, object='chat.completion', usage=usage, choices=[
+                {'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}]))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        pieces = [content[i:i + opts.chunk_chars] for i in range(0, len(content), opts.chunk_chars)]
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            event = dict(base, object='chat.completion.chunk', choices=[
+                {'index': 0, 'delta': {'content': piece}, 'finish_reason': 'stop' if last else None}])
+            if last:
+                event['usage'] = usage
+            self._write_chunk(f'data: {json.dumps(event, ensure_ascii=False)}\n\n')
+            if opts.chunk_delay and not last:
+                time.sleep(opts.chunk_delay)
+        self._write_chunk('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001, help='0为随机端口')
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--chunk-delay', type=float, default=0.0)
+    parser.add_argument('--chunk-chars', type=int, default=64)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    return parser.parse_args(argv)
+
+def make_server(options):
+    """创建桩服务（未启动），options为parse_args的结果"""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'options': options})
+    server = ThreadingHTTPServer((options.host, options.port), handler)
+    server.daemon_threads = True
+    return server
+
+def start_in_background(options):
+    """在后台线程中启动桩服务，返回(server, base_url)"""
+    server = make_server(options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}/v1'
+
+def main():
+    options = parse_args()
+    server = make_server(options)
+    host, port = server.server_address[:2]
+    print(f'OpenAI兼容桩服务：http://{host}:{port}/v1')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+"""
+基准测试套件：SQLite + 本地OpenAI兼容桩服务，无需MySQL和DeepSeek
+  - 按规模（1k～1m道题目）生成合成数据：用户、题目、卷子、错题本；生成结果缓存为SQLite文件，每次运行复制一份，起点一致
+  - 依次压测各接口，统计吞吐量和p50/p99：
+      questions         GET /questions（键集分页第一页，随机题型）
+      questions_search  GET /questions?q=（全文检索）
+      upload            POST /upload（提交出题任务）；upload_job为任务从创建到完成的耗时（桩服务出题）
+      paper_submit      POST /paper/submit/<id>
+      export_paper      GET /export/paper/<id>（每次不同的卷子，实际渲染）；export_paper_cached为命中导出缓存
+      export_wrong      GET /export/wrong（每个用户第一次，实际渲染）；export_wrong_cached为命中导出缓存
+  - 输出JSON（含规模、参数、git版本），--output同时写入文件，便于比较多次运行
+用法：python benchmarks/suite.py --scale 10k [--requests 200] [--threads 8] [--llm-latency 0.2] [--output bench.json]
+请求通过Flask测试客户端在进程内发出，不包含WSGI服务器和网络开销
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm import parse_args as stub_args, start_in_background  # noqa: E402
+
+# 合成数据格式版本：修改seed_data后递增，使缓存的种子数据库失效
+SEED_VERSION = 1
+PHASES = ['questions', 'questions_search', 'upload', 'paper_submit', 'export_paper', 'export_wrong']
+QUESTIONS_PER_PAPER = 20
+TOPICS = ['光合作用', '细胞呼吸', '线粒体', '牛顿定律', '化学反应', '氧化还原', '函数', '导数', '概率', '唐朝历史',
+          '板块运动', '供求关系', '唐诗宋词', '欧姆定律', '遗传规律', '蛋白质', '酶的特性', '宇宙起源', '电磁感应', '文言虚词']
+
+def parse_scale(value):
+    value = value.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=parse_scale, default=parse_scale('1k'), help='题目数：1k、10k、100k、1m')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--wrong-per-user', type=int, default=200, help='每个用户的错题数（决定错题本PDF大小）')
+    parser.add_argument('--seed', type=int, default=42, help='合成数据和请求顺序的随机种子')
+    parser.add_argument('--requests', type=int, default=200, help='每个接口的请求数')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--phases', default=','.join(PHASES), help='逗号分隔，可选：' + ','.join(PHASES))
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'review_app_bench'),
+                        help='存放种子数据库、运行数据库和导出缓存的目录')
+    parser.add_argument('--reseed', action='store_true', help='忽略已缓存的种子数据库，重新生成')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='桩服务首个输出前的延迟（秒）')
+    parser.add_argument('--llm-jitter', type=float, default=0.0)
+    parser.add_argument('--llm-chunk-delay', type=float, default=0.0)
+    parser.add_argument('--llm-questions', type=int, default=10, help='桩服务每次返回的题目数')
+    parser.add_argument('--llm-fail-rate', type=float, default=0.0)
+    parser.add_argument('--job-timeout', type=float, default=300, help='等待出题任务全部完成的最长秒数')
+    parser.add_argument('--output', help='结果JSON同时写入该文件')
+    args = parser.parse_args()
+    args.users = max(args.users, args.threads)  # 每个线程至少一个用户（测试客户端的cookie不能跨线程共用）
+    args.phases = [p for p in args.phases.split(',') if p]
+    unknown = set(args.phases) - set(PHASES)
+    if unknown:
+        parser.error(f'未知的阶段：{",".join(sorted(unknown))}')
+    return args
+
+def configure_environment(args, llm_base_url):
+    # 必须在导入app之前设置（Config在导入时读取环境变量）
+    os.makedirs(args.workdir, exist_ok=True)
+    run_db = os.path.join(args.workdir, 'run.db')
+    export_dir = os.path.join(args.workdir, 'exports')
+    shutil.rmtree(export_dir, ignore_errors=True)
+    os.environ.update({
+        'DATABASE_URL': 'sqlite:///' + run_db,
+        'LLM_API_BASE': llm_base_url,
+        'LLM_API_KEY': 'bench',
+        'EXPORT_CACHE_DIR': export_dir,
+        'JOB_MAX_ACTIVE_PER_USER': str(10 ** 6),
+        'DEBUG': 'False',
+    })
+    os.environ.pop('DATABASE_REPLICA_URL', None)
+    os.environ.pop('MYSQL_REPLICA_HOST', None)
+    return run_db
+
+def seed_path(args):
+    return os.path.join(args.workdir, f'seed_v{SEED_VERSION}_{args.scale}_{args.users}_{args.wrong_per_user}_{args.seed}.db')
+
+# ---------------------- 合成数据 ----------------------
+def insert_batches(table, rows, batch_size=5000):
+    from models import db
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+
+def seed_data(args):
+    """在当前应用上下文的数据库中生成合成数据"""
+    from werkzeug.security import generate_password_hash
+    from models import db
+    from models.paper import Paper
+    from models.paper_question import PaperQuestion
+    from models.question import Question, RAND_KEY_MAX
+    from models.user import User
+    from models.wrong_question import WrongQuestion
+    from services.search_service import rebuild_search_index
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    password = generate_password_hash('bench', method='pbkdf2:sha256:1000')  # 迭代次数低，登录不成为瓶颈
+    insert_batches(User.__table__, ({'id': u, 'username': f'bench{u}', 'email': f'bench{u}@example.com',
+                                     'password': password, 'create_time': now, 'update_time': now}
+                                    for u in range(1, args.users + 1)))
+
+    def question_rows():
+        for i in range(1, args.scale + 1):
+            kind = ('single_choice', 'multiple_choice', 'fill_blank')[i % 3]
+            topic, other = rng.sample(TOPICS, 2)
+            score_count = rng.randint(1, 20)
+            score = round(rng.uniform(1, 5), 1)
+            yield {
+                'id': i,
+                'question_type': kind,
+                'content': f'第{i}题：关于{topic}与{other}，下列说法正确的是' + ('____。' if kind == 'fill_blank' else '？'),
+                'options': None if kind == 'fill_blank' else json.dumps(
+                    [f'A. {topic}', f'B. {other}', 'C. 两者都对', 'D. 两者都错'], ensure_ascii=False),
+                'correct_answer': {'single_choice': 'A', 'multiple_choice': 'A,C', 'fill_blank': topic}[kind],
+                'creator_id': rng.randint(1, args.users),
+                'score': score,
+                'score_sum': round(score * score_count, 1),
+                'score_count': score_count,
+                'create_time': now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                'rand_key': rng.randrange(RAND_KEY_MAX),
+            }
+    insert_batches(Question.__table__, question_rows())
+
+    paper_count = max(args.users, min(args.scale // 100, 10000))
+    per_paper = min(QUESTIONS_PER_PAPER, args.scale)
+    insert_batches(Paper.__table__, ({'id': p, 'paper_name': f'基准卷子{p}', 'creator_id': rng.randint(1, args.users),
+                                      'total_score': 100, 'create_time': now} for p in range(1, paper_count + 1)))
+    insert_batches(PaperQuestion.__table__, (
+        {'paper_id': p, 'question_id': qid, 'position': idx,
+         'points': 100 // per_paper + (1 if idx <= 100 % per_paper else 0)}
+        for p in range(1, paper_count + 1)
+        for idx, qid in enumerate(rng.sample(range(1, args.scale + 1), per_paper), 1)))
+
+    def wrong_rows():
+        for u in range(1, args.users + 1):
+            for qid in rng.sample(range(1, args.scale + 1), min(args.wrong_per_user, args.scale)):
+                last_wrong = now - timedelta(days=rng.randint(0, 60))
+                yield {'user_id': u, 'question_id': qid, 'wrong_count': rng.randint(1, 5), 'last_wrong_time': last_wrong,
+                       'create_time': last_wrong, 'repetitions': 0, 'interval_days': 0, 'ease': 2.5,
+                       'next_due_at': last_wrong}
+    insert_batches(WrongQuestion.__table__, wrong_rows())
+    rebuild_search_index()
+    db.session.commit()
+    return paper_count
+
+def prepare_database(args, app, run_db):
+    """复制（或生成）种子数据库到运行数据库，返回种子耗时信息"""
+    from migrations import upgrade
+    from models import db
+    cached = seed_path(args)
+    for path in (run_db, run_db + '-wal', run_db + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+    info = {'seed_cached': os.path.exists(cached) and not args.reseed}
+    start = time.perf_counter()
+    if info['seed_cached']:
+        shutil.copyfile(cached, run_db)
+        with app.app_context():
+            upgrade()  # 种子数据库生成之后新增的迁移
+    else:
+        with app.app_context():
+            db.create_all(bind_key=None)
+            upgrade()
+            seed_data(args)
+            db.engine.dispose()
+        shutil.copyfile(run_db, cached)
+    info['seed_seconds'] = round(time.perf_counter() - start, 2)
+
+    with sqlite3.connect(run_db) as conn:
+        info['rows'] = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                        for table in ('users', 'questions', 'papers', 'paper_questions', 'wrong_questions')}
+    return info
+
+# ---------------------- 压测 ----------------------
+def summarize(latencies, errors, wall_seconds):
+    if not latencies:
+        return {'requests': 0, 'errors': errors}
+    ordered = sorted(latencies)
+
+    def percentile(q):
+        return round(ordered[max(math.ceil(q * len(ordered)) - 1, 0)] * 1000, 2)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / wall_seconds, 2) if wall_seconds else None,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        'p50_ms': percentile(0.5),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+def run_phase(clients, targets, send):
+    """
+    并发执行一组请求：targets为[(用户下标, 参数)]，同一用户的请求由同一个线程按顺序发出
+    :param send: send(client, 参数) -> 是否成功
+    """
+    threads = len(clients)
+    groups = [[] for _ in range(threads)]
+    for user_index, arg in targets:
+        groups[user_index % threads].append((user_index, arg))
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(group):
+        for user_index, arg in group:
+            start = time.perf_counter()
+            try:
+                ok = send(clients[user_index % threads][user_index], arg)
+                error = None if ok else 'unexpected response'
+            except Exception as e:  # 记录错误继续压测
+                error = f'{type(e).__name__}: {e}'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if error:
+                    errors.append(error)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(group,)) for group in groups]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    result = summarize(latencies, len(errors), time.perf_counter() - start)
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+def fetch(client, method, url, expect=(200,), location=None, **kwargs):
+    response = client.open(url, method=method, **kwargs)
+    response.get_data()  # 读完响应体（send_file为流式响应）
+    response.close()
+    if response.status_code not in expect:
+        return False
+    return location is None or location in response.headers.get('Location', '')
+
+def wait_for_jobs(app, job_ids, timeout):
+    """等待出题任务结束，返回各任务耗时和生成的题目数"""
+    from models import db
+    from models.generation_job import GenerationJob
+    deadline = time.monotonic() + timeout
+    with app.app_context():
+        while True:
+            db.session.expire_all()
+            jobs = GenerationJob.query.filter(GenerationJob.id.in_(job_ids)).all()
+            if all(job.is_finished() for job in jobs) or time.monotonic() > deadline:
+                break
+            time.sleep(0.2)
+        durations = [(job.finish_time - job.create_time).total_seconds() for job in jobs if job.finish_time]
+        result = summarize(durations, sum(1 for job in jobs if job.status != 'succeeded'), None)
+        result.pop('throughput_rps', None)
+        result['questions_generated'] = sum(len(job.get_question_ids()) for job in jobs)
+        result['unfinished'] = sum(1 for job in jobs if not job.is_finished())
+    return result
+
+def main():
+    args = parse_args()
+    stub_options = stub_args(['--port', '0', '--latency', str(args.llm_latency), '--jitter', str(args.llm_jitter),
+                              '--chunk-delay', str(args.llm_chunk_delay), '--questions', str(args.llm_questions),
+                              '--fail-rate', str(args.llm_fail_rate)])
+    stub_server, llm_base_url = start_in_background(stub_options)
+    run_db = configure_environment(args, llm_base_url)
+
+    sys.path.insert(0, ROOT)
+    import app as app_module
+    from models import db
+    from models.generation_job import GenerationJob
+    from models.paper_question import PaperQuestion
+    app = app_module.app
+    data_info = prepare_database(args, app, run_db)
+
+    # 每个线程为自己负责的用户各建一个已登录的测试客户端
+    clients = [{} for _ in range(args.threads)]
+    for u in range(args.users):
+        client = app.test_client()
+        if not fetch(client, 'POST', '/login', expect=(302,), data={'username': f'bench{u + 1}', 'password': 'bench'}):
+            sys.exit(f'用户bench{u + 1}登录失败')
+        clients[u % args.threads][u] = client
+
+    rng = random.Random(args.seed)
+    user_indexes = [i % args.users for i in range(args.requests)]
+    with app.app_context():
+        paper_count = data_info['rows']['papers']
+        paper_ids = [rng.randint(1, paper_count) for _ in range(args.requests)]
+        paper_items = {}
+        for paper_id, question_id in db.session.query(PaperQuestion.paper_id, PaperQuestion.question_id).filter(
+                PaperQuestion.paper_id.in_(set(paper_ids))):
+            paper_items.setdefault(paper_id, []).append(question_id)
+
+    results = {}
+    for phase in args.phases:
+        if phase == 'questions':
+            types = ['', 'single_choice', 'multiple_choice', 'fill_blank']
+            results[phase] = run_phase(clients, [(u, rng.choice(types)) for u in user_indexes],
+                                       lambda c, t: fetch(c, 'GET', f'/questions?type={t}'))
+        elif phase == 'questions_search':
+            results[phase] = run_phase(clients, [(u, rng.choice(TOPICS)) for u in user_indexes],
+                                       lambda c, q: fetch(c, 'GET', '/questions', query_string={'q': q}))
+        elif phase == 'upload':
+            with app.app_context():
+                last_job_id = db.session.query(db.func.max(GenerationJob.id)).scalar() or 0
+            materials = [(u, f'基准资料{i}：' + '，'.join(rng.sample(TOPICS, 10)) * 5) for i, u in enumerate(user_indexes)]
+            results[phase] = run_phase(clients, materials, lambda c, m: fetch(
+                c, 'POST', '/upload', expect=(302,), location='/job/', data={'material_text': m}))
+            with app.app_context():
+                job_ids = [row.id for row in db.session.query(GenerationJob.id).filter(GenerationJob.id > last_job_id)]
+            results['upload_job'] = wait_for_jobs(app, job_ids, args.job_timeout)
+        elif phase == 'paper_submit':
+            submissions = [(u, (pid, {f'answer_{qid}': rng.choice('ABCD') for qid in paper_items[pid]}))
+                           for u, pid in zip(user_indexes, paper_ids)]
+            results[phase] = run_phase(clients, submissions, lambda c, s: fetch(
+                c, 'POST', f'/paper/submit/{s[0]}', expect=(302,), data=s[1]))
+        elif phase == 'export_paper':
+            distinct = list(range(1, min(args.requests, paper_count) + 1))
+            results[phase] = run_phase(clients, [(i % args.users, pid) for i, pid in enumerate(distinct)],
+                                       lambda c, pid: fetch(c, 'GET', f'/export/paper/{pid}'))
+            results['export_paper_cached'] = run_phase(
+                clients, [(u, distinct[i % len(distinct)]) for i, u in enumerate(user_indexes)],
+                lambda c, pid: fetch(c, 'GET', f'/export/paper/{pid}'))
+        elif phase == 'export_wrong':
+            results[phase] = run_phase(clients, [(u, None) for u in range(args.users)],
+                                       lambda c, _: fetch(c, 'GET', '/export/wrong'))
+            results['export_wrong_cached'] = run_phase(clients, [(u, None) for u in user_indexes],
+                                                       lambda c, _: fetch(c, 'GET', '/export/wrong'))
+    stub_server.shutdown()
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    report = {
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'scale': args.scale,
+        'params': {name: getattr(args, name) for name in (
+            'users', 'wrong_per_user', 'seed', 'requests', 'threads', 'llm_latency', 'llm_jitter',
+            'llm_chunk_delay', 'llm_questions', 'llm_fail_rate')},
+        'data': data_info,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':  # PDF进程池用spawn启动，子进程会重新导入__main__
+    main()
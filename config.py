@@ -1,29 +1,152 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()  # 加载环境变量
 
+def mysql_uri(host):
+    return f"mysql+pymysql://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{host}:{os.getenv('MYSQL_PORT', '3306')}/{os.getenv('MYSQL_DB')}?charset=utf8mb4"
+
+def engine_options(uri):
+    """
+    按数据库类型生成连接池参数（主库和只读副本共用）
+    MySQL默认8小时（wait_timeout）断开空闲连接：pool_recycle提前回收，pool_pre_ping取用前检测，避免"MySQL server has gone away"
+    """
+    if uri.startswith('sqlite'):
+        # 本地SQLite：多线程共用连接，写锁等待而不是立即报database is locked
+        return {'connect_args': {'check_same_thread': False, 'timeout': int(os.getenv('DB_LOCK_TIMEOUT', '30'))}}
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),  # 每个进程常驻连接数
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),  # 突发时额外允许的连接数
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),  # 连接池耗尽时等待的秒数
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),  # 连接最长使用时间（秒），需小于MySQL的wait_timeout
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True') == 'True',
+    }
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))  # 单条SELECT的最长执行时间，0为不限
+    if uri.startswith('mysql') and statement_timeout > 0:
+        options['connect_args'] = {
+            'init_command': f'SET SESSION max_execution_time={statement_timeout}',
+            'read_timeout': statement_timeout // 1000 + 5,  # 网络层兜底（秒）
+        }
+    return options
+
 class Config:
     # Flask配置
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev_secret_key_123')  # 生产环境需改为随机字符串
     DEBUG = os.getenv('DEBUG', 'True') == 'True'  # 开发环境True，生产环境False
 
     # MySQL数据库配置（替换为你的服务器MySQL信息）
-    # 从环境变量读取MySQL连接信息
-    SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}:{os.getenv('MYSQL_PORT', '3306')}/{os.getenv('MYSQL_DB')}?charset=utf8mb4"
+    # 从环境变量读取MySQL连接信息；设置DATABASE_URL时优先使用（如基准测试用的sqlite:///bench.db）
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or mysql_uri(os.getenv('MYSQL_HOST'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # 只读副本（可选）：题库/错题本/卷子等只读页面的查询走副本，副本不可用时自动回退主库
+    REPLICA_DATABASE_URI = os.getenv('DATABASE_REPLICA_URL') or (mysql_uri(os.getenv('MYSQL_REPLICA_HOST')) if os.getenv('MYSQL_REPLICA_HOST') else None)
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URI} if REPLICA_DATABASE_URI else {}
+    REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', '30'))  # 副本出错后改走主库的时间
+    REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '5'))  # 用户写入后这段时间内读主库，避免读到复制延迟前的旧数据
 
     # LLM配置（二选一：API调用或本地部署）
     # 选项1：调用LLM API
     LLM_API_TYPE = "deepseek"  # 可改为"openai"、"tongyi"等（目前不支持）
     LLM_API_KEY = os.getenv("LLM_API_KEY")  
-    LLM_API_BASE = "https://api.deepseek.com/v1"
-    LLM_MODEL = "deepseek-chat"  # 模型名称
+    LLM_API_BASE = os.getenv('LLM_API_BASE', "https://api.deepseek.com/v1")  # 基准测试时指向本地桩服务
+    LLM_MODEL = os.getenv('LLM_MODEL', "deepseek-chat")  # 模型名称
+    LLM_TEMPERATURE = float(os.getenv('LLM_TEMPERATURE', '0.7'))  # 控制随机性，0.7适中
 
     # 本地部署LLM，需要可以去除注释，但是未测试
     # LLM_API_TYPE = "local"
     # LLM_MODEL_PATH = "/path/to/local/llama-3"  # 本地模型路径
 
+    # 资料上传（分块读取，超出限制时立即停止）
+    MAX_CONTENT_LENGTH = int(os.getenv('UPLOAD_MAX_BYTES', str(20 * 1024 * 1024)))  # 单次上传的请求体上限，超出时返回413
+    MATERIAL_MAX_BYTES = int(os.getenv('MATERIAL_MAX_BYTES', str(50 * 1024 * 1024)))  # 读取的文件总字节数上限（zip按解压后计算）
+    MATERIAL_MAX_CHARS = int(os.getenv('MATERIAL_MAX_CHARS', '500000'))  # 规范空白后的资料总字数上限
+    UPLOAD_ZIP_MAX_FILES = int(os.getenv('UPLOAD_ZIP_MAX_FILES', '200'))  # zip中txt/md文件数上限
+
+    # 后台出题任务配置（进程内线程池 + 数据库任务表，无需Redis）
+    JOB_MAX_WORKERS = int(os.getenv('JOB_MAX_WORKERS', '4'))  # 每个进程同时执行的出题任务数
+    JOB_MAX_ACTIVE_PER_USER = int(os.getenv('JOB_MAX_ACTIVE_PER_USER', '2'))  # 每个用户排队+执行中的任务上限
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '600'))  # 心跳超过该时间未更新视为进程已退出，重新入队
+    JOB_SWEEP_INTERVAL = int(os.getenv('JOB_SWEEP_INTERVAL', '60'))  # 每隔多少秒更新一次心跳并检查遗留的任务，须小于JOB_STALE_SECONDS
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))  # 每个进程同时进行的LLM请求上限
+
+    # LLM网关（限速、重试、对冲、熔断、多后端）
+    LLM_BACKENDS = os.getenv('LLM_BACKENDS', '')  # JSON列表，为空时只用上面的LLM_API_BASE/LLM_API_KEY/LLM_MODEL
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))  # 单次请求超时（秒）
+    LLM_RATE_LIMIT = float(os.getenv('LLM_RATE_LIMIT', '0'))  # 每个进程每秒最多发起的LLM请求数，0为不限
+    LLM_RATE_BURST = int(os.getenv('LLM_RATE_BURST', '10'))  # 令牌桶容量（允许的突发请求数）
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))  # 429/5xx/超时/连接失败的重试次数
+    LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))  # 第一次重试前的等待（秒），之后每次翻倍
+    LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '8'))
+    LLM_HEDGE_AFTER = float(os.getenv('LLM_HEDGE_AFTER', '0'))  # 超过该秒数没有响应时向另一个后端再发一次，0为关闭
+    LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', '5'))  # 连续失败该次数后熔断
+    LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', '30'))  # 熔断持续秒数，之后放行一个试探请求
+
+    # 长资料分块生成配置
+    LLM_CHUNK_CHARS = int(os.getenv('LLM_CHUNK_CHARS', '6000'))  # 每块资料的最大字符数
+    LLM_CHUNK_WORKERS = int(os.getenv('LLM_CHUNK_WORKERS', '4'))  # 单个任务内并发请求的块数
+    LLM_STREAMING = os.getenv('LLM_STREAMING', 'True') == 'True'  # 流式输出，每解析出一道题就入库
+    # 资料预处理：去掉页眉页脚/页码/重复段落，超出token预算时抽取关键句压缩（不额外调用LLM）
+    MATERIAL_STRIP_BOILERPLATE = os.getenv('MATERIAL_STRIP_BOILERPLATE', 'True') == 'True'
+    MATERIAL_TOKEN_BUDGET = int(os.getenv('MATERIAL_TOKEN_BUDGET', '6000'))  # 每块资料发送的token上限（LLM_CHUNK_CHARS调大时生效），0为不压缩
+    MATERIAL_TOKENS_PER_QUESTION = int(os.getenv('MATERIAL_TOKENS_PER_QUESTION', '300'))  # 一块分到的题目较多时预算至少为 题数×该值
+    JOB_EVENTS_MAX_SECONDS = int(os.getenv('JOB_EVENTS_MAX_SECONDS', '30'))  # 单次SSE连接最长保持时间，超时后浏览器自动重连
+
+    # 出题结果缓存（进程内LRU + 数据库表）
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True') == 'True'
+    LLM_CACHE_MEMORY_SIZE = int(os.getenv('LLM_CACHE_MEMORY_SIZE', '256'))  # 进程内最多缓存的条目数
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))  # 缓存有效期（秒），进程内和数据库两级相同
+    LLM_CACHE_MAX_ROWS = int(os.getenv('LLM_CACHE_MAX_ROWS', '10000'))  # 数据库缓存条目上限
+
+    # 题库JSONL批量导入导出
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))  # 每批插入并提交的题目数
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))  # 导出时每次查询的题目数
+
+    # 题库分页
+    QUESTION_PAGE_SIZE = int(os.getenv('QUESTION_PAGE_SIZE', '20'))
+    QUESTION_PAGE_SIZE_MAX = 100  # JSON接口允许的最大每页条数
+    WRONG_PAGE_SIZE = int(os.getenv('WRONG_PAGE_SIZE', '20'))  # 错题本每页条数
+
+    # PDF导出缓存（按内容哈希命名的文件，超限时按最近使用时间淘汰）
+    EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'review_app_exports'))
+    EXPORT_CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+    EXPORT_CACHE_MAX_FILES = int(os.getenv('EXPORT_CACHE_MAX_FILES', '2000'))
+
+    # 题目/卷子读穿缓存
+    CONTENT_CACHE_SIZE = int(os.getenv('CONTENT_CACHE_SIZE', '4096'))  # 进程内最多缓存的题目/卷子数
+    CONTENT_CACHE_SHARED_PATH = os.getenv('CONTENT_CACHE_SHARED_PATH', '')  # 共享缓存SQLite文件路径，为空则只用进程内缓存
+    CONTENT_CACHE_LOCAL_TTL = int(os.getenv('CONTENT_CACHE_LOCAL_TTL', '30'))  # 未启用共享缓存时进程内条目的有效期（秒），多worker下评分/修改最多这么久后生效
+    CONTENT_CACHE_TTL = int(os.getenv('CONTENT_CACHE_TTL', '86400'))  # 共享缓存条目有效期（秒）
+
+    # 错题复习（间隔重复）
+    REVIEW_BATCH_SIZE = int(os.getenv('REVIEW_BATCH_SIZE', '20'))  # 每次复习/今日复习卷子的题数
+    REVIEW_MASTERED_REPETITIONS = int(os.getenv('REVIEW_MASTERED_REPETITIONS', '3'))  # 连续复习答对该次数视为已掌握
+
+    # 自动组卷
+    PAPER_AUTO_MAX_QUESTIONS = int(os.getenv('PAPER_AUTO_MAX_QUESTIONS', '200'))  # 单张卷子最多题数
+
+    # 题目近似判重（SimHash）
+    QUESTION_DEDUP_ENABLED = os.getenv('QUESTION_DEDUP_ENABLED', 'True') == 'True'
+    QUESTION_DEDUP_DISTANCE = int(os.getenv('QUESTION_DEDUP_DISTANCE', '3'))  # 海明距离阈值，超过3时按段索引可能漏检
+    QUESTION_DEDUP_NGRAM = int(os.getenv('QUESTION_DEDUP_NGRAM', '2'))  # 字符n-gram长度
+    QUESTION_DEDUP_MODE = os.getenv('QUESTION_DEDUP_MODE', 'merge')  # merge：任务结果引用已有题目；drop：直接丢弃
+
+    # PDF渲染（进程池，不阻塞请求线程）
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', '2'))  # 渲染进程数，0表示在请求线程内渲染
+    PDF_BATCH_SIZE = int(os.getenv('PDF_BATCH_SIZE', '500'))  # 错题本每册最多题数，超过则分册并行渲染
+    PDF_MAX_ITEMS = int(os.getenv('PDF_MAX_ITEMS', '10000'))  # 单次导出的题目数上限
+    PDF_RENDER_TIMEOUT = int(os.getenv('PDF_RENDER_TIMEOUT', '60'))  # 单次导出的渲染超时（秒）
+    PDF_EXPORT_JOB_TIMEOUT = int(os.getenv('PDF_EXPORT_JOB_TIMEOUT', '600'))  # 后台导出任务（错题超过PDF_BATCH_SIZE道）的渲染超时（秒）
+    EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', '1'))  # 每个进程同时执行的后台导出任务数，0表示在请求线程内执行
+
+    # 运行指标（/metrics为Prometheus格式，每个请求一行JSON日志），关闭时不注册任何钩子
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+    METRICS_REQUEST_LOG = os.getenv('METRICS_REQUEST_LOG', 'True') == 'True'  # 每个请求输出一行JSON日志
+    METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv('METRICS_N_PLUS_ONE_THRESHOLD', '10'))  # 同一条SQL在一个请求内执行的次数达到该值视为N+1
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # 设置后访问/metrics需带Authorization: Bearer <token>
+
 # 开发环境配置
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -33,9 +156,16 @@ class ProductionConfig(Config):
     DEBUG = False
     SECRET_KEY = os.getenv('SECRET_KEY', os.urandom(24))  # 生产环境用随机密钥
 
-# 选择配置（开发时用DevelopmentConfig，部署时改ProductionConfig）
+# 本地测试配置：SQLite单文件，无需MySQL（APP_CONFIG=sqlite）
+class SQLiteConfig(DevelopmentConfig):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(os.getenv('SQLITE_PATH', 'review_app.db'))
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_BINDS = {}
+
+# 选择配置（开发时用DevelopmentConfig，部署时改ProductionConfig），可用环境变量APP_CONFIG指定
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'sqlite': SQLiteConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
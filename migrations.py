@@ -0,0 +1,228 @@
+from datetime import date, datetime
+from sqlalchemy import bindparam, inspect, text
+from models import db
+
+# 轻量级数据库迁移
+# db.create_all()只会创建不存在的表，不会修改已有的表；
+# 已有表的结构/数据变更按顺序登记在MIGRATIONS里，每个迁移只执行一次（记录在schema_migrations表）。
+# 迁移函数需可重复执行：新库由create_all直接建成最新结构，迁移里的加列/加索引会自动跳过。
+
+schema_migrations = db.Table(
+    'schema_migrations', db.metadata,
+    db.Column('version', db.String(100), primary_key=True),
+    db.Column('applied_time', db.DateTime, nullable=False),
+)
+
+def has_column(table, column):
+    return column in {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+def has_index(table, name):
+    return name in {ix['name'] for ix in inspect(db.engine).get_indexes(table)}
+
+def add_column(table, column, ddl):
+    """给已有表加列（已存在则跳过）"""
+    if not has_column(table, column):
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+def create_index(table, name, columns, unique=False):
+    """给已有表加索引（已存在则跳过）"""
+    if not has_index(table, name):
+        db.session.execute(text(f'CREATE {"UNIQUE " if unique else ""}INDEX {name} ON {table} ({", ".join(columns)})'))
+
+# ---------------------- 迁移列表 ----------------------
+def _generation_job_use_cache():
+    add_column('generation_jobs', 'use_cache', 'BOOLEAN NOT NULL DEFAULT 1')
+
+def _question_keyset_indexes():
+    create_index('questions', 'ix_questions_type_score_id', ['question_type', 'score', 'id'])
+    create_index('questions', 'ix_questions_type_create_time_id', ['question_type', 'create_time', 'id'])
+    create_index('questions', 'ix_questions_score_id', ['score', 'id'])
+    create_index('questions', 'ix_questions_create_time_id', ['create_time', 'id'])
+    create_index('questions', 'ix_questions_creator_score_id', ['creator_id', 'score', 'id'])
+    create_index('questions', 'ix_questions_creator_create_time_id', ['creator_id', 'create_time', 'id'])
+
+def _paper_questions_from_csv():
+    # 把papers.question_ids（逗号分隔字符串）批量转换为paper_questions行，然后删除旧列
+    if not has_column('papers', 'question_ids'):
+        return
+    from models.paper_question import PaperQuestion
+    PaperQuestion.__table__.create(db.engine, checkfirst=True)
+    converted = {row[0] for row in db.session.execute(text('SELECT DISTINCT paper_id FROM paper_questions'))}
+
+    last_id = 0
+    while True:
+        papers = db.session.execute(text(
+            'SELECT id, question_ids, total_score FROM papers WHERE id > :last_id ORDER BY id LIMIT 1000'
+        ), {'last_id': last_id}).all()
+        if not papers:
+            break
+        last_id = papers[-1].id
+
+        parsed = {p.id: [int(x) for x in (p.question_ids or '').split(',') if x.strip().isdigit()] for p in papers}
+        all_ids = {qid for ids in parsed.values() for qid in ids}
+        existing = {row[0] for row in db.session.execute(
+            text('SELECT id FROM questions WHERE id IN :ids').bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(all_ids)})} if all_ids else set()
+
+        rows = []
+        for p in papers:
+            if p.id in converted:
+                continue
+            # 去掉已删除的题目和重复ID，保持原顺序
+            ids = list(dict.fromkeys(qid for qid in parsed[p.id] if qid in existing))
+            total = p.total_score if p.total_score is not None else 100
+            for idx, qid in enumerate(ids, 1):
+                rows.append({'paper_id': p.id, 'question_id': qid, 'position': idx,
+                             'points': total // len(ids) + (1 if idx <= total % len(ids) else 0)})
+        if rows:
+            db.session.execute(PaperQuestion.__table__.insert(), rows)
+        db.session.commit()
+
+    db.session.execute(text('ALTER TABLE papers DROP COLUMN question_ids'))
+
+def _wrong_questions_unique():
+    # 先合并重复的(user_id, question_id)行（次数相加、取最近时间），再加唯一索引
+    duplicates = db.session.execute(text(
+        'SELECT user_id, question_id, MIN(id) AS keep_id, SUM(wrong_count) AS total, MAX(last_wrong_time) AS last_time '
+        'FROM wrong_questions GROUP BY user_id, question_id HAVING COUNT(*) > 1'
+    )).all()
+    for d in duplicates:
+        db.session.execute(text(
+            'UPDATE wrong_questions SET wrong_count = :total, last_wrong_time = :last_time WHERE id = :keep_id'
+        ), {'total': d.total, 'last_time': d.last_time, 'keep_id': d.keep_id})
+        db.session.execute(text(
+            'DELETE FROM wrong_questions WHERE user_id = :user_id AND question_id = :question_id AND id <> :keep_id'
+        ), {'user_id': d.user_id, 'question_id': d.question_id, 'keep_id': d.keep_id})
+    db.session.commit()
+    create_index('wrong_questions', 'uq_wrong_questions_user_question', ['user_id', 'question_id'], unique=True)
+
+def _question_score_sum():
+    # 评分改为存储总和+次数，平均分在读取时计算；用旧的平均分*次数回填总和
+    if not has_column('questions', 'score_sum'):
+        add_column('questions', 'score_sum', 'NUMERIC(12, 1) NOT NULL DEFAULT 3.0')
+        db.session.execute(text('UPDATE questions SET score_sum = COALESCE(score, 3.0) * COALESCE(score_count, 1)'))
+        db.session.commit()
+
+def _question_duplicate_of():
+    # 指纹表由create_all创建；已有题目的指纹和重复标记由 flask --app app dedupe-questions 补齐
+    add_column('questions', 'duplicate_of', 'INTEGER NULL REFERENCES questions(id)')
+
+def _question_search_index():
+    # MySQL建FULLTEXT(ngram)索引；SQLite建FTS5检索表并为已有题目建索引
+    from services.search_service import create_search_index
+    create_search_index()
+
+def _wrong_question_schedule():
+    # 错题本间隔重复字段；已有错题以最后做错时间作为到期时间（即立即到期）
+    add_column('wrong_questions', 'repetitions', 'INTEGER NOT NULL DEFAULT 0')
+    add_column('wrong_questions', 'interval_days', 'INTEGER NOT NULL DEFAULT 0')
+    add_column('wrong_questions', 'ease', 'FLOAT NOT NULL DEFAULT 2.5')
+    add_column('wrong_questions', 'last_review_time', 'DATETIME NULL')
+    if not has_column('wrong_questions', 'next_due_at'):
+        add_column('wrong_questions', 'next_due_at', 'DATETIME NULL')
+        db.session.execute(text('UPDATE wrong_questions SET next_due_at = COALESCE(last_wrong_time, create_time)'))
+        db.session.commit()
+    create_index('wrong_questions', 'ix_wrong_questions_user_due', ['user_id', 'next_due_at', 'id'])
+
+def _question_rand_key():
+    # 自动组卷的随机键：已有题目分批回填随机数
+    if not has_column('questions', 'rand_key'):
+        add_column('questions', 'rand_key', 'INTEGER NOT NULL DEFAULT 0')
+        random_expr = 'FLOOR(RAND() * 2147483648)' if db.engine.dialect.name == 'mysql' else 'ABS(RANDOM()) % 2147483648'
+        last_id = 0
+        while True:
+            max_id = db.session.execute(text(
+                'SELECT MAX(id) FROM (SELECT id FROM questions WHERE id > :last_id ORDER BY id LIMIT 10000) AS batch'
+            ), {'last_id': last_id}).scalar()
+            if max_id is None:
+                break
+            db.session.execute(text(f'UPDATE questions SET rand_key = {random_expr} WHERE id > :last_id AND id <= :max_id'),
+                               {'last_id': last_id, 'max_id': max_id})
+            db.session.commit()
+            last_id = max_id
+    create_index('questions', 'ix_questions_type_rand_key', ['question_type', 'rand_key'])
+
+def _generation_job_tokens():
+    add_column('generation_jobs', 'material_tokens', 'INTEGER NULL')
+    add_column('generation_jobs', 'prompt_tokens', 'INTEGER NULL')
+
+def _generation_job_heartbeat():
+    # 执行中的任务改为按心跳判断是否遗留；已在执行的任务以抢占时间作为最近一次心跳
+    if not has_column('generation_jobs', 'heartbeat_time'):
+        add_column('generation_jobs', 'heartbeat_time', 'DATETIME NULL')
+        db.session.execute(text("UPDATE generation_jobs SET heartbeat_time = start_time WHERE status = 'running'"))
+        db.session.commit()
+
+def _learning_stats():
+    # 学习统计汇总表：用已有的交卷记录一次性回填（之后由交卷时增量更新）
+    from models.learning_stats import UserStats, UserTypeStats, QuestionStats
+    for model in (UserStats, UserTypeStats, QuestionStats):
+        model.__table__.create(db.engine, checkfirst=True)
+    create_index('wrong_questions', 'ix_wrong_questions_user_last_wrong', ['user_id', 'last_wrong_time', 'id'])
+    create_index('wrong_questions', 'ix_wrong_questions_user_wrong_count', ['user_id', 'wrong_count', 'id'])
+    if db.session.execute(text('SELECT COUNT(*) FROM user_stats')).scalar():
+        return
+    db.session.execute(text(
+        'INSERT INTO question_stats (question_id, answered, correct, wrong) '
+        'SELECT question_id, COUNT(*), SUM(CASE WHEN is_correct THEN 1 ELSE 0 END), SUM(CASE WHEN is_correct THEN 0 ELSE 1 END) '
+        'FROM attempt_answers GROUP BY question_id'))
+    db.session.execute(text(
+        'INSERT INTO user_type_stats (user_id, question_type, answered, correct) '
+        'SELECT a.user_id, q.question_type, COUNT(*), SUM(CASE WHEN a.is_correct THEN 1 ELSE 0 END) '
+        'FROM attempt_answers a JOIN questions q ON q.id = a.question_id GROUP BY a.user_id, q.question_type'))
+    db.session.execute(text(
+        'INSERT INTO user_stats (user_id, attempts, answered, correct, score_total, current_streak, best_streak, update_time) '
+        'SELECT user_id, COUNT(*), SUM(question_count), SUM(correct_count), SUM(score), 0, 0, :now '
+        'FROM paper_attempts GROUP BY user_id'), {'now': datetime.utcnow()})
+
+    # 连续天数：按用户逐个日期计算（SQLite的DATE()返回字符串）
+    days = db.session.execute(text(
+        'SELECT user_id, DATE(submit_time) AS day FROM paper_attempts WHERE submit_time IS NOT NULL '
+        'GROUP BY user_id, DATE(submit_time) ORDER BY user_id, day'))
+    updates, state = [], None
+    for user_id, day in days:
+        day = date.fromisoformat(day) if isinstance(day, str) else day
+        if state is None or state['user_id'] != user_id:
+            if state is not None:
+                updates.append(state)
+            state = {'user_id': user_id, 'current_streak': 0, 'best_streak': 0, 'last_active_date': None}
+        previous = state['last_active_date']
+        state['current_streak'] = state['current_streak'] + 1 if previous and (day - previous).days == 1 else 1
+        state['best_streak'] = max(state['best_streak'], state['current_streak'])
+        state['last_active_date'] = day
+    if state is not None:
+        updates.append(state)
+    if updates:
+        db.session.execute(text(
+            'UPDATE user_stats SET current_streak = :current_streak, best_streak = :best_streak, '
+            'last_active_date = :last_active_date WHERE user_id = :user_id'), updates)
+    db.session.commit()
+
+MIGRATIONS = [
+    ('0001_generation_job_use_cache', _generation_job_use_cache),
+    ('0002_question_keyset_indexes', _question_keyset_indexes),
+    ('0003_paper_questions_from_csv', _paper_questions_from_csv),
+    ('0004_wrong_questions_unique', _wrong_questions_unique),
+    ('0005_question_score_sum', _question_score_sum),
+    ('0006_question_duplicate_of', _question_duplicate_of),
+    ('0007_question_search_index', _question_search_index),
+    ('0008_wrong_question_schedule', _wrong_question_schedule),
+    ('0009_question_rand_key', _question_rand_key),
+    ('0010_generation_job_tokens', _generation_job_tokens),
+    ('0011_learning_stats', _learning_stats),
+    ('0012_generation_job_heartbeat', _generation_job_heartbeat),
+]
+
+def upgrade():
+    """执行所有尚未执行的迁移，返回本次执行的版本列表"""
+    schema_migrations.create(db.engine, checkfirst=True)
+    applied = {row.version for row in db.session.execute(db.select(schema_migrations.c.version))}
+    done = []
+    for version, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate()
+        db.session.execute(schema_migrations.insert().values(version=version, applied_time=datetime.utcnow()))
+        db.session.commit()
+        done.append(version)
+    return done
\ No newline at end of file
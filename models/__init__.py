@@ -1,3 +1,49 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import tuple_
+from models.routing import RoutingSession
 
-db = SQLAlchemy()  # 初始化SQLAlchemy实例，用于操作数据库
\ No newline at end of file
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # 初始化SQLAlchemy实例（会话支持读写分离）
+
+def bulk_upsert(table, rows, conflict_columns, increment_columns=(), overwrite_columns=()):
+    """
+    批量插入，唯一键冲突时更新已有行（一条SQL，由调用方提交）
+    MySQL用INSERT ... ON DUPLICATE KEY UPDATE，SQLite/PostgreSQL用INSERT ... ON CONFLICT DO UPDATE，
+    其他数据库先一次性查出已有行再分别更新/插入
+    :param table: 表对象（Model.__table__）
+    :param rows: 字典列表，每个字典包含所有要插入的列
+    :param conflict_columns: 唯一索引的列名
+    :param increment_columns: 冲突时累加的列（原值 + 本次插入值）
+    :param overwrite_columns: 冲突时用本次插入值覆盖的列
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        updates = {c: table.c[c] + stmt.inserted[c] for c in increment_columns}
+        updates.update({c: stmt.inserted[c] for c in overwrite_columns})
+        db.session.execute(stmt.on_duplicate_key_update(updates))
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(rows)
+        updates = {c: table.c[c] + stmt.excluded[c] for c in increment_columns}
+        updates.update({c: stmt.excluded[c] for c in overwrite_columns})
+        db.session.execute(stmt.on_conflict_do_update(index_elements=list(conflict_columns), set_=updates))
+    else:
+        key_columns = [table.c[c] for c in conflict_columns]
+        keys = [tuple(row[c] for c in conflict_columns) for row in rows]
+        existing = {tuple(r) for r in db.session.execute(
+            db.select(*key_columns).where(tuple_(*key_columns).in_(keys)))}
+        for key, row in zip(keys, rows):
+            if key in existing:
+                values = {c: table.c[c] + row[c] for c in increment_columns}
+                values.update({c: row[c] for c in overwrite_columns})
+                condition = db.and_(*[col == value for col, value in zip(key_columns, key)])
+                db.session.execute(table.update().where(condition).values(values))
+            else:
+                db.session.execute(table.insert().values(row))
+                existing.add(key)
\ No newline at end of file
@@ -0,0 +1,38 @@
+from datetime import datetime
+from models import db
+
+class PaperAttempt(db.Model):
+    __tablename__ = 'paper_attempts'  # 对应数据库paper_attempts表（每次交卷一行）
+    __table_args__ = (
+        db.Index('ix_paper_attempts_user_submit_time', 'user_id', 'submit_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), nullable=False)
+    score = db.Column(db.Integer, nullable=False, default=0)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    question_count = db.Column(db.Integer, nullable=False, default=0)
+    submit_time = db.Column(db.DateTime, default=datetime.utcnow)
+
+    answers = db.relationship('AttemptAnswer', backref='attempt', lazy='dynamic')
+
+    def __repr__(self):
+        return f'<PaperAttempt {self.id}: user:{self.user_id} paper:{self.paper_id}>'
+
+class AttemptAnswer(db.Model):
+    __tablename__ = 'attempt_answers'  # 对应数据库attempt_answers表（每次交卷每道题一行）
+    __table_args__ = (
+        db.Index('ix_attempt_answers_user_question', 'user_id', 'question_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    attempt_id = db.Column(db.Integer, db.ForeignKey('paper_attempts.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    user_answer = db.Column(db.Text, nullable=True)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False)
+    points = db.Column(db.Integer, nullable=False, default=0)  # 本题得分
+
+    def __repr__(self):
+        return f'<AttemptAnswer attempt:{self.attempt_id} question:{self.question_id}>'
\ No newline at end of file
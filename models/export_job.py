@@ -0,0 +1,42 @@
+from datetime import datetime
+from models import db
+import json
+
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'  # 对应数据库export_jobs表（后台导出的错题本）
+    __table_args__ = (
+        db.Index('ix_export_jobs_user_status', 'user_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.Enum('queued', 'running', 'succeeded', 'failed'), nullable=False, default='queued')
+    params = db.Column(db.Text, nullable=False)  # 筛选条件的JSON：{"type", "since", "until"}（日期为YYYY-MM-DD）
+    item_count = db.Column(db.Integer, nullable=False, default=0)  # 提交时的错题数
+    cache_key = db.Column(db.String(64), nullable=True)  # 导出缓存键（services/export_cache），完成后用于下载
+    suffix = db.Column(db.String(8), nullable=True)  # .pdf或.zip（错题过多时分册打包）
+    error = db.Column(db.Text, nullable=True)
+    create_time = db.Column(db.DateTime, default=datetime.utcnow)
+    start_time = db.Column(db.DateTime, nullable=True)
+    finish_time = db.Column(db.DateTime, nullable=True)
+
+    # 任务是否已结束（成功或失败）
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def get_params(self):
+        return json.loads(self.params) if self.params else {}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'item_count': self.item_count,
+            'suffix': self.suffix,
+            'error': self.error,
+            'create_time': self.create_time.isoformat() if self.create_time else None,
+            'finish_time': self.finish_time.isoformat() if self.finish_time else None,
+        }
+
+    def __repr__(self):
+        return f'<ExportJob {self.id}: {self.status}>'
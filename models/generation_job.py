@@ -0,0 +1,52 @@
+from datetime import datetime
+from sqlalchemy.dialects.mysql import LONGTEXT
+from models import db
+import json
+
+class GenerationJob(db.Model):
+    __tablename__ = 'generation_jobs'  # 对应数据库generation_jobs表（后台出题任务）
+    __table_args__ = (
+        db.Index('ix_generation_jobs_user_status', 'user_id', 'status'),
+        db.Index('ix_generation_jobs_status_create_time', 'status', 'create_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.Enum('queued', 'running', 'succeeded', 'failed'), nullable=False, default='queued')
+    material = db.Column(db.Text().with_variant(LONGTEXT(), 'mysql'), nullable=False)  # 资料可能超过TEXT的64KB上限
+    question_count = db.Column(db.Integer, nullable=False, default=10)
+    use_cache = db.Column(db.Boolean, nullable=False, default=True)  # False表示"重新生成"，跳过出题缓存
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 已保存的题目数
+    question_ids = db.Column(db.Text, nullable=True)  # 生成题目ID的JSON列表
+    error = db.Column(db.Text, nullable=True)
+    material_tokens = db.Column(db.Integer, nullable=True)  # 资料原文的估算token数
+    prompt_tokens = db.Column(db.Integer, nullable=True)  # 去冗余/压缩后实际发送的资料token数
+    create_time = db.Column(db.DateTime, default=datetime.utcnow)
+    start_time = db.Column(db.DateTime, nullable=True)  # 抢占时间，同时标识这一次执行
+    heartbeat_time = db.Column(db.DateTime, nullable=True)  # 执行中的进程定期更新，超过JOB_STALE_SECONDS未更新时任务被回收
+    finish_time = db.Column(db.DateTime, nullable=True)
+
+    # 任务是否已结束（成功或失败）
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    # 把题目ID的JSON字符串转为列表
+    def get_question_ids(self):
+        return json.loads(self.question_ids) if self.question_ids else []
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'question_count': self.question_count,
+            'question_ids': self.get_question_ids(),
+            'error': self.error,
+            'material_tokens': self.material_tokens,
+            'prompt_tokens': self.prompt_tokens,
+            'create_time': self.create_time.isoformat() if self.create_time else None,
+            'finish_time': self.finish_time.isoformat() if self.finish_time else None,
+        }
+
+    def __repr__(self):
+        return f'<GenerationJob {self.id}: {self.status}>'
\ No newline at end of file
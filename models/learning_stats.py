@@ -0,0 +1,49 @@
+from datetime import datetime
+from models import db
+
+# 学习统计汇总表：交卷时增量更新（services/stats_service.record_attempt_stats），统计页只读这些行，不扫描作答记录
+
+class UserStats(db.Model):
+    __tablename__ = 'user_stats'  # 对应数据库user_stats表（每个用户一行）
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # 交卷次数
+    answered = db.Column(db.Integer, nullable=False, default=0)  # 作答题数
+    correct = db.Column(db.Integer, nullable=False, default=0)  # 答对题数
+    score_total = db.Column(db.Integer, nullable=False, default=0)  # 累计得分
+    current_streak = db.Column(db.Integer, nullable=False, default=0)  # 截至last_active_date连续交卷的天数（UTC日期）
+    best_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_active_date = db.Column(db.Date, nullable=True)  # 最近一次交卷的日期
+    update_time = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserStats user:{self.user_id} {self.correct}/{self.answered}>'
+
+class UserTypeStats(db.Model):
+    __tablename__ = 'user_type_stats'  # 对应数据库user_type_stats表（每个用户每种题型一行）
+    __table_args__ = (
+        db.Index('uq_user_type_stats_user_type', 'user_id', 'question_type', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    question_type = db.Column(db.Enum('single_choice', 'multiple_choice', 'fill_blank'), nullable=False)
+    answered = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserTypeStats user:{self.user_id} {self.question_type} {self.correct}/{self.answered}>'
+
+class QuestionStats(db.Model):
+    __tablename__ = 'question_stats'  # 对应数据库question_stats表（每道被作答过的题一行）
+    __table_args__ = (
+        db.Index('ix_question_stats_wrong', 'wrong', 'question_id'),  # 全站错得最多的题（索引倒序取前N）
+    )
+
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), primary_key=True)
+    answered = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+    wrong = db.Column(db.Integer, nullable=False, default=0)  # answered - correct，单独存储以便建索引
+
+    def __repr__(self):
+        return f'<QuestionStats question:{self.question_id} {self.correct}/{self.answered}>'
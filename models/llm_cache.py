@@ -0,0 +1,16 @@
+from datetime import datetime
+from sqlalchemy.dialects.mysql import LONGTEXT
+from models import db
+
+class LLMCacheEntry(db.Model):
+    __tablename__ = 'llm_cache'  # 对应数据库llm_cache表（LLM出题结果的持久化缓存）
+
+    cache_key = db.Column(db.String(64), primary_key=True)  # sha256(归一化资料+参数)
+    payload = db.Column(db.Text().with_variant(LONGTEXT(), 'mysql'), nullable=False)  # 题目列表JSON
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    create_time = db.Column(db.DateTime, default=datetime.utcnow)
+    expire_time = db.Column(db.DateTime, nullable=False, index=True)
+    last_hit_time = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # 淘汰时按最近使用时间
+
+    def __repr__(self):
+        return f'<LLMCacheEntry {self.cache_key[:12]}>'
\ No newline at end of file
@@ -1,5 +1,7 @@
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 from models import db
+from models.paper_question import PaperQuestion
 
 class Paper(db.Model):
     __tablename__ = 'papers'  # 对应数据库papers表
@@ -7,17 +9,45 @@ class Paper(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     paper_name = db.Column(db.String(100), nullable=False)
     creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    question_ids = db.Column(db.Text, nullable=False)  # 存储逗号分隔的题目ID字符串
     total_score = db.Column(db.Integer, default=100)
     create_time = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # 把题目ID字符串转为列表
+    # 卷子中的题目（按position排序）
+    items = db.relationship('PaperQuestion', order_by=PaperQuestion.position,
+                            cascade='all, delete-orphan', backref='paper')
+
+    # 一次查询取出卷子及其有序题目（JOIN paper_questions和questions）
+    @classmethod
+    def get_with_questions_or_404(cls, paper_id):
+        return cls.query.options(
+            joinedload(cls.items).joinedload(PaperQuestion.question)
+        ).get_or_404(paper_id)
+
+    # 按顺序设置卷子的题目，总分平均分配到每道题（余数分给前面的题）
+    def set_questions(self, question_ids):
+        total = self.total_score if self.total_score is not None else 100
+        count = len(question_ids)
+        self.items = [
+            PaperQuestion(question_id=qid, position=idx, points=total // count + (1 if idx <= total % count else 0))
+            for idx, qid in enumerate(question_ids, 1)
+        ]
+
+    # 卷子中的题目列表（保持卷子顺序）
+    def get_questions(self):
+        return [item.question for item in self.items]
+
+    # 卷子中的题目ID列表
     def get_question_ids(self):
-        return list(map(int, self.question_ids.split(','))) if self.question_ids else []
+        return [item.question_id for item in self.items]
 
     # 计算卷子总题数
     def get_question_count(self):
-        return len(self.get_question_ids())
+        return len(self.items)
+
+    # 反查使用了某道题的卷子
+    @classmethod
+    def papers_using_question(cls, question_id):
+        return cls.query.join(PaperQuestion).filter(PaperQuestion.question_id == question_id).all()
 
     def __repr__(self):
         return f'<Paper {self.id}: {self.paper_name}>'
\ No newline at end of file
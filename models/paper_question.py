@@ -0,0 +1,19 @@
+from models import db
+
+class PaperQuestion(db.Model):
+    __tablename__ = 'paper_questions'  # 对应数据库paper_questions表（卷子与题目的有序关联）
+    __table_args__ = (
+        db.UniqueConstraint('paper_id', 'position', name='uq_paper_questions_paper_position'),
+        db.Index('ix_paper_questions_question_paper', 'question_id', 'paper_id'),  # 反查"哪些卷子用了这道题"
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # 题目在卷子中的顺序（从1开始）
+    points = db.Column(db.Integer, nullable=False, default=0)  # 该题分值
+
+    question = db.relationship('Question')
+
+    def __repr__(self):
+        return f'<PaperQuestion paper:{self.paper_id} #{self.position} question:{self.question_id}>'
\ No newline at end of file
@@ -1,9 +1,26 @@
 from datetime import datetime
 from models import db
 import json
+import random
+
+RAND_KEY_MAX = 2 ** 31  # 随机键取值范围[0, RAND_KEY_MAX)
+
+def _random_key():
+    return random.randrange(RAND_KEY_MAX)
 
 class Question(db.Model):
     __tablename__ = 'questions'  # 对应数据库questions表
+    __table_args__ = (
+        # 题库列表的键集分页索引：(筛选列, 排序列, id)
+        db.Index('ix_questions_type_score_id', 'question_type', 'score', 'id'),
+        db.Index('ix_questions_type_create_time_id', 'question_type', 'create_time', 'id'),
+        db.Index('ix_questions_score_id', 'score', 'id'),
+        db.Index('ix_questions_create_time_id', 'create_time', 'id'),
+        db.Index('ix_questions_creator_score_id', 'creator_id', 'score', 'id'),
+        db.Index('ix_questions_creator_create_time_id', 'creator_id', 'create_time', 'id'),
+        # 自动组卷的随机抽样索引：按题型从随机位置开始顺序读取
+        db.Index('ix_questions_type_rand_key', 'question_type', 'rand_key'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     question_type = db.Column(db.Enum('single_choice', 'multiple_choice', 'fill_blank'), nullable=False)
@@ -12,9 +29,12 @@ class Question(db.Model):
     correct_answer = db.Column(db.Text, nullable=False)
     source_material = db.Column(db.Text, nullable=True)
     creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    score = db.Column(db.Numeric(2, 1), default=3.0)
+    score = db.Column(db.Numeric(2, 1), default=3.0)  # 平均分（仅用于排序/索引，由评分时原子更新）
+    score_sum = db.Column(db.Numeric(12, 1), nullable=False, default=3.0)  # 评分总和（初始视为一次3分）
     score_count = db.Column(db.Integer, default=1)
     create_time = db.Column(db.DateTime, default=datetime.utcnow)
+    rand_key = db.Column(db.Integer, nullable=False, default=_random_key)  # 插入时生成的随机数，用于索引随机抽样
+    duplicate_of = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=True)  # 批量去重时标记的近似重复题（指向保留的题目）
 
     # 把选项JSON字符串转为列表
     def get_options(self):
@@ -22,12 +42,36 @@ class Question(db.Model):
             return json.loads(self.options)
         return []
 
-    # 计算新的平均评分
-    def update_score(self, new_score):
-        total_score = self.score * self.score_count + new_score
-        self.score_count += 1
-        self.score = round(total_score / self.score_count, 1)
-        db.session.commit()
+    # 题目内容（选项已解析），用于JSON接口
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'question_type': self.question_type,
+            'content': self.content,
+            'options': self.get_options(),
+            'correct_answer': self.correct_answer,
+            'score': self.average_score,
+            'score_count': self.score_count,
+        }
+
+    # 平均评分（读取时由总和/次数计算，不累积舍入误差）
+    @property
+    def average_score(self):
+        if not self.score_count:
+            return None
+        return round(float(self.score_sum) / self.score_count, 2)
+
+    # 原子地累加一次评分：在数据库内完成读-改-写，并发评分不会丢失更新（由调用方提交）
+    # score放在SET的第一位：MySQL按顺序求值，后面的列会读到已更新的值
+    @classmethod
+    def apply_rating(cls, question_id, new_score):
+        db.session.execute(
+            db.update(cls).where(cls.id == question_id).ordered_values(
+                (cls.score, (cls.score_sum + new_score) / (cls.score_count + 1)),
+                (cls.score_sum, cls.score_sum + new_score),
+                (cls.score_count, cls.score_count + 1),
+            ).execution_options(synchronize_session=False)
+        )
 
     def __repr__(self):
         return f'<Question {self.id}: {self.content[:20]}...>'
\ No newline at end of file
@@ -0,0 +1,16 @@
+from models import db
+
+class QuestionFingerprint(db.Model):
+    __tablename__ = 'question_fingerprints'  # 对应数据库question_fingerprints表（题目的SimHash近似判重索引）
+
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), primary_key=True)
+    question_type = db.Column(db.Enum('single_choice', 'multiple_choice', 'fill_blank'), nullable=False)
+    simhash = db.Column(db.BigInteger, nullable=False)  # 64位SimHash（按有符号整数存储）
+    # SimHash按16位切成4段分别建索引：海明距离<=3的两道题至少有一段完全相同，查找时只扫这4个索引的等值命中
+    band0 = db.Column(db.Integer, nullable=False, index=True)
+    band1 = db.Column(db.Integer, nullable=False, index=True)
+    band2 = db.Column(db.Integer, nullable=False, index=True)
+    band3 = db.Column(db.Integer, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<QuestionFingerprint question:{self.question_id} simhash:{self.simhash}>'
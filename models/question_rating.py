@@ -0,0 +1,18 @@
+from datetime import datetime
+from models import db
+
+class QuestionRating(db.Model):
+    __tablename__ = 'question_ratings'  # 对应数据库question_ratings表（每个用户对每道题最多评一次）
+    __table_args__ = (
+        db.Index('uq_question_ratings_user_question', 'user_id', 'question_id', unique=True),
+        db.Index('ix_question_ratings_question', 'question_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    score = db.Column(db.Numeric(2, 1), nullable=False)
+    create_time = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<QuestionRating user:{self.user_id} question:{self.question_id} score:{self.score}>'
\ No newline at end of file
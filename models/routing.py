@@ -0,0 +1,84 @@
+from contextvars import ContextVar
+from functools import wraps
+from flask import g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import OperationalError
+import threading
+import time
+
+# 读写分离：被@replica_reads装饰的只读视图中，查询路由到SQLALCHEMY_BINDS['replica']；
+# 有待写入的对象、副本最近出过错、或用户刚写入过（复制可能有延迟）时仍走主库。
+
+REPLICA_BIND = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+_state_lock = threading.Lock()
+_replica_down_until = 0.0
+_stats = {'primary_reads': 0, 'replica_reads': 0, 'replica_failures': 0}
+
+def _count(name):
+    with _state_lock:
+        _stats[name] += 1
+
+class RoutingSession(Session):
+    """按上下文选择主库或只读副本的会话"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _use_replica.get() and not self._flushing and not (self.new or self.dirty or self.deleted):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        super().commit()
+        if has_request_context():
+            g.db_written = True  # 由after_request记录写入时间
+
+def _mark_replica_down(retry_seconds):
+    global _replica_down_until
+    with _state_lock:
+        _replica_down_until = time.monotonic() + retry_seconds
+        _stats['replica_failures'] += 1
+
+def replica_reads(view):
+    """
+    只读视图装饰器：查询走只读副本；副本报连接类错误时标记为不可用，回滚后在主库上重新执行一次视图
+    视图内不能有写操作
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import current_app
+        from models import db
+        config = current_app.config
+        if REPLICA_BIND not in config.get('SQLALCHEMY_BINDS', {}) or time.monotonic() < _replica_down_until or \
+                session.get('db_write_at', 0) > time.time() - config['REPLICA_STICKY_SECONDS']:
+            _count('primary_reads')
+            return view(*args, **kwargs)
+
+        token = _use_replica.set(True)
+        try:
+            response = view(*args, **kwargs)
+            _count('replica_reads')
+            return response
+        except OperationalError:
+            db.session.rollback()
+            _mark_replica_down(config['REPLICA_RETRY_SECONDS'])
+        finally:
+            _use_replica.reset(token)
+        _count('primary_reads')
+        return view(*args, **kwargs)
+    return wrapper
+
+def record_write(response):
+    """after_request钩子：本次请求有提交时记下时间，之后一段时间内该用户的只读视图读主库"""
+    from flask import current_app
+    if g.get('db_written') and REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {}):
+        session['db_write_at'] = time.time()
+    return response
+
+def routing_stats():
+    with _state_lock:
+        stats = dict(_stats)
+    stats['replica_available'] = time.monotonic() >= _replica_down_until
+    return stats
@@ -1,8 +1,14 @@
 from datetime import datetime
-from models import db
+from models import db, bulk_upsert
 
 class WrongQuestion(db.Model):
     __tablename__ = 'wrong_questions'  # 对应数据库wrong_questions表
+    __table_args__ = (
+        db.Index('uq_wrong_questions_user_question', 'user_id', 'question_id', unique=True),  # 每个用户每道题只有一行
+        db.Index('ix_wrong_questions_user_due', 'user_id', 'next_due_at', 'id'),  # 到期复习查询（索引范围扫描）
+        db.Index('ix_wrong_questions_user_last_wrong', 'user_id', 'last_wrong_time', 'id'),  # 错题本键集分页
+        db.Index('ix_wrong_questions_user_wrong_count', 'user_id', 'wrong_count', 'id'),  # 错得最多的题
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -11,11 +17,28 @@ class WrongQuestion(db.Model):
     last_wrong_time = db.Column(db.DateTime, default=datetime.utcnow)
     create_time = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # 增加错题次数
+    # 间隔重复（SM-2）调度状态
+    repetitions = db.Column(db.Integer, nullable=False, default=0)  # 连续答对的复习次数
+    interval_days = db.Column(db.Integer, nullable=False, default=0)  # 当前复习间隔（天）
+    ease = db.Column(db.Float, nullable=False, default=2.5)  # 难度系数（最低1.3）
+    next_due_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # 下次复习时间
+    last_review_time = db.Column(db.DateTime, nullable=True)
+
+    # 增加错题次数（由调用方提交）
     def increment_count(self):
         self.wrong_count += 1
         self.last_wrong_time = datetime.utcnow()
-        db.session.commit()
+
+    # 批量记录错题：新错题插入，已有错题次数+1并重新进入复习队列（一条upsert语句，由调用方提交）
+    @classmethod
+    def record_wrong(cls, user_id, question_ids, now=None):
+        now = now or datetime.utcnow()
+        rows = [{'user_id': user_id, 'question_id': qid, 'wrong_count': 1,
+                 'last_wrong_time': now, 'create_time': now,
+                 'repetitions': 0, 'interval_days': 0, 'ease': 2.5, 'next_due_at': now}
+                for qid in dict.fromkeys(question_ids)]
+        bulk_upsert(cls.__table__, rows, ['user_id', 'question_id'], increment_columns=['wrong_count'],
+                    overwrite_columns=['last_wrong_time', 'repetitions', 'interval_days', 'next_due_at'])
 
     def __repr__(self):
         return f'<WrongQuestion user:{self.user_id} question:{self.question_id}>'
\ No newline at end of file
@@ -0,0 +1,106 @@
+from sqlalchemy import and_, exists, not_
+from config import Config
+from models import db
+from models.attempt import AttemptAnswer
+from models.paper import Paper
+from models.question import Question, RAND_KEY_MAX
+from models.wrong_question import WrongQuestion
+from services.material_service import allocate_counts
+from services.question_service import QUESTION_TYPES
+import random
+
+# 自动组卷：按题型分层，每层从随机位置rand_key >= start开始沿(question_type, rand_key)索引顺序读取所需题数，
+# 不够时从头回绕。rand_key在插入时独立随机生成，所以任意一段连续的rand_key就是该题型的一个均匀随机样本，
+# 每层只需一两次索引范围扫描，与题库大小无关；同样的种子和题库得到同样的卷子。
+
+DEFAULT_RATIO = (4, 3, 3)  # 单选:多选:填空，与出题提示词一致
+
+class AssemblyError(Exception):
+    """组卷参数不合法"""
+    pass
+
+def _mastered(user_id):
+    # 已掌握：做卷子时答对过，且不在错题本中（或错题复习已连续答对REVIEW_MASTERED_REPETITIONS次）
+    answered_correctly = exists().where(and_(
+        AttemptAnswer.user_id == user_id,
+        AttemptAnswer.question_id == Question.id,
+        AttemptAnswer.is_correct.is_(True),
+    ))
+    still_learning = exists().where(and_(
+        WrongQuestion.user_id == user_id,
+        WrongQuestion.question_id == Question.id,
+        WrongQuestion.repetitions < Config.REVIEW_MASTERED_REPETITIONS,
+    ))
+    return and_(answered_correctly, not_(still_learning))
+
+def _sample(base, question_type, count, rng, exclude_ids):
+    # 从随机起点沿索引读取count道，不够时从0回绕到起点
+    query = base.filter(Question.question_type == question_type)
+    if exclude_ids:
+        query = query.filter(Question.id.notin_(exclude_ids))
+    start = rng.randrange(RAND_KEY_MAX)
+    ids = [row.id for row in query.filter(Question.rand_key >= start)
+           .order_by(Question.rand_key).limit(count).with_entities(Question.id)]
+    if len(ids) < count:
+        ids += [row.id for row in query.filter(Question.rand_key < start)
+                .order_by(Question.rand_key).limit(count - len(ids)).with_entities(Question.id)]
+    return ids
+
+def sample_questions(count, ratio=DEFAULT_RATIO, min_score=None, creator_id=None,
+                     exclude_mastered_for=None, seed=None):
+    """
+    按题型比例随机抽题
+    :param count: 题目总数
+    :param ratio: 单选/多选/填空的比例
+    :param min_score: 最低平均评分
+    :param creator_id: 只抽该用户创建的题目
+    :param exclude_mastered_for: 排除该用户已掌握的题目
+    :param seed: 随机种子（相同种子、相同题库得到相同结果）
+    :return: 题目ID列表（按题型分组）
+    """
+    if not 0 < count <= Config.PAPER_AUTO_MAX_QUESTIONS:
+        raise AssemblyError(f'题目数必须在1-{Config.PAPER_AUTO_MAX_QUESTIONS}之间')
+    if len(ratio) != len(QUESTION_TYPES) or any(r < 0 for r in ratio) or sum(ratio) <= 0:
+        raise AssemblyError('题型比例不合法')
+
+    base = Question.query.filter(Question.duplicate_of.is_(None))
+    if min_score is not None:
+        base = base.filter(Question.score >= min_score)
+    if creator_id:
+        base = base.filter(Question.creator_id == creator_id)
+    if exclude_mastered_for:
+        base = base.filter(not_(_mastered(exclude_mastered_for)))
+
+    rng = random.Random(seed)
+    wanted = dict(zip(QUESTION_TYPES, allocate_counts(list(ratio), count)))
+    selected = {t: _sample(base, t, n, rng, []) if n else [] for t, n in wanted.items()}
+
+    # 某个题型题目不足时，由其他（比例不为0且题目充足的）题型补齐
+    shortfall = count - sum(len(ids) for ids in selected.values())
+    for t, r in zip(QUESTION_TYPES, ratio):
+        if shortfall <= 0:
+            break
+        if r == 0 or len(selected[t]) < wanted[t]:
+            continue
+        extra = _sample(base, t, shortfall, rng, selected[t])
+        selected[t] += extra
+        shortfall -= len(extra)
+    return [qid for t in QUESTION_TYPES for qid in selected[t]]
+
+def assemble_paper(user_id, paper_name, count, seed=None, **filters):
+    """
+    自动组卷并保存
+    :return: (Paper对象, 实际使用的种子)；没有符合条件的题目时抛出AssemblyError
+    """
+    if not paper_name:
+        raise AssemblyError('请输入卷子名称')
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    question_ids = sample_questions(count, seed=seed, **filters)
+    if not question_ids:
+        raise AssemblyError('没有符合条件的题目')
+    paper = Paper(paper_name=paper_name, creator_id=user_id, total_score=100)
+    paper.set_questions(question_ids)
+    db.session.add(paper)
+    db.session.commit()
+    return paper, seed
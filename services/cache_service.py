@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError
+from config import Config
+from models import db
+from models.llm_cache import LLMCacheEntry
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    """线程安全的进程内LRU缓存，超过maxsize时淘汰最久未使用的条目；ttl（秒）不为None时条目到期后视为未命中（set可为单个条目指定ttl）"""
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # 键 -> (过期时间, 值)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[0] is None or item[0] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl if ttl is not None else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+# ---------------------- LLM出题结果缓存 ----------------------
+# 两级缓存：进程内LRU + 数据库llm_cache表（带TTL，按最近使用时间淘汰），两级都在LLM_CACHE_TTL后过期
+# 键为sha256(归一化资料, 题目数, 模型, 提示词版本, temperature)，同一份资料重复上传直接返回
+
+_memory_cache = LRUCache(Config.LLM_CACHE_MEMORY_SIZE, Config.LLM_CACHE_TTL)
+_counter_lock = threading.Lock()
+_counters = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'bypass': 0, 'stores': 0}
+
+def _count(name):
+    with _counter_lock:
+        _counters[name] += 1
+
+def normalize_material(material):
+    """全角转半角、合并连续空白，使排版差异不影响缓存命中"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', material)).strip()
+
+def generation_cache_key(material, question_count, model, prompt_version, temperature):
+    raw = json.dumps([normalize_material(material), question_count, model, prompt_version, temperature], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def get_cached_questions(key):
+    """按键读取缓存的题目列表，未命中返回None"""
+    questions = _memory_cache.get(key)
+    if questions is not None:
+        _count('memory_hits')
+        return questions
+
+    try:
+        entry = db.session.get(LLMCacheEntry, key)
+        if entry is None or entry.expire_time < datetime.utcnow():
+            _count('misses')
+            return None
+        entry.hit_count += 1
+        entry.last_hit_time = datetime.utcnow()
+        questions = json.loads(entry.payload)
+        remaining = (entry.expire_time - entry.last_hit_time).total_seconds()
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.warning("读取LLM缓存失败：%s", e)
+        _count('misses')
+        return None
+
+    _memory_cache.set(key, questions, remaining)  # 进程内条目与数据库条目同时过期
+    _count('db_hits')
+    return questions
+
+def set_cached_questions(key, questions):
+    """写入两级缓存，并顺带清理过期/超量的数据库条目"""
+    _memory_cache.set(key, questions)
+    now = datetime.utcnow()
+    try:
+        db.session.merge(LLMCacheEntry(
+            cache_key=key,
+            payload=json.dumps(questions, ensure_ascii=False),
+            hit_count=0,
+            create_time=now,
+            expire_time=now + timedelta(seconds=Config.LLM_CACHE_TTL),
+            last_hit_time=now
+        ))
+        db.session.commit()
+        _evict_db_entries()
+        _count('stores')
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.warning("写入LLM缓存失败：%s", e)
+
+def _evict_db_entries():
+    # 删除过期条目；总数超过上限时删除最久未使用的条目
+    LLMCacheEntry.query.filter(LLMCacheEntry.expire_time < datetime.utcnow()).delete(synchronize_session=False)
+    cutoff = db.session.query(LLMCacheEntry.last_hit_time).order_by(
+        LLMCacheEntry.last_hit_time.desc()).offset(Config.LLM_CACHE_MAX_ROWS).limit(1).scalar()
+    if cutoff is not None:
+        LLMCacheEntry.query.filter(LLMCacheEntry.last_hit_time <= cutoff).delete(synchronize_session=False)
+    db.session.commit()
+
+def record_cache_bypass():
+    _count('bypass')
+
+def generation_cache_stats():
+    with _counter_lock:
+        stats = dict(_counters)
+    stats['memory'] = _memory_cache.stats()
+    return stats
\ No newline at end of file
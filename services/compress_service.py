@@ -0,0 +1,263 @@
+from collections import Counter
+from config import Config
+import math
+import re
+from services.material_service import (HEADING_RE, SENTENCE_RE, PARAGRAPH_RE, split_blocks, split_material,
+                                       allocate_counts, normalize_for_dedup)
+
+# 资料预处理：发送给LLM之前估算token数，去掉页眉页脚、页码、版权声明和重复段落，再切块；
+# 单块仍超出预算时在块内按句子抽取式压缩（TF-IDF打分，中文按相邻两字切词），整个过程不调用LLM。
+# 预算按块计算：长资料仍切成多块并发出题，压缩只精简每块内容，不丢掉后面的章节。
+
+# 每个字符约占的token数：(模型名前缀, 中日韩字符, 其他字符)，按官方文档的换算估计，未列出的模型用DEFAULT_TOKEN_RATIO
+TOKEN_RATIOS = (
+    ('deepseek', 0.6, 0.3),
+    ('qwen', 0.65, 0.25),
+    ('gpt-4o', 0.75, 0.25),
+    ('gpt-', 1.0, 0.25),
+)
+DEFAULT_TOKEN_RATIO = (0.7, 0.3)
+
+_CJK_RE = re.compile('[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')  # 含全角标点
+_CJK_RUN_RE = re.compile('[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_WORD_RE = re.compile(r'[a-z0-9]+(?:[.\-][a-z0-9]+)*')
+
+# 单独成行、带页码修饰的页码（第N页、-N-、Page N）和版权声明等（只匹配较短的行）
+BOILERPLATE_RE = re.compile(
+    r'^\s*(第\s*\d+\s*页(\s*[/／，,]?\s*共\s*\d+\s*页)?|[-—–]+\s*\d{1,4}\s*[-—–]+'
+    r'|page\s*\d+(\s*(of|/)\s*\d+)?'
+    r'|.{0,40}(版权所有|all rights reserved|copyright\s*(©|\(c\))|仅供.{0,10}(学习|参考|使用)|未经.{0,10}(许可|授权)).{0,40})\s*$',
+    re.IGNORECASE)
+# 只有数字或"N/M"的行可能是年份、表格单元格，只在页边界（换页符前后）或呈"N/M"逐页编号规律时才当作页码
+BARE_PAGE_NUMBER_RE = re.compile(r'^\s*(\d{1,4})(\s*/\s*(\d{1,4}))?\s*$')
+BOILERPLATE_LINE_CHARS = 40  # 不超过该长度、重复出现的行视为页眉页脚
+BOILERPLATE_MIN_REPEATS = 3
+DUPLICATE_MIN_CHARS = 20  # 去重的段落至少这么长（去掉空白标点后），避免误删"解："之类的短段落
+
+def _token_ratio(model):
+    model = (model or '').lower()
+    for prefix, cjk, other in TOKEN_RATIOS:
+        if model.startswith(prefix):
+            return cjk, other
+    return DEFAULT_TOKEN_RATIO
+
+def estimate_tokens(text, model=None):
+    """估算text在model（默认Config.LLM_MODEL）下的token数"""
+    if not text:
+        return 0
+    cjk_ratio, other_ratio = _token_ratio(model or Config.LLM_MODEL)
+    cjk = len(_CJK_RE.findall(text))
+    return math.ceil(cjk * cjk_ratio + (len(text) - cjk) * other_ratio)
+
+# ---------------------- 去除冗余 ----------------------
+def _bare_page_numbers(lines):
+    """
+    返回只有数字的行中被判定为页码的行号：紧挨换页符（\\f）的行，
+    或者"N/M"形式、同一个M至少出现BOILERPLATE_MIN_REPEATS次且前后都不是数字行的行（表格中的分数通常连续出现）
+    """
+    numeric = [BARE_PAGE_NUMBER_RE.match(line.replace('\f', '')) for line in lines]
+    page_breaks = [i for i, line in enumerate(lines) if '\f' in line]
+    result = {j for i in page_breaks for j in (i - 1, i, i + 1) if 0 <= j < len(lines) and numeric[j]}
+
+    def isolated(i):
+        return not (i > 0 and numeric[i - 1]) and not (i + 1 < len(lines) and numeric[i + 1])
+
+    fractions = [i for i, match in enumerate(numeric) if match and match.group(3) and isolated(i)]
+    totals = Counter(numeric[i].group(3) for i in fractions)
+    result.update(i for i in fractions if totals[numeric[i].group(3)] >= BOILERPLATE_MIN_REPEATS)
+    return result
+
+def strip_boilerplate(material):
+    """
+    去掉页码/版权声明行、重复出现的短行（PDF转文字后的页眉页脚，只保留第一次出现）和重复的段落
+    标题行和"答案：A"这类带冒号的短行即使重复也保留
+    """
+    lines = material.split('\n')
+    repeats = Counter(normalize_for_dedup(line) for line in lines if len(line.strip()) <= BOILERPLATE_LINE_CHARS)
+    page_numbers = _bare_page_numbers(lines)
+    kept, seen_lines = [], set()
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if i in page_numbers or (stripped and BOILERPLATE_RE.match(stripped)):
+            continue
+        key = normalize_for_dedup(stripped)
+        if (key and len(stripped) <= BOILERPLATE_LINE_CHARS and repeats[key] >= BOILERPLATE_MIN_REPEATS
+                and not HEADING_RE.match(stripped) and not re.search(r'[:：]\s*\S', stripped)):
+            if key in seen_lines:
+                continue
+            seen_lines.add(key)
+        kept.append(line)
+
+    paragraphs, seen_paragraphs = [], set()
+    for paragraph in PARAGRAPH_RE.split('\n'.join(kept)):
+        key = normalize_for_dedup(paragraph)
+        if not key:
+            continue
+        if len(key) >= DUPLICATE_MIN_CHARS:
+            if key in seen_paragraphs:
+                continue
+            seen_paragraphs.add(key)
+        paragraphs.append(paragraph.strip('\n'))
+    return '\n\n'.join(paragraphs)
+
+# ---------------------- 抽取式压缩 ----------------------
+def _terms(text):
+    """切词：英文/数字按单词，中文按相邻两字（单字成段时取单字），不依赖分词词典"""
+    text = text.lower()
+    terms = _WORD_RE.findall(text)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+def _parse_sections(material):
+    """把资料拆成章节：[(标题或None, [(段落序号, 句子), ...]), ...]"""
+    sections = [[None, []]]
+    for index, block in enumerate(split_blocks(material)):
+        first, _, rest = block.partition('\n')
+        if HEADING_RE.match(first) and len(first.strip()) <= 80:
+            sections.append([first.strip(), []])
+            block = rest
+        for sentence in SENTENCE_RE.split(block):
+            if sentence.strip():
+                sections[-1][1].append((index, sentence.strip()))
+    return [section for section in sections if section[0] or section[1]]
+
+def _score_sentences(sentences):
+    """
+    按与全文TF-IDF重心的余弦相似度打分（TextRank中心度的线性时间近似），段落首句略加权
+    :return: 与sentences一一对应的分数列表
+    """
+    term_lists = [_terms(text) for _, text in sentences]
+    df = Counter(term for terms in term_lists for term in set(terms))
+    n = len(sentences)
+    idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+    vectors = []
+    centroid = {}
+    for terms in term_lists:
+        vector = {term: tf * idf[term] for term, tf in Counter(terms).items()}
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        for term, w in vector.items():
+            w /= norm
+            vector[term] = w
+            centroid[term] = centroid.get(term, 0.0) + w
+        vectors.append(vector)
+    centroid_norm = math.sqrt(sum(w * w for w in centroid.values())) or 1.0
+    scores = []
+    previous_block = None
+    for (block, _), vector in zip(sentences, vectors):
+        score = sum(w * centroid.get(term, 0.0) for term, w in vector.items()) / centroid_norm
+        if block != previous_block:
+            score *= 1.2
+        previous_block = block
+        scores.append(score)
+    return scores
+
+def extract_to_budget(material, max_tokens, model=None):
+    """
+    从资料中选出最重要的句子，使估算token数不超过max_tokens，按原文顺序拼回
+    各章节按原有篇幅比例分配预算（出题时题目也按篇幅分配到各部分），用不完的预算再按分数全局分配；
+    章节有句子入选时才保留其标题
+    """
+    sections = _parse_sections(material)
+    sentences = [(block, text) for _, items in sections for block, text in items]
+    if not sentences:
+        return material
+    scores = iter(_score_sentences(sentences))
+    # 候选句：(分数, token数, 章节序号, 句子序号)；token数含与前文之间的分隔符
+    candidates, section_tokens, keys = [], [], []
+    position = 0
+    for s, (heading, items) in enumerate(sections):
+        total = 0
+        for block, text in items:
+            cost = estimate_tokens(text, model) + 1
+            candidates.append((next(scores), cost, s, position))
+            keys.append(normalize_for_dedup(text))
+            total += cost
+            position += 1
+        section_tokens.append(total)
+    total_tokens = sum(section_tokens) or 1
+    heading_cost = [estimate_tokens(heading, model) + 1 if heading else 0 for heading, _ in sections]
+
+    chosen, opened, chosen_keys = set(), set(), set()
+    remaining = max_tokens
+
+    def take(candidate, limit):
+        # 入选则返回占用的token数；放不下或与已选句子重复时返回0
+        score, cost, s, index = candidate
+        cost += heading_cost[s] if s not in opened else 0
+        if cost > limit or keys[index] in chosen_keys:
+            return 0
+        chosen.add(index)
+        opened.add(s)
+        chosen_keys.add(keys[index])
+        return cost
+
+    ranked = sorted(candidates, key=lambda c: -c[0])
+    section_left = [max_tokens * tokens / total_tokens for tokens in section_tokens]
+    for candidate in ranked:
+        s = candidate[2]
+        used = take(candidate, min(section_left[s], remaining))
+        section_left[s] -= used
+        remaining -= used
+    for candidate in ranked:
+        if candidate[3] not in chosen:
+            remaining -= take(candidate, remaining)
+
+    parts = []
+    position = 0
+    for s, (heading, items) in enumerate(sections):
+        if s not in opened:
+            position += len(items)
+            continue
+        if heading:
+            parts.append((None, heading))
+        for block, text in items:
+            if position in chosen:
+                parts.append((block, text))
+            position += 1
+    return _join(parts)
+
+def _join(parts):
+    # 同一段落的句子直接相连（英文句子之间加空格），不同段落之间空一行
+    out, previous = [], object()
+    for block, text in parts:
+        if out:
+            if block is None or block != previous:
+                out.append('\n\n')
+            elif out[-1][-1:].isascii() and text[:1].isascii():
+                out.append(' ')
+        out.append(text)
+        previous = block
+    return ''.join(out)
+
+def token_budget(question_count):
+    """一块资料的token预算（question_count为该块分到的题数），0表示不压缩"""
+    if Config.MATERIAL_TOKEN_BUDGET <= 0:
+        return 0
+    return max(Config.MATERIAL_TOKEN_BUDGET, question_count * Config.MATERIAL_TOKENS_PER_QUESTION)
+
+def prepare_material(material, question_count, model=None):
+    """
+    出题前的资料预处理：去冗余，按LLM_CHUNK_CHARS切块并按篇幅分配题数，单块超出预算时块内抽取式压缩
+    :return: ([(块内容, 题数), ...]（不含分到0题的块）,
+              统计字典{'material_tokens', 'prompt_tokens', 'tokens_saved', 'compressed', 'chunks'})
+    """
+    before = estimate_tokens(material, model)
+    prepared = strip_boilerplate(material) if Config.MATERIAL_STRIP_BOILERPLATE else material
+    tasks, compressed = [], False
+    if prepared.strip():
+        chunks = split_material(prepared, Config.LLM_CHUNK_CHARS)
+        for chunk, count in zip(chunks, allocate_counts([len(chunk) for chunk in chunks], question_count)):
+            if count <= 0:
+                continue
+            budget = token_budget(count)
+            if budget and estimate_tokens(chunk, model) > budget:
+                chunk = extract_to_budget(chunk, budget, model)
+                compressed = True
+            tasks.append((chunk, count))
+    after = sum(estimate_tokens(chunk, model) for chunk, _ in tasks)
+    return tasks, {'material_tokens': before, 'prompt_tokens': after, 'tokens_saved': max(before - after, 0),
+                   'compressed': compressed, 'chunks': len(tasks)}
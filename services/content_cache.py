@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from config import Config
+from models import db
+from models.paper import Paper
+from models.paper_question import PaperQuestion
+from models.question import Question
+from services.cache_service import LRUCache
+from services.grading_service import normalize_answer
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 题目/卷子的读穿缓存：考试时大量学生同时打开同一张卷子，不必每个请求都查数据库。
+# 一级：进程内LRU；二级（可选）：CONTENT_CACHE_SHARED_PATH指定的SQLite文件，同一台机器上的所有worker共享。
+# 版本号：题目被评分/修改后调用invalidate_*递增版本号（启用二级缓存时存放在共享文件中，所有worker可见），
+# 缓存键带版本号，旧条目不会再被命中。未启用二级缓存时版本号只在本进程内递增，
+# 进程内条目CONTENT_CACHE_LOCAL_TTL秒后过期，其他worker最多这么久之后读到新内容。
+# 本进程的版本号取自递增序号，只保留最近CONTENT_CACHE_SIZE个键；被丢弃的键统一按最后丢弃的序号读取，
+# 这个序号之前写入的条目都不会再命中（未失效过的键多一次加载），版本号表不会无限增长。
+# 缓存的字典在多个请求间共享，调用方只能读取，不能修改。
+
+_local = LRUCache(Config.CONTENT_CACHE_SIZE, None if Config.CONTENT_CACHE_SHARED_PATH else Config.CONTENT_CACHE_LOCAL_TTL)
+_local_versions = OrderedDict()  # 未启用二级缓存时的版本号（按失效先后排列）
+_version_seq = 0  # 最近一次失效分配的序号
+_version_floor = 0  # 已丢弃的键的版本号
+_version_lock = threading.Lock()
+_counter_lock = threading.Lock()
+_counters = {'local_hits': 0, 'shared_hits': 0, 'db_loads': 0}
+
+def _count(name, n=1):
+    if n:
+        with _counter_lock:
+            _counters[name] += n
+
+class SharedStore:
+    """基于SQLite文件的跨进程缓存（WAL模式，读不阻塞写），每个线程一个连接"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = threading.local()
+        self._sets = 0
+
+    def _db(self):
+        conn = getattr(self._conn, 'value', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, payload TEXT NOT NULL, expire REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS versions (key TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+            self._conn.value = conn
+        return conn
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        rows = self._db().execute(
+            f'SELECT key, payload FROM entries WHERE key IN ({",".join("?" * len(keys))}) AND expire > ?',
+            [*keys, time.time()]).fetchall()
+        return {key: json.loads(payload) for key, payload in rows}
+
+    def set_many(self, items, ttl):
+        expire = time.time() + ttl
+        conn = self._db()
+        conn.executemany('INSERT OR REPLACE INTO entries (key, payload, expire) VALUES (?, ?, ?)',
+                         [(key, json.dumps(value, ensure_ascii=False), expire) for key, value in items.items()])
+        self._sets += 1
+        if self._sets % 100 == 0:  # 顺带清理过期条目
+            conn.execute('DELETE FROM entries WHERE expire <= ?', (time.time(),))
+
+    def get_versions(self, keys):
+        if not keys:
+            return {}
+        rows = self._db().execute(
+            f'SELECT key, version FROM versions WHERE key IN ({",".join("?" * len(keys))})', list(keys)).fetchall()
+        return dict(rows)
+
+    def bump_versions(self, keys):
+        self._db().executemany(
+            'INSERT INTO versions (key, version) VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET version = version + 1',
+            [(key,) for key in keys])
+
+_shared = SharedStore(Config.CONTENT_CACHE_SHARED_PATH) if Config.CONTENT_CACHE_SHARED_PATH else None
+
+def _versions(keys):
+    if _shared is not None:
+        return _shared.get_versions(keys)
+    with _version_lock:
+        return {key: _local_versions.get(key, _version_floor) for key in keys}
+
+def _read_through(keys, load):
+    """
+    按"键@版本号"依次查进程内LRU、共享缓存，剩余的调用load一次性从数据库加载
+    :param keys: 键列表（如question:1）
+    :param load: 函数，接收未命中的键列表，返回{键: 字典}
+    :return: {键: 字典}
+    """
+    versions = _versions(keys)
+    stamped = {key: f'{key}@{versions.get(key, 0)}' for key in keys}
+    result, missing = {}, []
+    for key in keys:
+        value = _local.get(stamped[key])
+        if value is None:
+            missing.append(key)
+        else:
+            result[key] = value
+    _count('local_hits', len(result))
+
+    if missing and _shared is not None:
+        found = _shared.get_many([stamped[key] for key in missing])
+        for key in missing:
+            value = found.get(stamped[key])
+            if value is not None:
+                result[key] = value
+                _local.set(stamped[key], value)
+        _count('shared_hits', len(found))
+        missing = [key for key in missing if key not in result]
+
+    if missing:
+        loaded = load(missing)
+        _count('db_loads', len(loaded))
+        for key, value in loaded.items():
+            result[key] = value
+            _local.set(stamped[key], value)
+        if _shared is not None and loaded:
+            _shared.set_many({stamped[key]: value for key, value in loaded.items()}, Config.CONTENT_CACHE_TTL)
+    return result
+
+def question_payload(question):
+    """题目的可缓存内容：选项已解析，正确答案已归一化（判分时直接比较）"""
+    payload = question.to_dict()
+    payload['normalized_answer'] = normalize_answer(question.question_type, question.correct_answer)
+    return payload
+
+def _load_questions(keys):
+    ids = [int(key.split(':')[1]) for key in keys]
+    return {f'question:{q.id}': question_payload(q) for q in Question.query.filter(Question.id.in_(ids))}
+
+def get_question_payloads(question_ids):
+    """批量读取题目内容，返回{题目ID: 字典}（不存在的题目不在结果中）"""
+    found = _read_through([f'question:{qid}' for qid in question_ids], _load_questions)
+    return {int(key.split(':')[1]): value for key, value in found.items()}
+
+def _load_papers(keys):
+    loaded = {}
+    for key in keys:
+        paper = db.session.get(Paper, int(key.split(':')[1]))
+        if paper is None:
+            continue
+        items = db.session.query(PaperQuestion.question_id, PaperQuestion.position, PaperQuestion.points).filter(
+            PaperQuestion.paper_id == paper.id).order_by(PaperQuestion.position).all()
+        loaded[key] = {
+            'id': paper.id,
+            'paper_name': paper.paper_name,
+            'creator_id': paper.creator_id,
+            'total_score': paper.total_score,
+            'create_time': paper.create_time.strftime('%Y-%m-%d %H:%M') if paper.create_time else '',
+            'items': [{'question_id': qid, 'position': position, 'points': points} for qid, position, points in items],
+        }
+    return loaded
+
+def get_paper_view(paper_id):
+    """
+    读取卷子及其有序题目（卷子结构和每道题分别缓存，评分只使对应题目失效）
+    :return: 卷子字典，items中每项带question（题目字典）；卷子不存在时返回None
+    """
+    paper = _read_through([f'paper:{paper_id}'], _load_papers).get(f'paper:{paper_id}')
+    if paper is None:
+        return None
+    questions = get_question_payloads([item['question_id'] for item in paper['items']])
+    items = [dict(item, question=questions[item['question_id']])
+             for item in paper['items'] if item['question_id'] in questions]
+    return dict(paper, items=items)
+
+def invalidate_questions(question_ids):
+    """题目内容或评分变化后调用（提交之后），所有worker都会重新加载"""
+    _bump([f'question:{qid}' for qid in question_ids])
+
+def invalidate_paper(paper_id):
+    _bump([f'paper:{paper_id}'])
+
+def _bump(keys):
+    global _version_seq, _version_floor
+    if not keys:
+        return
+    if _shared is not None:
+        _shared.bump_versions(keys)
+    else:
+        with _version_lock:
+            for key in keys:
+                _version_seq += 1
+                _local_versions[key] = _version_seq
+                _local_versions.move_to_end(key)
+            while len(_local_versions) > Config.CONTENT_CACHE_SIZE:
+                _, _version_floor = _local_versions.popitem(last=False)
+
+def content_cache_stats():
+    """命中率统计（本进程）"""
+    with _counter_lock:
+        counters = dict(_counters)
+    total = sum(counters.values())
+    counters['hit_rate'] = round((counters['local_hits'] + counters['shared_hits']) / total, 4) if total else None
+    counters['local'] = _local.stats()
+    counters['shared_enabled'] = _shared is not None
+    return counters
@@ -0,0 +1,117 @@
+from collections import Counter
+from sqlalchemy import or_
+from config import Config
+from models import db
+from models.question import Question
+from models.question_fingerprint import QuestionFingerprint
+from services.material_service import normalize_for_dedup
+import hashlib
+
+# 题目近似判重：题干+选项归一化后取字符n-gram（中文按字切分），计算64位SimHash；
+# 两道题的SimHash海明距离不超过QUESTION_DEDUP_DISTANCE即视为重复。
+# 指纹切成4段各建索引，查找只命中段值相同的少量候选，插入代价不随题库增长。
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+_MASK = (1 << HASH_BITS) - 1
+
+def _shingles(text, n):
+    if len(text) <= n:
+        return [text] if text else []
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+# 按位累加用的"展开"表：[字节位置][字节值] -> 该字节的每一位占一个LANE_BITS宽的计数槽
+LANE_BITS = 32
+_LANE_MASK = (1 << LANE_BITS) - 1
+_SPREAD = [[sum(1 << ((position * 8 + bit) * LANE_BITS) for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+           for position in range(HASH_BITS // 8)]
+
+def question_simhash(content, options=None):
+    """
+    计算题目的64位SimHash（无符号）
+    每一位的权重 = 该位为1的特征次数 - 为0的特征次数，权重为正的位取1；
+    各位的"为1次数"打包在一个大整数的64个计数槽里同时累加，不逐位循环
+    :param content: 题干
+    :param options: 选项列表（填空题为None）
+    """
+    text = normalize_for_dedup(content + ''.join(options or []))
+    features = Counter(_shingles(text, Config.QUESTION_DEDUP_NGRAM))
+    ones, total = 0, 0
+    for feature, count in features.items():
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()[::-1]  # 大端序，反转后下标即字节位置
+        spread = (_SPREAD[0][digest[0]] | _SPREAD[1][digest[1]] | _SPREAD[2][digest[2]] | _SPREAD[3][digest[3]]
+                  | _SPREAD[4][digest[4]] | _SPREAD[5][digest[5]] | _SPREAD[6][digest[6]] | _SPREAD[7][digest[7]])
+        ones += spread * count
+        total += count
+    return sum(1 << bit for bit in range(HASH_BITS) if (ones >> (bit * LANE_BITS) & _LANE_MASK) * 2 > total)
+
+def hamming_distance(a, b):
+    return bin((a ^ b) & _MASK).count('1')
+
+def _bands(simhash):
+    return [simhash >> (i * BAND_BITS) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+
+def _to_signed(simhash):
+    # BIGINT是有符号的，最高位为1时转为负数存储
+    return simhash - (1 << HASH_BITS) if simhash >> (HASH_BITS - 1) else simhash
+
+def find_duplicate(question_type, simhash, before_id=None):
+    """
+    在题库中查找近似重复的题目（只比较同题型、未被标记为重复的题目）
+    :param before_id: 只在ID小于该值的题目中查找（批量去重时保留最早的一道）
+    :return: 最早的重复题目ID，没有则返回None
+    """
+    bands = _bands(simhash)
+    query = db.session.query(QuestionFingerprint.question_id, QuestionFingerprint.simhash).join(
+        Question, Question.id == QuestionFingerprint.question_id
+    ).filter(
+        QuestionFingerprint.question_type == question_type,
+        or_(*[getattr(QuestionFingerprint, f'band{i}') == bands[i] for i in range(BANDS)]),
+        Question.duplicate_of.is_(None),
+    )
+    if before_id is not None:
+        query = query.filter(QuestionFingerprint.question_id < before_id)
+    matches = [question_id for question_id, other in query
+               if hamming_distance(simhash, other) <= Config.QUESTION_DEDUP_DISTANCE]
+    return min(matches) if matches else None
+
+def fingerprint_row(question_id, question_type, simhash):
+    """question_fingerprints表的一行（字典），用于批量写入"""
+    bands = _bands(simhash)
+    return {'question_id': question_id, 'question_type': question_type, 'simhash': _to_signed(simhash),
+            **{f'band{i}': bands[i] for i in range(BANDS)}}
+
+def index_question(question, simhash=None):
+    """把题目的指纹加入会话（由调用方提交）"""
+    if simhash is None:
+        simhash = question_simhash(question.content, question.get_options())
+    db.session.merge(QuestionFingerprint(**fingerprint_row(question.id, question.question_type, simhash)))
+
+def dedupe_question_bank(batch_size=1000):
+    """
+    批量去重已有题库：按ID从小到大补齐指纹，与更早的题目近似重复的标记duplicate_of（不删除，卷子/错题记录不受影响）
+    :return: (补建指纹数, 标记为重复的题目数)
+    """
+    indexed = marked = 0
+    last_id = 0
+    while True:
+        questions = Question.query.filter(Question.id > last_id).order_by(Question.id).limit(batch_size).all()
+        if not questions:
+            break
+        last_id = questions[-1].id
+        existing = {row[0] for row in db.session.query(QuestionFingerprint.question_id).filter(
+            QuestionFingerprint.question_id.in_([q.id for q in questions]))}
+        for question in questions:
+            simhash = question_simhash(question.content, question.get_options())
+            if question.id not in existing:
+                index_question(question, simhash)
+                indexed += 1
+            if question.duplicate_of is None:
+                db.session.flush()
+                duplicate_id = find_duplicate(question.question_type, simhash, before_id=question.id)
+                if duplicate_id is not None:
+                    question.duplicate_of = duplicate_id
+                    marked += 1
+        db.session.commit()
+    return indexed, marked
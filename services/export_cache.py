@@ -0,0 +1,97 @@
+from config import Config
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# PDF导出缓存：文件名为内容哈希（题目内容+渲染参数），同一份卷子只渲染一次。
+# 题目被修改后哈希随之变化，旧文件不会再被命中，按最近使用时间（mtime）淘汰。
+
+# 渲染格式版本：修改pdf_service的排版后递增，使旧文件失效
+EXPORT_FORMAT_VERSION = 2
+
+_evict_lock = threading.Lock()
+
+def _question_fingerprint(q):
+    # q为题目字典（Question.to_dict()或题目缓存中的字典）
+    return [q['id'], q['question_type'], q['content'], q['options'], q['correct_answer']]
+
+def paper_export_key(paper, render_options):
+    """卷子导出的缓存键：卷子名称/总分、有序题目内容与分值、渲染参数（paper为content_cache.get_paper_view的字典）"""
+    items = [_question_fingerprint(item['question']) + [item['points']] for item in paper['items']]
+    return _hash(['paper', paper['paper_name'], paper['total_score'], items, render_options])
+
+def wrong_export_key(user_id, wrong_questions, questions, render_options):
+    """错题本导出的缓存键：错题次数/最后做错日期（PDF中会显示）与题目内容"""
+    items = [_question_fingerprint(q.to_dict()) + [wq.wrong_count, wq.last_wrong_time.strftime('%Y-%m-%d')]
+             for wq, q in zip(wrong_questions, questions)]
+    return _hash(['wrong', user_id, items, render_options])
+
+def _hash(content):
+    raw = json.dumps([EXPORT_FORMAT_VERSION, content], ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+CACHE_SUFFIXES = ('.pdf', '.zip')  # 错题本过大时拆成多册，缓存的是zip
+
+def _path(key, suffix):
+    return os.path.join(Config.EXPORT_CACHE_DIR, f'{key}{suffix}')
+
+def get_cached_export(key):
+    """
+    命中时返回(已打开的文件对象, 后缀)并刷新其最近使用时间，否则返回(None, None)
+    返回前先打开：之后文件被并发的淘汰删除，已打开的文件仍可读完（由调用方关闭，send_file会自动关闭）
+    """
+    for suffix in CACHE_SUFFIXES:
+        path = _path(key, suffix)
+        try:
+            f = open(path, 'rb')
+        except OSError:  # 不存在或刚被淘汰，按未命中处理
+            continue
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return f, suffix
+    return None, None
+
+def store_export(key, data, suffix='.pdf'):
+    """
+    写入缓存：先写同目录临时文件再原子重命名，并发请求不会读到半个文件
+    本次的响应直接用内存中的data，不再读取缓存文件（文件可能随后被其他请求的淘汰删除）
+    :param data: 渲染好的文件字节
+    """
+    os.makedirs(Config.EXPORT_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=Config.EXPORT_CACHE_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, _path(key, suffix))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _evict(keep=_path(key, suffix))
+
+def _evict(keep=None):
+    # 总大小或文件数超限时，按mtime从旧到新删除；刚写入的文件（keep）不删，即使它本身就超过上限
+    with _evict_lock:
+        entries = []
+        for entry in os.scandir(Config.EXPORT_CACHE_DIR):
+            if entry.name.endswith(CACHE_SUFFIXES) and entry.path != keep:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in sorted(entries):
+            if total <= Config.EXPORT_CACHE_MAX_BYTES and count <= Config.EXPORT_CACHE_MAX_FILES:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            count -= 1
\ No newline at end of file
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from config import Config
+from models import db
+from models.export_job import ExportJob
+from services.export_cache import wrong_export_key, store_export
+from services.pdf_service import export_wrong_book, PDFExportError, RENDER_OPTIONS
+from services.review_service import load_wrong_export
+import json
+import logging
+import threading
+
+# 后台导出错题本：错题超过PDF_BATCH_SIZE道（需要分册渲染）时不在请求线程里等待，
+# 创建导出任务后跳转到任务页，渲染完成写入导出缓存，任务页给出下载链接。
+# 任务由进程内线程池执行，进程退出时未完成的任务不会接管（超过两倍PDF_EXPORT_JOB_TIMEOUT后按中断显示，重新导出即可）。
+
+logger = logging.getLogger(__name__)
+
+_app = None
+_executor = None
+_executor_lock = threading.Lock()
+
+def init_export_jobs(app):
+    """绑定Flask应用（工作线程需要应用上下文访问数据库）"""
+    global _app
+    _app = app
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.EXPORT_JOB_WORKERS, thread_name_prefix='export-job')
+    return _executor
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+def submit_wrong_export(user_id, question_type, since, until, item_count):
+    """
+    创建错题本导出任务并放入线程池；同一用户相同筛选条件的导出正在进行时直接返回该任务
+    :param until: 不含当天的截止时间（与review_service.wrong_book_query一致）
+    :return: ExportJob对象
+    """
+    params = json.dumps({'type': question_type, 'since': _format_date(since), 'until': _format_date(until)})
+    job = ExportJob.query.filter(
+        ExportJob.user_id == user_id, ExportJob.params == params, ExportJob.status.in_(['queued', 'running'])
+    ).order_by(ExportJob.id.desc()).first()
+    if job is not None and not is_stale(job):
+        return job
+
+    job = ExportJob(user_id=user_id, params=params, item_count=item_count)
+    db.session.add(job)
+    db.session.commit()
+    if Config.EXPORT_JOB_WORKERS <= 0:
+        _run_export(job.id)
+        db.session.refresh(job)
+    else:
+        _get_executor().submit(_run_export, job.id)
+    return job
+
+def is_stale(job):
+    """未完成且超过渲染期限仍无结果（执行的进程已退出）"""
+    if job.is_finished():
+        return False
+    started = job.start_time or job.create_time
+    return started is not None and started < datetime.utcnow() - timedelta(seconds=Config.PDF_EXPORT_JOB_TIMEOUT * 2)
+
+def _run_export(job_id):
+    with _app.app_context():
+        try:
+            claimed = ExportJob.query.filter_by(id=job_id, status='queued').update(
+                {'status': 'running', 'start_time': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+            if claimed != 1:
+                return
+            job = db.session.get(ExportJob, job_id)
+            params = job.get_params()
+            try:
+                # 按提交时的筛选条件重新查询：排队期间新增的错题也会导出
+                wrong_questions, questions = load_wrong_export(
+                    job.user_id, params['type'], _parse_date(params['since']), _parse_date(params['until']))
+                if not wrong_questions:
+                    raise PDFExportError('没有错题可导出！')
+                key = wrong_export_key(job.user_id, wrong_questions, questions, RENDER_OPTIONS)
+                data, is_zip = export_wrong_book(job.user_id, wrong_questions, questions,
+                                                 timeout=Config.PDF_EXPORT_JOB_TIMEOUT)
+                job.suffix = '.zip' if is_zip else '.pdf'
+                store_export(key, data, job.suffix)
+                job.cache_key = key
+                job.item_count = len(wrong_questions)
+                job.status = 'succeeded'
+            except Exception as e:
+                db.session.rollback()
+                job = db.session.get(ExportJob, job_id)
+                if not isinstance(e, PDFExportError):
+                    logger.exception("导出错题本失败")
+                job.status = 'failed'
+                job.error = str(e)
+            job.finish_time = datetime.utcnow()
+            db.session.commit()
+        finally:
+            db.session.remove()
@@ -0,0 +1,80 @@
+from datetime import datetime
+from models import db
+from models.attempt import PaperAttempt, AttemptAnswer
+from models.wrong_question import WrongQuestion
+from services.stats_service import record_attempt_stats
+
+def get_submitted_answer(form, question_id, question_type):
+    """从表单取出某道题的作答（多选题的多个复选框合并为"A,C"）"""
+    if question_type == 'multiple_choice':
+        return ','.join(sorted(v for v in form.getlist(f'answer_{question_id}') if v))
+    return form.get(f'answer_{question_id}', '')
+
+def normalize_answer(question_type, answer):
+    """把答案归一化为可直接比较的字符串（不同题型处理），未知题型返回None"""
+    if question_type == 'fill_blank':
+        # 填空题：忽略首尾空格和大小写（可根据需求调整）
+        return answer.strip().lower()
+    if question_type == 'single_choice':
+        # 单选题：直接对比
+        return answer.strip()
+    if question_type == 'multiple_choice':
+        # 多选题：按逗号分隔后排序对比
+        return ','.join(sorted(a.strip() for a in answer.split(',')))
+    return None
+
+def grade_normalized(question_type, normalized_answer, user_answer):
+    """用预先归一化的正确答案判分（题目缓存中已保存normalized_answer）"""
+    if not user_answer or normalized_answer is None:
+        return False
+    return normalize_answer(question_type, user_answer) == normalized_answer
+
+def grade_answer(question_type, correct_answer, user_answer):
+    """判断作答是否正确（不同题型处理）"""
+    return grade_normalized(question_type, normalize_answer(question_type, correct_answer), user_answer)
+
+def submit_attempt(user_id, paper, answers):
+    """
+    判分并在一个事务内完成所有记录：交卷记录、逐题作答、错题本批量upsert、学习统计累加
+    :param user_id: 用户ID
+    :param paper: 卷子字典（content_cache.get_paper_view）
+    :param answers: {题目ID: 作答字符串}
+    :return: PaperAttempt对象
+    """
+    now = datetime.utcnow()
+    results = []
+    for item in paper['items']:
+        question = item['question']
+        user_answer = answers.get(question['id'], '')
+        is_correct = grade_normalized(question['question_type'], question['normalized_answer'], user_answer)
+        results.append((item, user_answer, is_correct))
+
+    attempt = PaperAttempt(
+        user_id=user_id,
+        paper_id=paper['id'],
+        score=sum(item['points'] for item, _, is_correct in results if is_correct),
+        correct_count=sum(1 for _, _, is_correct in results if is_correct),
+        question_count=len(results),
+        submit_time=now
+    )
+    db.session.add(attempt)
+    db.session.flush()  # 拿到attempt.id
+
+    if results:
+        db.session.execute(AttemptAnswer.__table__.insert(), [{
+            'attempt_id': attempt.id,
+            'user_id': user_id,
+            'question_id': item['question_id'],
+            'user_answer': user_answer,
+            'is_correct': is_correct,
+            'points': item['points'] if is_correct else 0,
+        } for item, user_answer, is_correct in results])
+
+    record_attempt_stats(user_id, [(item['question_id'], item['question']['question_type'], is_correct)
+                                   for item, _, is_correct in results], attempt.score, now)
+    WrongQuestion.record_wrong(user_id, [item['question_id'] for item, _, is_correct in results if not is_correct], now=now)
+    # 答对的到期错题算作一次成功复习（如"今日复习"卷子）
+    from services.review_service import reschedule_correct
+    reschedule_correct(user_id, [item['question_id'] for item, _, is_correct in results if is_correct], now)
+    db.session.commit()
+    return attempt
\ No newline at end of file
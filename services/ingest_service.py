@@ -0,0 +1,201 @@
+from config import Config
+import codecs
+import io
+import os
+import re
+import zipfile
+
+# 资料上传：分块读取文件（不一次性读入内存），自动识别编码（UTF-8/GBK等），规范空白字符，
+# 支持同时上传多个文件或zip压缩包；超出大小限制时立即停止读取。
+# 内存占用上限约为 分块大小 + 编码探测缓冲 + MATERIAL_MAX_CHARS，与上传文件的大小无关。
+
+READ_CHUNK_BYTES = 64 * 1024
+DETECT_BYTES = 64 * 1024  # 用于识别编码的开头字节数
+TEXT_SUFFIXES = ('.txt', '.md', '.markdown', '.text')
+
+class IngestError(Exception):
+    """上传的资料无法读取或超出限制"""
+    pass
+
+class _Budget:
+    """整个上传共用的读取字节数/资料字符数额度"""
+
+    def __init__(self):
+        self.bytes_left = Config.MATERIAL_MAX_BYTES
+        self.chars_left = Config.MATERIAL_MAX_CHARS
+
+    def take_bytes(self, n):
+        self.bytes_left -= n
+        if self.bytes_left < 0:
+            raise IngestError(f'资料过大（解压后超过{Config.MATERIAL_MAX_BYTES // (1024 * 1024)}MB）')
+
+    def take_chars(self, n):
+        self.chars_left -= n
+        if self.chars_left < 0:
+            raise IngestError(f'资料过长（超过{Config.MATERIAL_MAX_CHARS}字），请拆分后分别上传')
+
+# ---------------------- 分块读取与编码识别 ----------------------
+def _read_chunks(stream, budget):
+    while True:
+        chunk = stream.read(READ_CHUNK_BYTES)
+        if not chunk:
+            return
+        budget.take_bytes(len(chunk))
+        yield chunk
+
+def detect_encoding(probe):
+    """根据开头的字节判断编码：BOM > 合法UTF-8 > chardet逐块探测；GB2312/GBK统一按其超集GB18030解码"""
+    if probe.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if probe.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(probe, final=False)  # 末尾被截断的字符不算错误
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    from chardet.universaldetector import UniversalDetector  # 只有非UTF-8文件才需要
+    detector = UniversalDetector()
+    for start in range(0, len(probe), 4096):
+        detector.feed(probe[start:start + 4096])
+        if detector.done:
+            break
+    detector.close()
+    encoding = (detector.result.get('encoding') or '').lower()
+    if not encoding or encoding in ('gb2312', 'gbk', 'ascii'):
+        return 'gb18030'  # 识别不出时按中文Windows最常见的编码处理
+    return encoding
+
+def decode_stream(chunks, name):
+    """
+    把字节块逐块解码为字符串（换行统一为\\n），编码由开头DETECT_BYTES字节识别
+    个别无法解码的字节替换为U+FFFD，不会中断整个上传
+    """
+    chunks = iter(chunks)
+    probe = b''
+    for chunk in chunks:
+        probe += chunk
+        if len(probe) >= DETECT_BYTES:
+            break
+    if not probe:
+        return
+    encoding = detect_encoding(probe[:DETECT_BYTES])
+    if b'\x00' in probe and not encoding.startswith('utf-16'):
+        raise IngestError(f'{name}不是文本文件')
+    try:
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(errors='replace'), translate=True)
+    except LookupError:
+        raise IngestError(f'{name}的编码（{encoding}）无法识别')
+    yield decoder.decode(probe)
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+# ---------------------- 空白规范化 ----------------------
+_CONTROL_RE = re.compile('[\x00-\x08\x0e-\x1f\x7f\ufeff]')
+_SPACE_RE = re.compile(r'[^\S\n]+')  # 除换行以外的空白（含全角空格、不换行空格、制表符）
+_LINE_EDGE_RE = re.compile(r' ?\n ?')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+_TRAILING_SPACE_RE = re.compile(r'\s+$')
+
+def normalize_whitespace(texts):
+    """
+    逐块规范空白：连续空格/制表符合并为一个空格，去掉行首尾空格，连续空行合并为一个（保留段落结构）
+    块末尾的空白留到下一块一起处理，跨块的空白也能正确合并
+    """
+    pending = ''
+    started = False
+    for text in texts:
+        text = pending + _CONTROL_RE.sub('', text)
+        if not text:
+            continue
+        tail = _TRAILING_SPACE_RE.search(text)
+        text, pending = (text[:tail.start()], text[tail.start():]) if tail else (text, '')
+        pending = _normalize(pending)  # 保留的空白规范化后至多几个字符
+        text = _normalize(text)
+        if not started:
+            text = text.lstrip()
+            started = bool(text)
+            if not started:
+                pending = ''
+        if text:
+            yield text
+
+def _normalize(text):
+    text = _SPACE_RE.sub(' ', text)
+    text = _LINE_EDGE_RE.sub('\n', text)
+    return _BLANK_LINES_RE.sub('\n\n', text)
+
+# ---------------------- 上传的文件/压缩包 ----------------------
+def _zip_member_name(info):
+    # 未设置UTF-8标志的文件名按cp437存储，Windows中文压缩包实际是GBK
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('gb18030')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+def _iter_zip(stream, archive_name, budget):
+    """逐个返回压缩包中的文本文件(名称, 字节块迭代器)，按文件名排序"""
+    try:
+        archive = zipfile.ZipFile(stream)
+    except (zipfile.BadZipFile, OSError):
+        raise IngestError(f'{archive_name}不是有效的zip文件')
+    with archive:
+        members = []
+        for info in archive.infolist():
+            name = _zip_member_name(info)
+            base = os.path.basename(name.rstrip('/'))
+            if info.is_dir() or name.startswith('__MACOSX/') or base.startswith('.') or not base.lower().endswith(TEXT_SUFFIXES):
+                continue
+            members.append((name, info))
+        if not members:
+            raise IngestError(f'{archive_name}中没有txt/md文件')
+        if len(members) > Config.UPLOAD_ZIP_MAX_FILES:
+            raise IngestError(f'{archive_name}中的文件过多（超过{Config.UPLOAD_ZIP_MAX_FILES}个）')
+        for name, info in sorted(members, key=lambda member: member[0]):  # 同名成员保持原顺序
+            if info.file_size > budget.bytes_left:  # 先按声明的大小拒绝，实际读取时仍逐块计数
+                budget.take_bytes(info.file_size)
+            with archive.open(info) as member:
+                yield name, _read_chunks(member, budget)
+
+def _iter_sources(files, budget):
+    for file in files:
+        if not file or not file.filename:
+            continue
+        name = file.filename
+        if name.lower().endswith('.zip'):
+            yield from _iter_zip(file.stream, name, budget)
+        elif name.lower().endswith(TEXT_SUFFIXES):
+            yield name, _read_chunks(file.stream, budget)
+        else:
+            raise IngestError(f'不支持的文件类型：{name}（支持txt、md和zip）')
+
+def ingest_material(files, text=None):
+    """
+    读取上传的资料：输入框文本 + 多个文件/zip压缩包，逐块解码和规范空白后拼接
+    多个来源时每个来源前加"# 文件名"标题，切块时会在文件之间断开
+    :param files: werkzeug FileStorage列表（request.files.getlist）
+    :param text: 输入框中的文本
+    :return: 资料字符串（没有任何内容时为空字符串）
+    :raises IngestError: 文件类型不支持、不是文本文件或超出大小限制
+    """
+    budget = _Budget()
+    parts = []
+    if text and text.strip():
+        parts.append(('', _collect(normalize_whitespace([text.replace('\r\n', '\n').replace('\r', '\n')]), budget)))
+    for name, chunks in _iter_sources(files, budget):
+        content = _collect(normalize_whitespace(decode_stream(chunks, name)), budget)
+        if content:
+            parts.append((name, content))
+    if len(parts) == 1:
+        return parts[0][1]
+    return '\n\n'.join(f'# {name}\n\n{content}' if name else content for name, content in parts)
+
+def _collect(texts, budget):
+    pieces = []
+    for piece in texts:
+        budget.take_chars(len(piece))
+        pieces.append(piece)
+    return ''.join(pieces)
@@ -0,0 +1,176 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from config import Config
+from models import db
+from models.generation_job import GenerationJob
+from services.llm_service import iter_questions_from_material
+from services.question_service import add_generated_question
+import json
+import logging
+import threading
+import time
+
+# 后台出题任务：任务持久化在generation_jobs表，由进程内线程池执行。
+# 多个gunicorn worker共享同一张任务表，通过条件UPDATE抢占任务，保证每个任务只执行一次。
+# 每个进程处理第一个请求时启动回收线程，每JOB_SWEEP_INTERVAL秒为本进程执行中的任务更新心跳（heartbeat_time），
+# 并接管心跳超过JOB_STALE_SECONDS未更新（进程已退出）的任务和排队中的任务（不必等有人上传）。
+# 执行中的任务以抢占时写入的start_time为标识，进度和最终状态都是带条件的UPDATE：任务被回收、由其他进程重新抢占后，
+# 原来的线程不会再覆盖它的结果。
+
+logger = logging.getLogger(__name__)
+
+_app = None
+_executor = None
+_executor_lock = threading.Lock()
+_submitted = set()  # 本进程已放入线程池、尚未执行完的任务ID
+_running = {}  # 本进程正在执行的任务：任务ID -> 抢占时的start_time
+_sweeper = None
+
+class JobLimitExceeded(Exception):
+    """用户排队/执行中的任务数超过上限"""
+    pass
+
+def init_job_queue(app):
+    """绑定Flask应用（工作线程需要应用上下文访问数据库）；处理第一个请求时启动回收线程，CLI命令不启动"""
+    global _app
+    _app = app
+    app.before_request(_start_sweeper)
+
+def _start_sweeper():
+    global _sweeper
+    if _sweeper is not None:
+        return
+    with _executor_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_loop, name='generation-job-sweeper', daemon=True)
+            _sweeper.start()
+
+def _sweep_loop():
+    while True:
+        try:
+            with _app.app_context():
+                try:
+                    _heartbeat()
+                    for job_id in _recover_jobs():
+                        _submit(job_id)
+                finally:
+                    db.session.remove()
+        except Exception:
+            logger.exception("回收遗留的出题任务失败")
+        time.sleep(Config.JOB_SWEEP_INTERVAL)
+
+def _get_executor():
+    # 首次使用时才创建线程池
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.JOB_MAX_WORKERS, thread_name_prefix='generation-job')
+    return _executor
+
+def _submit(job_id):
+    # 同一任务在本进程只排队一次；其他进程也排了队时由_claim_job决定谁执行
+    _start_sweeper()  # 心跳由回收线程更新
+    executor = _get_executor()
+    with _executor_lock:
+        if job_id in _submitted:
+            return
+        _submitted.add(job_id)
+    executor.submit(_run_job, job_id)
+
+def _heartbeat():
+    # 本进程执行中的任务：等待LLM响应时也不会被其他进程当作遗留任务回收
+    with _executor_lock:
+        running = dict(_running)
+    now = datetime.utcnow()
+    for job_id, started in running.items():
+        _update_running(job_id, started, heartbeat_time=now)
+
+def _recover_jobs():
+    """把心跳超时的running任务重置为queued，返回所有待执行的任务ID"""
+    stale_before = datetime.utcnow() - timedelta(seconds=Config.JOB_STALE_SECONDS)
+    GenerationJob.query.filter(
+        GenerationJob.status == 'running',
+        GenerationJob.heartbeat_time < stale_before
+    ).update({'status': 'queued', 'start_time': None, 'heartbeat_time': None}, synchronize_session=False)
+    db.session.commit()
+    queued = db.session.query(GenerationJob.id).filter_by(status='queued').order_by(GenerationJob.id).all()
+    return [row.id for row in queued]
+
+def count_active_jobs(user_id):
+    """排队和执行中的任务数；心跳超时的running任务（进程已退出，等待回收）不计入"""
+    stale_before = datetime.utcnow() - timedelta(seconds=Config.JOB_STALE_SECONDS)
+    return GenerationJob.query.filter(
+        GenerationJob.user_id == user_id,
+        db.or_(GenerationJob.status == 'queued',
+               db.and_(GenerationJob.status == 'running', GenerationJob.heartbeat_time >= stale_before))
+    ).count()
+
+def submit_generation_job(user_id, material, question_count=10, use_cache=True):
+    """
+    创建出题任务并放入线程池，立即返回
+    :return: GenerationJob对象
+    :raises JobLimitExceeded: 用户进行中的任务过多
+    """
+    if count_active_jobs(user_id) >= Config.JOB_MAX_ACTIVE_PER_USER:
+        raise JobLimitExceeded(f'您已有{Config.JOB_MAX_ACTIVE_PER_USER}个出题任务在进行中，请稍后再试')
+
+    job = GenerationJob(user_id=user_id, material=material, question_count=question_count, use_cache=use_cache)
+    db.session.add(job)
+    db.session.commit()
+    _submit(job.id)
+    return job
+
+def _claim_job(job_id):
+    """条件更新：只有仍处于queued状态时才能抢占成功；返回抢占时的start_time（从数据库读回，精度与库中一致），失败返回None"""
+    now = datetime.utcnow()
+    claimed = GenerationJob.query.filter_by(id=job_id, status='queued').update(
+        {'status': 'running', 'start_time': now, 'heartbeat_time': now}, synchronize_session=False)
+    db.session.commit()
+    if claimed != 1:
+        return None
+    return db.session.execute(db.select(GenerationJob.start_time).where(GenerationJob.id == job_id)).scalar()
+
+def _update_running(job_id, started, **values):
+    # 只更新仍由本次抢占执行的任务，与会话中待提交的题目一起提交；任务已被回收时回滚（题目不入库），返回False
+    updated = GenerationJob.query.filter_by(id=job_id, status='running', start_time=started).update(
+        values, synchronize_session=False)
+    if updated != 1:
+        db.session.rollback()
+        return False
+    db.session.commit()
+    return True
+
+def _run_job(job_id):
+    with _app.app_context():
+        try:
+            started = _claim_job(job_id)
+            if started is None:
+                return
+            with _executor_lock:
+                _running[job_id] = started
+            job = db.session.get(GenerationJob, job_id)
+            material, question_count, use_cache, user_id = job.material, job.question_count, job.use_cache, job.user_id
+            question_ids, errors, stats = [], [], {}
+            try:
+                # 每生成一道题就校验入库并更新进度（同时更新心跳），结果页可以实时看到
+                for q in iter_questions_from_material(material, question_count, use_cache, errors, stats):
+                    question = add_generated_question(q, material, user_id)
+                    if question is None or question.id in question_ids:  # 与题库中已有题目重复
+                        continue
+                    question_ids.append(question.id)
+                    if not _update_running(job_id, started, question_ids=json.dumps(question_ids),
+                                           progress=len(question_ids), heartbeat_time=datetime.utcnow()):
+                        return
+            except Exception as e:
+                db.session.rollback()
+                errors.append(f'生成失败：{str(e)}')
+
+            # 部分块失败或输出被截断时，已入库的题目仍然保留
+            _update_running(job_id, started, status='succeeded' if question_ids else 'failed',
+                            error='；'.join(errors) or None, material_tokens=stats.get('material_tokens'),
+                            prompt_tokens=stats.get('prompt_tokens'), finish_time=datetime.utcnow())
+        finally:
+            db.session.remove()
+            with _executor_lock:
+                _submitted.discard(job_id)
+                _running.pop(job_id, None)
\ No newline at end of file
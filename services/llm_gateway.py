@@ -0,0 +1,363 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import Config
+from services.metrics_service import inc
+import json
+import os
+import random
+import threading
+import time
+
+# LLM网关：所有LLM请求都经过这里
+#   - 令牌桶限速（LLM_RATE_LIMIT次/秒，允许LLM_RATE_BURST次突发）+ 全局并发上限（LLM_MAX_CONCURRENCY）
+#   - 可重试的错误（429、5xx、超时、连接失败）按指数退避重试，优先换一个后端
+#   - LLM_HEDGE_AFTER秒内没有响应（流式为第一个事件）时，向另一个后端再发一次，取先返回的结果
+#   - 每个后端一个熔断器：连续失败LLM_BREAKER_FAILURES次后LLM_BREAKER_COOLDOWN秒内不再使用
+#   - 多个后端（LLM_BACKENDS）按观测到的延迟和错误率选择
+# openai客户端自身的重试关闭（max_retries=0），重试统一由网关控制
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+SUPPORTED_TYPES = ('deepseek', 'openai')  # OpenAI兼容接口
+EWMA_ALPHA = 0.2
+
+class LLMUnavailable(Exception):
+    """没有可用的后端（全部熔断或限流等待超时）"""
+    pass
+
+class TokenBucket:
+    """令牌桶：平均每秒rate个，桶容量burst；rate<=0表示不限速"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        # 返回需要等待的秒数，0表示已取到令牌
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout):
+        """取一个令牌，最多等待timeout秒，成功返回True"""
+        if self.rate <= 0:
+            return True
+        deadline = time.monotonic() + timeout
+        while True:
+            delay = self._take()
+            if delay == 0:
+                return True
+            if time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+
+    def try_acquire(self):
+        return self.rate <= 0 or self._take() == 0
+
+class CircuitBreaker:
+    """
+    连续失败threshold次后打开cooldown秒；之后放行一个试探请求（半开），成功则关闭，失败则重新打开
+    试探请求probe_timeout秒内没有结果（调用方异常退出、没有记录成功或失败）时，再放行一个试探请求
+    """
+
+    def __init__(self, threshold, cooldown, probe_timeout=None):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout if probe_timeout is not None else cooldown
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if ((self.state == 'open' and now - self._opened_at >= self.cooldown)
+                    or (self.state == 'half_open' and now - self._probe_at >= self.probe_timeout)):
+                self.state = 'half_open'  # 只放行这一个请求
+                self._probe_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+
+    def record_failure(self):
+        """记录一次失败，返回熔断器是否因此打开"""
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self._failures >= self.threshold):
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+class Backend:
+    """一个OpenAI兼容的后端，记录延迟和错误率的指数加权平均"""
+
+    def __init__(self, name, base_url, api_key, model, type='openai', weight=1.0):
+        if type not in SUPPORTED_TYPES:  # 本地LLM（需额外安装transformers、torch等）
+            raise RuntimeError(f"不支持的LLM_API_TYPE：{type}")
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.weight = float(weight) or 1.0
+        self.breaker = CircuitBreaker(Config.LLM_BREAKER_FAILURES, Config.LLM_BREAKER_COOLDOWN,
+                                      max(Config.LLM_BREAKER_COOLDOWN, Config.LLM_TIMEOUT * 2))
+        self.latency = None  # 秒（流式为第一个事件的耗时）
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # 第一次使用时才创建：导入openai较慢，且未配置API Key时不影响应用启动
+        with self._lock:
+            if self._client is None:
+                import openai
+                self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    def score(self):
+        """越小越优先；还没有成功过的后端按0（从未请求过，先试一次）或超时时间（只失败过）计算"""
+        latency = self.latency
+        if latency is None:
+            latency = Config.LLM_TIMEOUT if self.failures else 0.0
+        return latency * (1 + 4 * self.error_rate) / self.weight
+
+    def record(self, ok, latency=None):
+        with self._lock:
+            self.requests += 1
+            self.failures += 0 if ok else 1
+            self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+            if latency is not None:
+                self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'model': self.model,
+            'state': self.breaker.state,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'error_rate': round(self.error_rate, 3),
+            'requests': self.requests,
+            'failures': self.failures,
+        }
+
+def load_backends():
+    """
+    LLM_BACKENDS为JSON列表：[{"name": "deepseek", "base_url": "...", "api_key": "...", "model": "...", "weight": 1}, ...]
+    api_key也可写成api_key_env（从该环境变量读取）；未设置时使用LLM_API_BASE/LLM_API_KEY/LLM_MODEL这一个后端
+    """
+    if not Config.LLM_BACKENDS:
+        return [Backend(Config.LLM_API_TYPE, Config.LLM_API_BASE, Config.LLM_API_KEY, Config.LLM_MODEL, Config.LLM_API_TYPE)]
+    backends = []
+    for i, item in enumerate(json.loads(Config.LLM_BACKENDS)):
+        backends.append(Backend(
+            name=item.get('name') or f'backend{i + 1}',
+            base_url=item['base_url'],
+            api_key=item.get('api_key') or os.getenv(item.get('api_key_env', ''), '') or Config.LLM_API_KEY,
+            model=item.get('model') or Config.LLM_MODEL,
+            type=item.get('type', 'openai'),
+            weight=item.get('weight', 1.0),
+        ))
+    return backends
+
+def is_retryable(error):
+    """429、5xx、超时和连接错误可以重试；参数错误、鉴权失败等重试也不会成功"""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    try:
+        import openai
+    except ImportError:
+        return isinstance(error, (TimeoutError, ConnectionError))
+    return isinstance(error, (openai.APIConnectionError, TimeoutError, ConnectionError))  # 含APITimeoutError
+
+def _retry_after(error):
+    # 429/503响应的Retry-After头（秒）
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+class LLMGateway:
+    def __init__(self, backends):
+        self.backends = backends
+        self._bucket = TokenBucket(Config.LLM_RATE_LIMIT, Config.LLM_RATE_BURST)
+        self._semaphore = threading.BoundedSemaphore(Config.LLM_MAX_CONCURRENCY)
+        self._hedge_pool = None
+        self._hedge_lock = threading.Lock()
+
+    # ---------------------- 对外接口 ----------------------
+    def chat(self, messages, temperature, stream=False):
+        """
+        调用chat.completions.create（模型由选中的后端决定）
+        :return: stream=False时为ChatCompletion；stream=True时为事件迭代器（需读完或close，才会释放并发名额）
+        :raises LLMUnavailable: 没有可用的后端
+        """
+        params = {'messages': messages, 'temperature': temperature}
+        self._semaphore.acquire()
+        try:
+            result = self._call_with_retries(params, stream)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        if not stream:
+            self._semaphore.release()
+            return result
+        return self._hold_until_closed(*result)
+
+    def stats(self):
+        return {'backends': [b.stats() for b in self.backends]}
+
+    def _hold_until_closed(self, first, events, response):
+        # 流式结果读完（或被close）时才释放并发名额；提前停止读取时关闭HTTP响应，连接不等垃圾回收
+        try:
+            if first is not None:
+                yield first
+            yield from events
+        finally:
+            try:
+                _close(response)
+            finally:
+                self._semaphore.release()
+
+    # ---------------------- 选择后端与重试 ----------------------
+    def _choose(self, exclude=()):
+        """
+        按得分从低到高找第一个熔断器放行的后端；exclude中的后端只在没有其他后端时使用
+        半开的熔断器放行后必须有结果（成功或失败），所以调用前应先取到令牌和并发名额
+        """
+        ranked = sorted(self.backends, key=lambda b: (b in exclude, b.score(), random.random()))
+        for backend in ranked:
+            if backend.breaker.allow():
+                return backend
+        return None
+
+    def _call_with_retries(self, params, stream):
+        mode = 'stream' if stream else 'complete'
+        last_error, last_backend = None, None
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            if attempt:
+                delay = min(Config.LLM_RETRY_MAX_DELAY, Config.LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                delay = max(delay * random.uniform(0.5, 1.0), min(_retry_after(last_error) or 0, Config.LLM_RETRY_MAX_DELAY))
+                inc('app_llm_retries_total', mode=mode)
+                time.sleep(delay)
+            if not self._bucket.acquire(timeout=Config.LLM_TIMEOUT):
+                raise LLMUnavailable('LLM请求过多，限流等待超时')
+            backend = self._choose(exclude=[last_backend] if last_backend else ())
+            if backend is None:
+                if last_error is not None:
+                    raise last_error
+                raise LLMUnavailable('LLM服务暂时不可用（所有后端均已熔断），请稍后再试')
+            try:
+                return self._attempt_hedged(backend, params, stream)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                last_error, last_backend = e, backend
+        raise last_error
+
+    def _attempt(self, backend, params, stream):
+        """向一个后端发一次请求（调用方已取到令牌）；流式请求读到第一个事件才算成功"""
+        start = time.monotonic()
+        try:
+            response = backend.client.chat.completions.create(
+                model=backend.model, timeout=Config.LLM_TIMEOUT, stream=stream, **params)
+            if stream:
+                events = iter(response)
+                result = (next(events, None), events, response)
+            else:
+                result = response
+        except Exception as e:
+            if is_retryable(e):
+                backend.record(False)
+                if backend.breaker.record_failure():
+                    inc('app_llm_breaker_opened_total', backend=backend.name)
+            else:  # 后端有响应，只是请求本身有误（如400），不算后端故障
+                backend.breaker.record_success()
+            inc('app_llm_backend_requests_total', backend=backend.name, outcome='error')
+            raise
+        backend.record(True, time.monotonic() - start)
+        backend.breaker.record_success()
+        inc('app_llm_backend_requests_total', backend=backend.name, outcome='ok')
+        return result
+
+    # ---------------------- 对冲请求 ----------------------
+    def _get_hedge_pool(self):
+        with self._hedge_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=Config.LLM_MAX_CONCURRENCY * 2,
+                                                      thread_name_prefix='llm-hedge')
+        return self._hedge_pool
+
+    def _attempt_hedged(self, backend, params, stream):
+        if Config.LLM_HEDGE_AFTER <= 0:
+            return self._attempt(backend, params, stream)
+        pool = self._get_hedge_pool()
+        primary = pool.submit(self._attempt, backend, params, stream)
+        done, _ = wait([primary], timeout=Config.LLM_HEDGE_AFTER)
+        if done:
+            return primary.result()
+
+        # 对冲请求需要额外的并发名额和令牌，拿不到就只等第一个请求；先拿名额再选后端，
+        # 否则选中的半开后端放行了试探请求却没有发出
+        if not self._semaphore.acquire(blocking=False):
+            return primary.result()
+        second = self._choose(exclude=[backend]) if self._bucket.try_acquire() else None
+        if second is None:
+            self._semaphore.release()
+            return primary.result()
+        inc('app_llm_hedged_total', backend=second.name)
+        hedge = pool.submit(self._attempt, second, params, stream)
+
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # 另一个请求结束后关闭其连接并归还名额；它已经结束（同一轮wait里一起完成或先失败）时回调立即执行
+                    loser = hedge if future is primary else primary
+                    loser.add_done_callback(self._discard)
+                    return future.result()
+                error = error or future.exception()
+        self._semaphore.release()
+        raise error
+
+    def _discard(self, future):
+        if future.exception() is None:
+            result = future.result()
+            _close(result[2] if isinstance(result, tuple) else None)
+        self._semaphore.release()
+
+def _close(response):
+    # 关闭流式响应（openai的Stream.close会关闭底层HTTP响应）
+    close = getattr(response, 'close', None) or getattr(getattr(response, 'response', None), 'close', None)
+    if close:
+        close()
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(load_backends())
+    return _gateway
@@ -1,32 +1,25 @@
-import openai
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import logging
+import queue
+import time
 from config import Config
+from services.llm_gateway import get_gateway
+from services.metrics_service import inc, observe
+from services.material_service import normalize_for_dedup
+from services.compress_service import prepare_material
+from services.cache_service import generation_cache_key, get_cached_questions, set_cached_questions, record_cache_bypass
+from services.question_service import validate_question
+from services.stream_parser import QuestionStreamParser
 
-# 初始化LLM客户端
-if Config.LLM_API_TYPE == "deepseek":
-    client = openai.OpenAI(
-        api_key=Config.LLM_API_KEY,
-        base_url=Config.LLM_API_BASE
-    )
-elif Config.LLM_API_TYPE == "openai":
-    client = openai.OpenAI(
-        api_key=Config.LLM_API_KEY,
-        base_url=Config.LLM_API_BASE
-    )
-else:  # 本地LLM（需额外安装transformers、torch等）
-    client = None
-
-def generate_questions_from_material(material, question_count=10):
-    """
-    从用户上传的资料生成题目
-    :param material: 用户上传的资料内容（字符串）
-    :param question_count: 生成题目数量（默认10道）
-    :return: 生成的题目列表（字典格式）
-    """
-    if not material or len(material) < 100:
-        return {"error": "资料内容过短，无法生成题目"}
+logger = logging.getLogger(__name__)
+
+# 提示词版本：修改build_prompt后需递增，使旧的缓存结果失效
+PROMPT_VERSION = 1
 
+def build_prompt(material, question_count):
     # 构建LLM提示词
-    prompt = f"""
+    return f"""
     你是一个专业的题库生成助手，需要根据以下资料生成{question_count}道复习题，包含单选、多选、填空三种类型（比例约4:3:3）。
     资料内容：{material}
     要求：
@@ -45,25 +38,168 @@ def generate_questions_from_material(material, question_count=10):
     }}
     """
 
+def generate_questions_for_chunk(material, question_count):
+    """
+    对单个资料块调用一次LLM（等待完整结果）
+    :return: 题目列表；调用或解析失败时抛出异常
+    """
+    # 通过LLM网关调用（限速、重试、熔断、多后端选择）
+    start = time.perf_counter()
     try:
-        # 调用LLM API生成题目
-        response = client.chat.completions.create(
-            model=Config.LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,  # 控制随机性，0.7适中
-            timeout=30
+        response = get_gateway().chat(
+            messages=[{"role": "user", "content": build_prompt(material, question_count)}],
+            temperature=Config.LLM_TEMPERATURE
         )
+    except Exception:
+        _finish_call('complete', start, error=True)
+        raise
+    _finish_call('complete', start, usage=response.usage)
 
-        # 解析LLM返回的JSON结果
-        import json5
-        raw_content = response.choices[0].message.content.strip()
+    # 解析LLM返回的JSON结果
+    import json5
+    raw_content = response.choices[0].message.content.strip()
+    try:
         result = json5.loads(raw_content)
-        questions = result.get("questions", [])
-        return questions
+    except ValueError:
+        inc('app_llm_parse_failures_total', mode='complete')
+        raise
+    return result.get("questions", [])
+
+def stream_questions_for_chunk(material, question_count):
+    """
+    对单个资料块流式调用LLM，每解析出一道完整题目就立即返回
+    输出中途断开时，之前已返回的题目仍然有效
+    """
+    parser = QuestionStreamParser()
+    start = time.perf_counter()
+    usage, first_token = None, None
+    try:
+        with closing(get_gateway().chat(
+            messages=[{"role": "user", "content": build_prompt(material, question_count)}],
+            temperature=Config.LLM_TEMPERATURE,
+            stream=True
+        )) as stream:
+            for event in stream:
+                usage = getattr(event, 'usage', None) or usage  # 部分接口在最后一个事件中返回usage
+                if not event.choices:
+                    continue
+                delta = event.choices[0].delta.content
+                if delta:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                        observe('app_llm_first_token_seconds', first_token)
+                    yield from parser.feed(delta)
+    except Exception:
+        _finish_call('stream', start, error=True)
+        raise
+    finally:
+        inc('app_llm_parse_failures_total', parser.failures, mode='stream')
+    _finish_call('stream', start, usage=usage)
+
+def _finish_call(mode, start, usage=None, error=False):
+    # 记录一次LLM调用（含网关内的重试）的耗时、token用量和失败次数
+    observe('app_llm_request_duration_seconds', time.perf_counter() - start, mode=mode)
+    if error:
+        inc('app_llm_errors_total', mode=mode)
+    if usage is not None:
+        inc('app_llm_tokens_total', getattr(usage, 'prompt_tokens', 0) or 0, kind='prompt')
+        inc('app_llm_tokens_total', getattr(usage, 'completion_tokens', 0) or 0, kind='completion')
+
+def _run_chunk(material, question_count, results):
+    # 在线程池中执行：把题目逐道放入队列，最后放入结束标记（或异常）
+    try:
+        if Config.LLM_STREAMING:
+            for q in stream_questions_for_chunk(material, question_count):
+                results.put(('question', q))
+        else:
+            for q in generate_questions_for_chunk(material, question_count):
+                results.put(('question', q))
+        results.put(('done', None))
+    except Exception as e:
+        results.put(('error', e))
+
+def iter_questions_from_material(material, question_count=10, use_cache=True, errors=None, stats=None):
+    """
+    从资料生成题目，逐道返回（生成器）
+    资料先去冗余，再按段落/标题切块，题目数按块大小分配，单块超出token预算时块内抽取关键句压缩；各块并发调用LLM，
+    任一块解析出题目就立即返回（已校验、已跨块去重）；相同资料和参数的结果会被缓存
+    :param material: 用户上传的资料内容（字符串）
+    :param question_count: 生成题目数量
+    :param use_cache: 是否读取缓存（"重新生成"时传False，结果仍会写入缓存）
+    :param errors: 传入列表时，各块的失败原因会追加到其中
+    :param stats: 传入字典时，写入资料压缩前后的token估算（见compress_service.prepare_material）
+    """
+    errors = errors if errors is not None else []
+    if not material or len(material) < 100:
+        errors.append("资料内容过短，无法生成题目")
+        return
+
+    # 缓存键按处理后的各块计算：只有页眉页脚不同的资料可以共用缓存，修改切块/预算配置后自动失效
+    tasks, report = prepare_material(material, question_count)
+    if stats is not None:
+        stats.update(report)
+    if sum(len(chunk.strip()) for chunk, _ in tasks) < 100:  # 如整份资料都是页码、版权声明
+        errors.append("资料内容过短（去掉页码、页眉页脚和重复内容后），无法生成题目")
+        return
+    inc('app_llm_material_tokens_total', report['material_tokens'], stage='raw')
+    inc('app_llm_material_tokens_total', report['prompt_tokens'], stage='sent')
+    if report['tokens_saved']:
+        logger.info("资料压缩：约%d → %d token（节省%d）", report['material_tokens'], report['prompt_tokens'], report['tokens_saved'])
+
+    cache_key = None
+    if Config.LLM_CACHE_ENABLED:
+        prepared = '\n\n'.join(f'{count}\n{chunk}' for chunk, count in tasks)
+        cache_key = generation_cache_key(prepared, question_count, Config.LLM_MODEL, PROMPT_VERSION, Config.LLM_TEMPERATURE)
+        if not use_cache:
+            record_cache_bypass()
+        else:
+            cached = get_cached_questions(cache_key)
+            if cached is not None:
+                yield from cached
+                return
 
-    except Exception as e:  
-        print(f"LLM生成题目失败：{str(e)}")
-        return {"error": f"生成失败：{str(e)}"}
+
+    results = queue.Queue()
+    questions, seen = [], set()
+    chunk_failed = False
+    with ThreadPoolExecutor(max_workers=min(Config.LLM_CHUNK_WORKERS, len(tasks))) as executor:
+        for chunk, count in tasks:
+            executor.submit(_run_chunk, chunk, count, results)
+        pending = len(tasks)
+        while pending:
+            kind, value = results.get()
+            if kind == 'question':
+                q = validate_question(value)
+                key = normalize_for_dedup(q['content']) if q else None
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                questions.append(q)
+                yield q
+            else:
+                pending -= 1
+                if kind == 'error':
+                    logger.warning("LLM生成题目失败：%s", value)
+                    errors.append(f"生成失败：{str(value)}")
+                    chunk_failed = True
+
+    # 有块失败时不写入缓存，避免把不完整的结果缓存下来
+    if cache_key and questions and not chunk_failed:
+        set_cached_questions(cache_key, questions)
+
+def generate_questions_from_material(material, question_count=10, use_cache=True):
+    """
+    从用户上传的资料生成题目（等待全部完成）
+    :param material: 用户上传的资料内容（字符串）
+    :param question_count: 生成题目数量（默认10道）
+    :param use_cache: 是否读取缓存
+    :return: 生成的题目列表（字典格式）；全部失败时返回{"error": 原因}
+    """
+    errors = []
+    questions = list(iter_questions_from_material(material, question_count, use_cache, errors))
+    if not questions and errors:
+        return {"error": errors[0]}
+    return questions
 
 
 # 本地LLM调用示例（若不用API，取消注释并安装依赖：transformers、torch、accelerate）
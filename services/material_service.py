@@ -0,0 +1,94 @@
+from bisect import bisect_right
+import re
+
+# 资料切分：按段落/标题切块，超长段落再按中英文句末标点切句，保证每块不超过上限
+
+# 标题行：Markdown标题、"第X章/节/部分"、"一、"、"1. "/"1.2 " 等编号
+HEADING_RE = re.compile(r'^\s*(#{1,6}\s|第[一二三四五六七八九十百零\d]+[章节篇部分讲课]|[一二三四五六七八九十]+、|\d+(\.\d+)*[\.、\s])')
+# 句子边界：中文句末标点直接切分，英文句末标点后需跟空白
+SENTENCE_RE = re.compile(r'(?<=[。！？；!?;])|(?<=[.])(?=\s)')
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+
+def split_blocks(material):
+    """按空行切段落，标题行单独起一段"""
+    blocks = []
+    for paragraph in PARAGRAPH_RE.split(material):
+        current = []
+        for line in paragraph.splitlines():
+            if HEADING_RE.match(line) and current:
+                blocks.append('\n'.join(current))
+                current = []
+            if line.strip():
+                current.append(line.rstrip())
+        if current:
+            blocks.append('\n'.join(current))
+    return blocks
+
+def _split_long_block(block, max_chars):
+    """超长段落按句子切分，单句仍超长则硬切"""
+    pieces, current = [], ''
+    for sentence in SENTENCE_RE.split(block):
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if len(current) + len(sentence) > max_chars:
+            pieces.append(current)
+            current = ''
+        current += sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_material(material, max_chars=6000):
+    """
+    把资料切成约max_chars字符的块（开头的短标题会并入后面的内容，可能略超上限）
+    尽量在标题前断开，其次在段落之间断开，最后才在句子之间断开
+    :return: 字符串列表（保持原文顺序）
+    """
+    if len(material) <= max_chars:
+        return [material]
+
+    chunks, current = [], ''
+    for block in split_blocks(material):
+        for piece in (_split_long_block(block, max_chars) if len(block) > max_chars else [block]):
+            is_heading = bool(HEADING_RE.match(piece))
+            # 当前块已过半且遇到新标题，或放不下了，就开新块（只有一个短标题时不单独成块）
+            overflow = len(current) + len(piece) + 2 > max_chars and len(current) >= max_chars // 10
+            if current and (overflow or (is_heading and len(current) >= max_chars // 2)):
+                chunks.append(current)
+                current = ''
+            current = f'{current}\n\n{piece}' if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def allocate_counts(sizes, total):
+    """
+    按块大小比例分配题目数
+    第i道题落在全文位置(i+0.5)/total处所在的块，既按比例又均匀覆盖全文
+    :param sizes: 每块的大小列表
+    :param total: 题目总数
+    :return: 每块分配的题目数列表
+    """
+    counts = [0] * len(sizes)
+    length = sum(sizes)
+    if not sizes or length == 0:
+        return counts
+    boundaries = []
+    acc = 0
+    for size in sizes:
+        acc += size
+        boundaries.append(acc)
+    for i in range(total):
+        position = (i + 0.5) * length / total
+        counts[min(bisect_right(boundaries, position), len(sizes) - 1)] += 1
+    return counts
+
+def normalize_for_dedup(text):
+    """去掉空白和标点并转小写，用于题干判重"""
+    return re.sub(r'[\s\W_]+', '', text or '').lower()
\ No newline at end of file
@@ -0,0 +1,182 @@
+from bisect import bisect_left
+from config import Config
+from flask import Response, abort, g, has_app_context, request
+from sqlalchemy import event
+import json
+import logging
+import re
+import threading
+import time
+
+# 运行指标：路由耗时、每个请求的SQL条数/耗时（含N+1检测）、LLM调用、PDF渲染，
+# /metrics以Prometheus文本格式输出，每个请求再写一行JSON日志。
+# METRICS_ENABLED=False（默认）时不注册任何钩子，inc/observe直接返回。
+# 指标保存在进程内：gunicorn多个worker时，每次抓取只看到处理该请求的worker的数据。
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 20_000_000, 100_000_000)
+
+# 指标名 -> (类型, 说明, 桶)
+METRICS = {
+    'app_requests_total': ('counter', '请求数', None),
+    'app_request_duration_seconds': ('histogram', '请求耗时（流式响应只计到开始输出）', LATENCY_BUCKETS),
+    'app_request_sql_queries': ('histogram', '每个请求执行的SQL条数', COUNT_BUCKETS),
+    'app_request_sql_seconds': ('histogram', '每个请求的SQL总耗时', LATENCY_BUCKETS),
+    'app_sql_duration_seconds': ('histogram', '单条SQL耗时', LATENCY_BUCKETS),
+    'app_sql_n_plus_one_total': ('counter', '同一条SQL在一个请求内重复执行超过阈值的次数', None),
+    'app_llm_request_duration_seconds': ('histogram', 'LLM调用耗时（流式为读完整个输出）', LATENCY_BUCKETS),
+    'app_llm_first_token_seconds': ('histogram', '流式LLM调用的首个输出耗时', LATENCY_BUCKETS),
+    'app_llm_tokens_total': ('counter', 'LLM消耗的token数（接口返回usage时统计）', None),
+    'app_llm_material_tokens_total': ('counter', '出题资料的估算token数（raw为原文，sent为去冗余/压缩后）', None),
+    'app_llm_retries_total': ('counter', 'LLM请求重试次数', None),
+    'app_llm_hedged_total': ('counter', 'LLM对冲请求次数', None),
+    'app_llm_backend_requests_total': ('counter', '各LLM后端的请求数（按结果）', None),
+    'app_llm_breaker_opened_total': ('counter', 'LLM后端熔断次数', None),
+    'app_llm_errors_total': ('counter', 'LLM调用失败次数', None),
+    'app_llm_parse_failures_total': ('counter', 'LLM输出无法解析的次数（流式为无法解析的题目对象数）', None),
+    'app_pdf_render_seconds': ('histogram', 'PDF渲染耗时', LATENCY_BUCKETS),
+    'app_pdf_size_bytes': ('histogram', 'PDF/zip文件大小', SIZE_BUCKETS),
+}
+
+logger = logging.getLogger('review_app.requests')
+
+_lock = threading.Lock()
+_counters = {}    # (指标名, 标签) -> 数值
+_histograms = {}  # (指标名, 标签) -> [各桶计数, 总和, 次数]
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    """计数器加value（未启用指标时不做任何事）"""
+    if not Config.METRICS_ENABLED or not value:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """直方图记录一个观测值"""
+    if not Config.METRICS_ENABLED:
+        return
+    buckets = METRICS[name][2]
+    index = bisect_left(buckets, value)
+    key = _key(name, labels)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        entry[0][index] += 1
+        entry[1] += value
+        entry[2] += 1
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+def render_metrics():
+    """Prometheus文本格式（0.0.4）"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(entry[0]), entry[1], entry[2]) for key, entry in _histograms.items()}
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+            continue
+        for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, n in zip((*buckets, '+Inf'), counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {round(total, 6)}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+# ---------------------- Flask/SQLAlchemy钩子 ----------------------
+def init_metrics(app, db):
+    """启用指标时注册请求钩子和SQL事件，并开启/metrics；未启用时什么都不做"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    if app.config['METRICS_REQUEST_LOG'] and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', _metrics_view)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            _listen_engine(engine, bind_key or 'primary')
+
+def _metrics_view():
+    # 设置METRICS_TOKEN时要求Authorization: Bearer <token>
+    token = Config.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(403)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def _listen_engine(engine, db_label):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_start'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop('query_start', time.perf_counter())
+        observe('app_sql_duration_seconds', elapsed, db=db_label)
+        stats = g.get('request_metrics') if has_app_context() else None
+        if stats is not None:  # 后台任务线程只有应用上下文，不计入请求
+            stats['sql_count'] += 1
+            stats['sql_seconds'] += elapsed
+            stats['statements'][statement] = stats['statements'].get(statement, 0) + 1
+
+def _start_request():
+    g.request_metrics = {'start': time.perf_counter(), 'sql_count': 0, 'sql_seconds': 0.0, 'statements': {}}
+
+def _finish_request(response):
+    stats = g.pop('request_metrics', None)
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats['start']
+    endpoint = request.endpoint or 'unmatched'  # 404不按路径区分，避免标签无限增长
+    observe('app_request_duration_seconds', elapsed, endpoint=endpoint, method=request.method)
+    inc('app_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    observe('app_request_sql_queries', stats['sql_count'], endpoint=endpoint)
+    observe('app_request_sql_seconds', stats['sql_seconds'], endpoint=endpoint)
+
+    # 参数化SQL文本相同、在一个请求内执行多次，通常是循环里逐条查询（N+1）
+    repeated = [{'statement': re.sub(r'\s+', ' ', statement)[:200], 'count': count}
+                for statement, count in stats['statements'].items()
+                if count >= Config.METRICS_N_PLUS_ONE_THRESHOLD]
+    if repeated:
+        inc('app_sql_n_plus_one_total', len(repeated), endpoint=endpoint)
+
+    if Config.METRICS_REQUEST_LOG:
+        user = g.get('_login_user')  # 不通过current_user读取，避免为记日志再查一次用户
+        logger.info(json.dumps({
+            'ts': round(time.time(), 3),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 2),
+            'sql_count': stats['sql_count'],
+            'sql_ms': round(stats['sql_seconds'] * 1000, 2),
+            'user_id': getattr(user, 'id', None),
+            'n_plus_one': repeated or None,
+        }, ensure_ascii=False))
+    return response
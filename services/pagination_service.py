@@ -0,0 +1,72 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import and_, or_
+import base64
+import json
+
+# 键集（游标）分页：按排序列的最后一行值定位下一页，
+# 配合(过滤列, 排序列, id)复合索引，任意页的代价都是一次索引范围扫描，与数据总量无关
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def _load(column, value):
+    python_type = column.type.python_type
+    if value is None:
+        return None
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+def encode_cursor(values):
+    raw = json.dumps([_dump(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, columns):
+    """解析游标，格式不合法时返回None（当作第一页）"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [_load(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        return None
+
+def _after(columns, values, descending):
+    # (c1, c2, ...) < (v1, v2, ...) 展开成 c1 < v1 OR (c1 = v1 AND c2 < v2) ...，各数据库都能走索引
+    conditions = []
+    for i, column in enumerate(columns):
+        compare = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*[columns[j] == values[j] for j in range(i)], compare))
+    return or_(*conditions)
+
+def keyset_page(query, columns, cursor=None, limit=20, descending=True):
+    """
+    对查询做键集分页
+    :param query: 已加好过滤条件的查询
+    :param columns: 排序列列表，最后一列必须唯一（通常是id）作为稳定的决胜列
+    :param cursor: 上一页返回的游标，None表示第一页
+    :param limit: 每页条数
+    :param descending: 是否降序
+    :return: (本页对象列表, 下一页游标或None)
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if values is not None and None not in values:
+            query = query.filter(_after(columns, values, descending))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return rows, next_cursor
\ No newline at end of file
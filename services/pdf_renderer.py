@@ -0,0 +1,102 @@
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.lib.units import inch
+from html import escape
+from io import BytesIO
+import os
+import threading
+
+# PDF渲染：导入reportlab较慢，本模块只在真正导出时才导入（进程池子进程或PDF_WORKERS=0时的请求线程）
+
+# 注册中文字体
+_font_registered = False
+_font_lock = threading.Lock()
+
+def register_font():
+    try:
+        font_path = os.path.join(os.path.dirname(__file__), "../static/font/SimHei.ttf")
+        if os.path.exists(font_path):
+            pdfmetrics.registerFont(TTFont('SimHei', font_path))
+        else:
+            print("警告：未找到中文字体文件，PDF中文可能乱码")
+    except Exception as e:
+        print(f"字体注册失败：{str(e)}")
+
+def ensure_font():
+    # 第一次渲染时才注册字体（解析TTF较慢），不导出PDF的worker不付出这部分开销
+    global _font_registered
+    with _font_lock:
+        if not _font_registered:
+            register_font()
+            _font_registered = True
+
+# 渲染函数只接收可pickle的字典，可在进程池中执行
+def _styles():
+    ensure_font()
+    styles = getSampleStyleSheet()
+    styles['Heading1'].fontName = 'SimHei'  # 中文标题
+    styles['Normal'].fontName = 'SimHei'   # 中文正文
+    return styles
+
+def _build(elements):
+    # 渲染到内存，不落临时文件
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=inch/2, leftMargin=inch/2, topMargin=inch, bottomMargin=inch)
+    doc.build(elements)
+    return buffer.getvalue()
+
+def _question_elements(idx, q, styles):
+    # 题干、选项（单选/多选）、正确答案（单独标注，方便复习）；文本转义，避免题目中的<>被当成标记
+    elements = [Paragraph(f"{idx}. 【{q['question_type'].replace('_', ' ')}】{escape(q['content'])}", styles['Normal'])]
+    if q['question_type'] in ['single_choice', 'multiple_choice']:
+        for opt in q['options']:
+            elements.append(Paragraph(f"   {escape(str(opt))}", styles['Normal']))
+    elements.append(Paragraph(f"   正确答案：{escape(q['correct_answer'])}", styles['Normal']))
+    return elements
+
+def render_paper_pdf(payload):
+    """
+    渲染卷子PDF
+    :param payload: paper_payload()生成的字典
+    :return: PDF字节
+    """
+    styles = _styles()
+    elements = []
+
+    # 卷子标题
+    elements.append(Paragraph(f"《{escape(payload['paper_name'])}》", styles['Heading1']))
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph(f"总题数：{len(payload['questions'])} 道 | 总分：{payload['total_score']} 分", styles['Normal']))
+    elements.append(Spacer(1, 30))
+
+    # 添加题目
+    for idx, q in enumerate(payload['questions'], 1):
+        elements.extend(_question_elements(idx, q, styles))
+        elements.append(Spacer(1, 15))
+    return _build(elements)
+
+def render_wrong_pdf(payload):
+    """
+    渲染错题本PDF（或其中一册）
+    :param payload: wrong_payload()生成的字典，分册时带start（起始序号）和part/parts
+    :return: PDF字节
+    """
+    styles = _styles()
+    elements = []
+
+    # 错题本标题
+    title = "错题本" if payload.get('parts', 1) == 1 else f"错题本（第{payload['part']}/{payload['parts']}册）"
+    elements.append(Paragraph(title, styles['Heading1']))
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph(f"用户ID：{payload['user_id']} | 错题总数：{payload['total']} 道", styles['Normal']))
+    elements.append(Spacer(1, 30))
+
+    # 添加错题
+    for idx, q in enumerate(payload['items'], payload.get('start', 1)):
+        elements.extend(_question_elements(idx, q, styles))
+        elements.append(Paragraph(f"   做错次数：{q['wrong_count']} 次 | 最后做错时间：{q['last_wrong_date']}", styles['Normal']))
+        elements.append(Spacer(1, 15))
+    return _build(elements)
@@ -1,92 +1,122 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.units import inch
-import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from config import Config
+from services.metrics_service import observe
+import multiprocessing
+import threading
+import time
+import zipfile
 
-# 注册中文字体
-def register_font():
-    try:
-        
-        font_path = os.path.join(os.path.dirname(__file__), "../static/font/SimHei.ttf")
-        if os.path.exists(font_path):
-            pdfmetrics.registerFont(TTFont('SimHei', font_path))
-        else:
-            print("警告：未找到中文字体文件，PDF中文可能乱码")
-    except Exception as e:
-        print(f"字体注册失败：{str(e)}")
+# 渲染参数（参与导出缓存键的计算）
+RENDER_OPTIONS = {'pagesize': 'A4', 'show_answers': True, 'batch_size': Config.PDF_BATCH_SIZE}
 
-# 初始化字体
-register_font()
+class PDFExportError(Exception):
+    """导出超时或超出限制"""
+    pass
 
-def generate_paper_pdf(paper, questions, save_path):
-    """
-    生成卷子PDF
-    :param paper: 卷子对象（Paper模型实例）
-    :param questions: 题目列表（Question模型实例列表）
-    :param save_path: PDF保存路径（如/tmp/paper_1.pdf）
-    """
-    doc = SimpleDocTemplate(save_path, pagesize=A4, rightMargin=inch/2, leftMargin=inch/2, topMargin=inch, bottomMargin=inch)
-    elements = []
-    styles = getSampleStyleSheet()
-    styles['Heading1'].fontName = 'SimHei'  # 中文标题
-    styles['Normal'].fontName = 'SimHei'   # 中文正文
+# ---------------------- 组装数据（在请求线程中执行） ----------------------
+def paper_payload(paper):
+    """把卷子字典（content_cache.get_paper_view）转为渲染用的字典"""
+    return {
+        'paper_name': paper['paper_name'],
+        'total_score': paper['total_score'],
+        'questions': [item['question'] for item in paper['items']],
+    }
+
+def wrong_payload(user_id, wrong_questions, questions):
+    """把错题及对应题目转为可跨进程传递的字典"""
+    items = []
+    for wq, q in zip(wrong_questions, questions):
+        item = q.to_dict()
+        item['wrong_count'] = wq.wrong_count
+        item['last_wrong_date'] = wq.last_wrong_time.strftime('%Y-%m-%d')
+        items.append(item)
+    return {'user_id': user_id, 'total': len(items), 'items': items}
 
-    # 卷子标题
-    elements.append(Paragraph(f"《{paper.paper_name}》", styles['Heading1']))
-    elements.append(Spacer(1, 20))
-    elements.append(Paragraph(f"总题数：{paper.get_question_count()} 道 | 总分：{paper.total_score} 分", styles['Normal']))
-    elements.append(Spacer(1, 30))
+# ---------------------- 进程池 ----------------------
+_pool = None
+_pool_lock = threading.Lock()
 
-    # 添加题目
-    for idx, q in enumerate(questions, 1):
-        # 题干
-        elements.append(Paragraph(f"{idx}. 【{q.question_type.replace('_', ' ')}】{q.content}", styles['Normal']))
-        # 选项（单选/多选）
-        if q.question_type in ['single_choice', 'multiple_choice']:
-            options = q.get_options()
-            for opt in options:
-                elements.append(Paragraph(f"   {opt}", styles['Normal']))
-        # 正确答案（单独标注，方便复习）
-        elements.append(Paragraph(f"   正确答案：{q.correct_answer}", styles['Normal']))
-        elements.append(Spacer(1, 15))
+def _get_pool():
+    # 首次导出时才创建进程池；用spawn启动，避免在多线程的worker里fork
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=Config.PDF_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
 
-    # 生成PDF
-    doc.build(elements)
-    return save_path
+def _discard_pool(pool):
+    # 已经开始渲染的任务无法取消：丢弃整个进程池并终止其进程，释放渲染名额，下次导出时重新创建
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
 
-def generate_wrong_pdf(user_id, wrong_questions, questions, save_path):
+def _render_all(func_name, payloads, timeout=None):
+    # 分发到进程池并等待全部完成，整次导出共用一个期限（默认PDF_RENDER_TIMEOUT）；PDF_WORKERS=0时在当前线程渲染
+    from services import pdf_renderer
+    func = getattr(pdf_renderer, func_name)
+    if Config.PDF_WORKERS <= 0:
+        return [func(payload) for payload in payloads]
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(func, payload) for payload in payloads]
+        timeout = timeout or Config.PDF_RENDER_TIMEOUT
+        _, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            _discard_pool(pool)
+            raise PDFExportError(f'PDF生成超时（超过{timeout}秒），请减少导出的题目数量')
+        return [future.result() for future in futures]
+    except BrokenProcessPool:  # 进程池因其他导出超时被终止，或渲染进程异常退出
+        _discard_pool(pool)
+        raise PDFExportError('PDF生成中断，请重试')
+
+def export_paper_pdf(paper):
     """
-    生成错题本PDF
-    :param user_id: 用户ID
-    :param wrong_questions: 错题列表（WrongQuestion模型实例列表）
-    :param questions: 对应题目列表（Question模型实例列表）
-    :param save_path: PDF保存路径
+    在进程池中渲染卷子PDF
+    :param paper: 卷子字典（content_cache.get_paper_view）
+    :return: PDF字节
     """
-    doc = SimpleDocTemplate(save_path, pagesize=A4, rightMargin=inch/2, leftMargin=inch/2, topMargin=inch, bottomMargin=inch)
-    elements = []
-    styles = getSampleStyleSheet()
-    styles['Heading1'].fontName = 'SimHei'
-    styles['Normal'].fontName = 'SimHei'
+    if len(paper['items']) > Config.PDF_MAX_ITEMS:
+        raise PDFExportError(f'题目数超过单次导出上限（{Config.PDF_MAX_ITEMS}道）')
+    start = time.perf_counter()
+    data = _render_all('render_paper_pdf', [paper_payload(paper)])[0]
+    _record_render('paper', start, data)
+    return data
 
-    # 错题本标题
-    elements.append(Paragraph("错题本", styles['Heading1']))
-    elements.append(Spacer(1, 20))
-    elements.append(Paragraph(f"用户ID：{user_id} | 错题总数：{len(wrong_questions)} 道", styles['Normal']))
-    elements.append(Spacer(1, 30))
+def export_wrong_book(user_id, wrong_questions, questions, timeout=None):
+    """
+    在进程池中渲染错题本；超过PDF_BATCH_SIZE道时拆成多册并行渲染，打包为zip（每册一个PDF，按顺序编号）
+    :param timeout: 渲染期限（秒），默认PDF_RENDER_TIMEOUT；后台导出任务传PDF_EXPORT_JOB_TIMEOUT
+    :return: (文件字节, 是否为zip)
+    """
+    if len(wrong_questions) > Config.PDF_MAX_ITEMS:
+        raise PDFExportError(f'错题数超过单次导出上限（{Config.PDF_MAX_ITEMS}道）')
+    payload = wrong_payload(user_id, wrong_questions, questions)
+    items, size = payload['items'], Config.PDF_BATCH_SIZE
+    start = time.perf_counter()
+    if len(items) <= size:
+        data = _render_all('render_wrong_pdf', [payload], timeout)[0]
+        _record_render('wrong', start, data)
+        return data, False
 
-    # 添加错题
-    for idx, (wq, q) in enumerate(zip(wrong_questions, questions), 1):
-        elements.append(Paragraph(f"{idx}. 【{q.question_type.replace('_', ' ')}】{q.content}", styles['Normal']))
-        if q.question_type in ['single_choice', 'multiple_choice']:
-            for opt in q.get_options():
-                elements.append(Paragraph(f"   {opt}", styles['Normal']))
-        elements.append(Paragraph(f"   正确答案：{q.correct_answer}", styles['Normal']))
-        elements.append(Paragraph(f"   做错次数：{wq.wrong_count} 次 | 最后做错时间：{wq.last_wrong_time.strftime('%Y-%m-%d')}", styles['Normal']))
-        elements.append(Spacer(1, 15))
+    parts = (len(items) + size - 1) // size
+    payloads = [dict(payload, items=items[i * size:(i + 1) * size], start=i * size + 1, part=i + 1, parts=parts)
+                for i in range(parts)]
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:  # PDF本身已压缩
+        for i, data in enumerate(_render_all('render_wrong_pdf', payloads, timeout), 1):
+            archive.writestr(f'错题本_第{i}册.pdf', data)
+    data = buffer.getvalue()
+    _record_render('wrong_zip', start, data)
+    return data, True
 
-    doc.build(elements)
-    return save_path
\ No newline at end of file
+def _record_render(kind, start, data):
+    # 渲染耗时（含进程池排队）和文件大小；命中导出缓存时不会渲染，也不计入
+    observe('app_pdf_render_seconds', time.perf_counter() - start, kind=kind)
+    observe('app_pdf_size_bytes', len(data), kind=kind)
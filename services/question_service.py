@@ -0,0 +1,86 @@
+from config import Config
+from models import db
+from models.question import Question
+from services.dedup_service import question_simhash, find_duplicate, index_question
+from services.pagination_service import keyset_page
+from services.search_service import add_to_search_index
+import json
+
+QUESTION_TYPES = ('single_choice', 'multiple_choice', 'fill_blank')
+
+def validate_question(q):
+    """
+    校验并规范化LLM返回的单道题目
+    :return: 规范化后的题目字典；缺少必要字段或题型不合法时返回None
+    """
+    if not isinstance(q, dict) or q.get('type') not in QUESTION_TYPES:
+        return None
+    content = q.get('content')
+    answer = q.get('correct_answer')
+    if not isinstance(content, str) or not content.strip() or answer in (None, '', []):
+        return None
+    if isinstance(answer, list):  # 多选题答案偶尔会输出为列表
+        answer = ','.join(str(a).strip() for a in answer)
+
+    question = {'type': q['type'], 'content': content.strip(), 'correct_answer': str(answer).strip()}
+    if q['type'] != 'fill_blank':
+        options = q.get('options')
+        if not isinstance(options, list) or len(options) < 2:
+            return None
+        question['options'] = [str(opt) for opt in options]
+    return question
+
+def build_question(q, material, creator_id):
+    """
+    把LLM返回的题目字典转为Question对象（未提交）
+    :param q: 题目字典（type/content/options/correct_answer）
+    :param material: 原始资料（截取前500字作为来源）
+    :param creator_id: 创建者用户ID
+    """
+    return Question(
+        question_type=q['type'],
+        content=q['content'],
+        options=json.dumps(q['options'], ensure_ascii=False) if 'options' in q else None,
+        correct_answer=q['correct_answer'],
+        source_material=material[:500] + "..." if len(material) > 500 else material,  # 截取前500字
+        creator_id=creator_id
+    )
+
+def add_generated_question(q, material, creator_id):
+    """
+    把生成的题目加入会话并flush拿到ID（由调用方提交）
+    与题库中已有题目近似重复时不插入：QUESTION_DEDUP_MODE为merge时返回已有题目，drop时返回None
+    :return: Question对象或None
+    """
+    simhash = None
+    if Config.QUESTION_DEDUP_ENABLED:
+        simhash = question_simhash(q['content'], q.get('options'))
+        duplicate_id = find_duplicate(q['type'], simhash)
+        if duplicate_id is not None:
+            return db.session.get(Question, duplicate_id) if Config.QUESTION_DEDUP_MODE == 'merge' else None
+
+    new_question = build_question(q, material, creator_id)
+    db.session.add(new_question)
+    db.session.flush()
+    index_question(new_question, simhash)
+    add_to_search_index([new_question])
+    return new_question
+
+# 题库列表的排序方式 -> 键集分页的排序列（最后一列id保证顺序稳定）
+QUESTION_SORTS = {
+    'score_desc': [Question.score, Question.id],
+    'create_time_desc': [Question.create_time, Question.id],
+}
+
+def query_question_page(question_type='', creator_id=None, sort_by='score_desc', cursor=None, limit=20):
+    """
+    按类型/创建者筛选并键集分页查询题库
+    :return: (本页题目列表, 下一页游标或None)
+    """
+    query = Question.query.filter(Question.duplicate_of.is_(None))  # 不显示被标记为重复的题目
+    if question_type in QUESTION_TYPES:
+        query = query.filter(Question.question_type == question_type)
+    if creator_id:
+        query = query.filter(Question.creator_id == creator_id)
+    columns = QUESTION_SORTS.get(sort_by, QUESTION_SORTS['score_desc'])
+    return keyset_page(query, columns, cursor=cursor, limit=limit)
\ No newline at end of file
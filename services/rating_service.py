@@ -0,0 +1,37 @@
+from sqlalchemy.exc import IntegrityError
+from models import db
+from models.question import Question
+from models.question_rating import QuestionRating
+from services.content_cache import invalidate_questions
+
+def rate_questions(user_id, ratings):
+    """
+    批量评分（一个事务）：先写评分记录（唯一索引防止同一用户重复评分），再原子累加题目的评分总和与次数
+    :param user_id: 用户ID
+    :param ratings: {题目ID: 分数}，分数需已校验在1-5之间
+    :return: (评分成功的题目ID列表, 已评过或不存在而跳过的题目ID列表)
+    """
+    question_ids = list(ratings)
+    if not question_ids:
+        return [], []
+    existing = {row.id for row in db.session.query(Question.id).filter(Question.id.in_(question_ids))}
+    already = {row.question_id for row in db.session.query(QuestionRating.question_id).filter(
+        QuestionRating.user_id == user_id, QuestionRating.question_id.in_(question_ids))}
+    rated = [qid for qid in question_ids if qid in existing and qid not in already]
+    skipped = [qid for qid in question_ids if qid not in rated]
+    if not rated:
+        return [], skipped
+
+    try:
+        db.session.execute(QuestionRating.__table__.insert(), [
+            {'user_id': user_id, 'question_id': qid, 'score': ratings[qid]} for qid in rated
+        ])
+        for qid in rated:
+            Question.apply_rating(qid, ratings[qid])
+        db.session.commit()
+    except IntegrityError:
+        # 并发重复提交：唯一索引冲突，整批回滚
+        db.session.rollback()
+        return [], question_ids
+    invalidate_questions(rated)  # 平均分变了，题目缓存失效
+    return rated, skipped
\ No newline at end of file
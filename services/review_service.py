@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+from models import db
+from models.paper import Paper
+from models.question import Question
+from models.wrong_question import WrongQuestion
+from services.grading_service import grade_answer
+from services.pagination_service import keyset_page
+
+# 错题本间隔重复（SM-2）：答对后复习间隔按1天、6天、间隔×难度系数递增，答错则重新从头开始。
+# 到期查询走(user_id, next_due_at, id)索引，只读取最早到期的N道，与错题总数无关。
+
+QUALITY_CORRECT = 4  # 答对按"稍有犹豫但正确"计
+QUALITY_WRONG = 1
+MIN_EASE = 1.3
+
+def schedule(wrong_question, quality, now):
+    """按SM-2更新一道错题的复习状态（不提交）"""
+    wq = wrong_question
+    if quality >= 3:
+        if wq.repetitions == 0:
+            wq.interval_days = 1
+        elif wq.repetitions == 1:
+            wq.interval_days = 6
+        else:
+            wq.interval_days = round(wq.interval_days * wq.ease)
+        wq.repetitions += 1
+    else:
+        wq.repetitions = 0
+        wq.interval_days = 1
+        wq.wrong_count += 1
+        wq.last_wrong_time = now
+    wq.ease = max(MIN_EASE, wq.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    wq.next_due_at = now + timedelta(days=wq.interval_days)
+    wq.last_review_time = now
+
+def wrong_book_query(user_id, question_type='', since=None, until=None):
+    """
+    错题本查询（未排序）：可按题型、最近错误时间[since, until)筛选
+    时间条件和排序走(user_id, last_wrong_time, id)索引，按题型筛选时关联题目表
+    """
+    query = WrongQuestion.query.filter(WrongQuestion.user_id == user_id)
+    if question_type:
+        query = query.join(Question, Question.id == WrongQuestion.question_id).filter(Question.question_type == question_type)
+    if since:
+        query = query.filter(WrongQuestion.last_wrong_time >= since)
+    if until:
+        query = query.filter(WrongQuestion.last_wrong_time < until)
+    return query
+
+def load_wrong_export(user_id, question_type='', since=None, until=None):
+    """
+    导出错题本用：全部符合筛选条件的错题（按最近错误时间倒序）及对应题目
+    :return: (WrongQuestion列表, 与之一一对应的Question列表)
+    """
+    wrong_questions = wrong_book_query(user_id, question_type, since, until).order_by(
+        WrongQuestion.last_wrong_time.desc(), WrongQuestion.id.desc()).all()
+    questions = {q.id: q for q in Question.query.filter(
+        Question.id.in_([wq.question_id for wq in wrong_questions]))} if wrong_questions else {}
+    return wrong_questions, [questions[wq.question_id] for wq in wrong_questions]
+
+def query_wrong_page(user_id, question_type='', since=None, until=None, cursor=None, limit=20):
+    """
+    错题本一页（按最近错误时间倒序，键集分页）
+    :return: ([(WrongQuestion, Question), ...], 下一页游标或None)
+    """
+    wrong_questions, next_cursor = keyset_page(
+        wrong_book_query(user_id, question_type, since, until),
+        [WrongQuestion.last_wrong_time, WrongQuestion.id], cursor=cursor, limit=limit)
+    questions = {q.id: q for q in Question.query.filter(
+        Question.id.in_([wq.question_id for wq in wrong_questions]))} if wrong_questions else {}
+    return [(wq, questions[wq.question_id]) for wq in wrong_questions], next_cursor
+
+def get_due_reviews(user_id, limit=20, now=None):
+    """最早到期的limit道错题（按到期时间排序）"""
+    now = now or datetime.utcnow()
+    return WrongQuestion.query.filter(
+        WrongQuestion.user_id == user_id, WrongQuestion.next_due_at <= now
+    ).order_by(WrongQuestion.next_due_at, WrongQuestion.id).limit(limit).all()
+
+def count_due_reviews(user_id, now=None):
+    now = now or datetime.utcnow()
+    return WrongQuestion.query.filter(
+        WrongQuestion.user_id == user_id, WrongQuestion.next_due_at <= now
+    ).count()
+
+def submit_review(user_id, answers):
+    """
+    判分并重新安排复习时间，一个事务完成
+    :param answers: {题目ID: 作答字符串}，只处理该用户错题本中的题目
+    :return: (答对数, 复习题数)
+    """
+    now = datetime.utcnow()
+    wrong_questions = WrongQuestion.query.filter(
+        WrongQuestion.user_id == user_id, WrongQuestion.question_id.in_(list(answers))
+    ).all() if answers else []
+    questions = {q.id: q for q in Question.query.filter(
+        Question.id.in_([wq.question_id for wq in wrong_questions]))} if wrong_questions else {}
+
+    correct = 0
+    for wq in wrong_questions:
+        question = questions[wq.question_id]
+        is_correct = grade_answer(question.question_type, question.correct_answer, answers[wq.question_id])
+        schedule(wq, QUALITY_CORRECT if is_correct else QUALITY_WRONG, now)
+        correct += is_correct
+    db.session.commit()
+    return correct, len(wrong_questions)
+
+def reschedule_correct(user_id, question_ids, now):
+    """做卷子时答对了错题本中已到期的题目，按一次成功复习处理（由调用方提交）"""
+    if not question_ids:
+        return
+    for wq in WrongQuestion.query.filter(
+        WrongQuestion.user_id == user_id,
+        WrongQuestion.question_id.in_(question_ids),
+        WrongQuestion.next_due_at <= now
+    ):
+        schedule(wq, QUALITY_CORRECT, now)
+
+def create_review_paper(user_id, limit=20):
+    """
+    用最早到期的错题生成"今日复习"卷子
+    :return: Paper对象；没有到期错题时返回None
+    """
+    due = get_due_reviews(user_id, limit)
+    if not due:
+        return None
+    paper = Paper(paper_name=f'今日复习 {datetime.utcnow().strftime("%Y-%m-%d")}', creator_id=user_id, total_score=100)
+    paper.set_questions([wq.question_id for wq in due])
+    db.session.add(paper)
+    db.session.commit()
+    return paper
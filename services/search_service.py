@@ -0,0 +1,120 @@
+from sqlalchemy import column, literal_column, table, text
+from sqlalchemy.dialects.mysql import match
+from models import db
+from models.question import Question
+import json
+import re
+
+# 题库全文检索（中文按相邻两字切分）：
+# - MySQL：questions上的FULLTEXT索引（ngram解析器，ngram_token_size默认即为2），插入时由MySQL自动维护
+# - SQLite（本地运行）：FTS5虚拟表question_search，rowid即题目ID，存放预先切好的二元词，入库时增量写入
+# - 其他数据库：退化为LIKE匹配题干
+
+SEARCH_TABLE = 'question_search'
+FULLTEXT_INDEX = 'ft_questions_text'
+
+_CJK = '㐀-䶿一-鿿豈-﫿'
+TOKEN_RE = re.compile(f'[{_CJK}]+|[^\\W_{_CJK}]+')
+
+search_table = table(SEARCH_TABLE, column('rowid'), column('tokens'))
+
+def tokenize(text_value):
+    """切词：连续汉字切成相邻两字（单字保留），字母数字按词并转小写"""
+    tokens = []
+    for run in TOKEN_RE.findall(text_value or ''):
+        if re.match(f'[{_CJK}]', run):
+            tokens.extend([run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)])
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+def _backend():
+    return db.engine.dialect.name
+
+def _document(content, options, correct_answer):
+    return ' '.join(tokenize(' '.join([content, *options, correct_answer])))
+
+def create_search_index():
+    """创建全文索引（已存在则跳过），SQLite下同时为已有题目建立索引"""
+    if _backend() == 'mysql':
+        from migrations import has_index
+        if not has_index('questions', FULLTEXT_INDEX):
+            db.session.execute(text(
+                f'ALTER TABLE questions ADD FULLTEXT INDEX {FULLTEXT_INDEX} (content, options, correct_answer) WITH PARSER ngram'))
+    elif _backend() == 'sqlite':
+        db.session.execute(text(f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(tokens)'))
+        rebuild_search_index()
+
+def add_to_search_index(questions):
+    """新题目入库后写入索引（由调用方提交）；MySQL的FULLTEXT索引无需手动维护"""
+    if _backend() != 'sqlite':
+        return
+    add_documents_to_search_index([(q.id, q.content, q.get_options(), q.correct_answer) for q in questions])
+
+def add_documents_to_search_index(documents):
+    """按(题目ID, 题干, 选项列表, 答案)写入索引，批量导入时不必构造Question对象（由调用方提交）"""
+    if _backend() != 'sqlite' or not documents:
+        return
+    db.session.execute(
+        text(f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, tokens) VALUES (:id, :tokens)'),
+        [{'id': question_id, 'tokens': _document(content, options, answer)} for question_id, content, options, answer in documents]
+    )
+
+def rebuild_search_index(batch_size=1000):
+    """
+    按ID分批重建SQLite的检索表，返回索引的题目数
+    迁移0007也会调用：只用SQL读取建索引需要的列，不依赖Question模型（此时后续迁移添加的列还不存在）
+    """
+    if _backend() != 'sqlite':
+        return 0
+    db.session.execute(text(f'DELETE FROM {SEARCH_TABLE}'))
+    count, last_id = 0, 0
+    while True:
+        rows = db.session.execute(text(
+            'SELECT id, content, options, correct_answer FROM questions WHERE id > :last_id ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': batch_size}).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        add_documents_to_search_index([(row.id, row.content, json.loads(row.options) if row.options else [],
+                                        row.correct_answer) for row in rows])
+        db.session.commit()
+        count += len(rows)
+    db.session.commit()
+    return count
+
+def search_questions(keyword, question_type='', creator_id=None, min_score=None, page=1, limit=20):
+    """
+    全文检索题库，按相关度排序
+    :param keyword: 检索词（题干、选项、答案）
+    :param min_score: 最低平均评分
+    :return: (本页题目列表, 是否还有下一页)
+    """
+    keyword = (keyword or '').strip()
+    tokens = tokenize(keyword)
+    if not tokens:
+        return [], False
+
+    query = Question.query.filter(Question.duplicate_of.is_(None))
+    if _backend() == 'mysql':
+        relevance = match(Question.content, Question.options, Question.correct_answer,
+                          against=keyword).in_natural_language_mode()
+        query = query.filter(relevance).order_by(relevance.desc(), Question.id.desc())
+    elif _backend() == 'sqlite':
+        # 所有二元词都要出现（空格即AND），按bm25相关度排序（越小越相关）
+        expression = ' '.join(f'"{token}"' for token in tokens)
+        query = query.join(search_table, search_table.c.rowid == Question.id).filter(
+            text(f'{SEARCH_TABLE} MATCH :expression')
+        ).params(expression=expression).order_by(literal_column(f'bm25({SEARCH_TABLE})'), Question.id.desc())
+    else:
+        query = query.filter(Question.content.contains(keyword)).order_by(Question.id.desc())
+
+    if question_type in Question.question_type.type.enums:
+        query = query.filter(Question.question_type == question_type)
+    if creator_id:
+        query = query.filter(Question.creator_id == creator_id)
+    if min_score is not None:
+        query = query.filter(Question.score >= min_score)
+
+    rows = query.offset((page - 1) * limit).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from sqlalchemy import case
+from models import db, bulk_upsert
+from models.learning_stats import UserStats, UserTypeStats, QuestionStats
+from models.question import Question
+from models.wrong_question import WrongQuestion
+from services.question_service import QUESTION_TYPES
+
+# 学习统计：交卷时在同一事务内增量累加汇总表（每张表一条upsert），
+# 统计页按主键/唯一索引读取固定几行，查询数和代价与作答历史的长短无关。
+# 连续学习天数按UTC日期计算，只统计交卷（错题本复习不计入）。
+
+MOST_MISSED_LIMIT = 10
+
+def record_attempt_stats(user_id, results, score, now):
+    """
+    交卷后累加统计（由调用方提交）
+    :param results: [(题目ID, 题型, 是否答对), ...]
+    :param score: 本次得分
+    """
+    today = now.date()
+    correct = sum(1 for _, _, is_correct in results if is_correct)
+    bulk_upsert(UserStats.__table__, [{
+        'user_id': user_id, 'attempts': 1, 'answered': len(results), 'correct': correct, 'score_total': score,
+        'current_streak': 1, 'best_streak': 1, 'last_active_date': today, 'update_time': now,
+    }], ['user_id'], increment_columns=['attempts', 'answered', 'correct', 'score_total'], overwrite_columns=['update_time'])
+    _update_streak(user_id, today)
+
+    by_type, by_question = {}, {}
+    for question_id, question_type, is_correct in results:
+        answered, right = by_type.get(question_type, (0, 0))
+        by_type[question_type] = (answered + 1, right + is_correct)
+        answered, right = by_question.get(question_id, (0, 0))
+        by_question[question_id] = (answered + 1, right + is_correct)
+    # 按键排序后写入：多人同时交同一张卷子时按相同顺序加锁，避免死锁
+    bulk_upsert(UserTypeStats.__table__, [
+        {'user_id': user_id, 'question_type': question_type, 'answered': answered, 'correct': right}
+        for question_type, (answered, right) in sorted(by_type.items())
+    ], ['user_id', 'question_type'], increment_columns=['answered', 'correct'])
+    bulk_upsert(QuestionStats.__table__, [
+        {'question_id': question_id, 'answered': answered, 'correct': right, 'wrong': answered - right}
+        for question_id, (answered, right) in sorted(by_question.items())
+    ], ['question_id'], increment_columns=['answered', 'correct', 'wrong'])
+
+def _update_streak(user_id, today):
+    # 在数据库内原子更新连续天数：今天已交过卷不变，昨天交过则+1，否则重新从1开始
+    # best_streak放在SET的第一位：MySQL按顺序求值，此时读到的还是旧的current_streak/last_active_date
+    streak = case(
+        (UserStats.last_active_date == today, UserStats.current_streak),
+        (UserStats.last_active_date == today - timedelta(days=1), UserStats.current_streak + 1),
+        else_=1,
+    )
+    db.session.execute(
+        db.update(UserStats).where(UserStats.user_id == user_id).ordered_values(
+            (UserStats.best_streak, case((streak > UserStats.best_streak, streak), else_=UserStats.best_streak)),
+            (UserStats.current_streak, streak),
+            (UserStats.last_active_date, today),
+        ).execution_options(synchronize_session=False)
+    )
+
+def _accuracy(correct, answered):
+    return round(correct / answered, 4) if answered else None
+
+def get_user_dashboard(user_id, now=None):
+    """
+    统计页数据（固定4次查询：汇总行、各题型、我错得最多的题、全站错得最多的题）
+    :return: 可直接转为JSON的字典
+    """
+    today = (now or datetime.utcnow()).date()
+    stats = db.session.get(UserStats, user_id)
+    type_stats = {row.question_type: row for row in UserTypeStats.query.filter_by(user_id=user_id)}
+    most_missed = db.session.query(WrongQuestion, Question).join(
+        Question, Question.id == WrongQuestion.question_id
+    ).filter(WrongQuestion.user_id == user_id).order_by(
+        WrongQuestion.wrong_count.desc(), WrongQuestion.id.desc()
+    ).limit(MOST_MISSED_LIMIT).all()
+    hardest = db.session.query(QuestionStats, Question).join(
+        Question, Question.id == QuestionStats.question_id
+    ).order_by(QuestionStats.wrong.desc(), QuestionStats.question_id.desc()).limit(MOST_MISSED_LIMIT).all()
+
+    # 最近一次交卷早于昨天时，连续天数已中断
+    active = stats is not None and stats.last_active_date is not None and stats.last_active_date >= today - timedelta(days=1)
+    return {
+        'attempts': stats.attempts if stats else 0,
+        'answered': stats.answered if stats else 0,
+        'correct': stats.correct if stats else 0,
+        'accuracy': _accuracy(stats.correct, stats.answered) if stats else None,
+        'score_total': stats.score_total if stats else 0,
+        'current_streak': stats.current_streak if active else 0,
+        'best_streak': stats.best_streak if stats else 0,
+        'last_active_date': stats.last_active_date.isoformat() if stats and stats.last_active_date else None,
+        'by_type': [{
+            'question_type': question_type,
+            'answered': type_stats[question_type].answered if question_type in type_stats else 0,
+            'correct': type_stats[question_type].correct if question_type in type_stats else 0,
+            'accuracy': _accuracy(type_stats[question_type].correct, type_stats[question_type].answered)
+            if question_type in type_stats else None,
+        } for question_type in QUESTION_TYPES],
+        'most_missed': [{
+            'question': question.to_dict(),
+            'wrong_count': wq.wrong_count,
+            'last_wrong_time': wq.last_wrong_time.isoformat() if wq.last_wrong_time else None,
+        } for wq, question in most_missed],
+        'hardest_questions': [{
+            'question': question.to_dict(),
+            'answered': qs.answered,
+            'wrong': qs.wrong,
+            'accuracy': _accuracy(qs.correct, qs.answered),
+        } for qs, question in hardest],
+    }
@@ -0,0 +1,75 @@
+import json5
+
+class QuestionStreamParser:
+    """
+    增量解析LLM流式输出的JSON，每凑齐一个完整的题目对象就立即返回
+    支持 {"questions": [{...}, ...]} 和直接输出的 [{...}, ...] 两种格式，
+    输出被截断时已解析出的题目不受影响
+    """
+
+    def __init__(self):
+        self._buffer = []        # 当前正在收集的对象文本
+        self._depth = 0          # 当前括号嵌套深度（{和[都计入）
+        self._object_depth = None  # 正在收集的对象开始时的深度，None表示未在收集
+        self._quote = None       # 当前所在字符串的引号，None表示不在字符串内
+        self._escape = False
+        self._comment = False    # JSON5的//行注释
+        self._slash = False
+        self.failures = 0        # 无法解析的题目对象数
+
+    def feed(self, text):
+        """
+        输入一段新文本
+        :return: 本段文本中新完成的题目字典列表
+        """
+        completed = []
+        for ch in text:
+            if self._object_depth is not None:
+                self._buffer.append(ch)
+
+            if self._comment:
+                if ch == '\n':
+                    self._comment = False
+                continue
+            if self._quote:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == self._quote:
+                    self._quote = None
+                continue
+
+            if ch == '/' and self._slash:
+                self._comment = True
+                self._slash = False
+                continue
+            self._slash = ch == '/'
+
+            if ch in '"\'':
+                self._quote = ch
+            elif ch in '{[':
+                # 最外层之内的第一层对象才是题目（最外层对象是{"questions": ...}）
+                if ch == '{' and self._object_depth is None and self._depth >= 1:
+                    self._object_depth = self._depth
+                    self._buffer = [ch]
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if ch == '}' and self._object_depth == self._depth:
+                    question = self._parse(''.join(self._buffer))
+                    if question is not None:
+                        completed.append(question)
+                    else:
+                        self.failures += 1
+                    self._object_depth = None
+                    self._buffer = []
+        return completed
+
+    @staticmethod
+    def _parse(text):
+        try:
+            obj = json5.loads(text)
+        except ValueError:
+            return None
+        return obj if isinstance(obj, dict) else None
\ No newline at end of file
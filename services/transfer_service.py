@@ -0,0 +1,182 @@
+from datetime import datetime
+from config import Config
+from models import db
+from models.question import Question, RAND_KEY_MAX
+from models.question_fingerprint import QuestionFingerprint
+from services.dedup_service import question_simhash, fingerprint_row, find_duplicate
+from services.question_service import validate_question
+from services.search_service import add_documents_to_search_index
+from sqlalchemy import bindparam, func
+import codecs
+import json
+import random
+
+# 题库批量导入导出（JSONL，每行一道题，字段与LLM输出一致：type/content/options/correct_answer，另含评分和来源）
+# 导出：按ID键集分页逐批查询，生成器逐批输出，内存占用与题库大小无关
+# 导入：逐行读取校验，每IMPORT_BATCH_SIZE道用一条executemany插入并提交，再为这批题目批量写入指纹和检索索引；
+# 中途失败时已提交的批次保留，返回结果中的imported为已入库的题目数
+
+MAX_LINE_BYTES = 1024 * 1024  # 单行上限，超长的行跳过（不整行读入内存）
+MAX_ERRORS = 20  # 返回结果中最多保留的出错行
+
+# ---------------------- 导出 ----------------------
+def _export_dict(row):
+    return {
+        'id': row.id,
+        'type': row.question_type,
+        'content': row.content,
+        'options': json.loads(row.options) if row.options else [],
+        'correct_answer': row.correct_answer,
+        'score_sum': float(row.score_sum),
+        'score_count': row.score_count,
+        'source_material': row.source_material,
+        'create_time': row.create_time.isoformat() if row.create_time else None,
+    }
+
+def iter_questions_jsonl(question_type='', creator_id=None, include_duplicates=False, batch_size=None):
+    """
+    逐批导出题库为JSONL（生成器，每次返回一批题目拼成的字符串），按ID升序
+    :param include_duplicates: 是否包含被标记为近似重复的题目
+    """
+    batch_size = batch_size or Config.EXPORT_BATCH_SIZE
+    columns = (Question.id, Question.question_type, Question.content, Question.options, Question.correct_answer,
+               Question.score_sum, Question.score_count, Question.source_material, Question.create_time)
+    last_id = 0
+    while True:
+        query = db.select(*columns).where(Question.id > last_id)
+        if question_type:
+            query = query.where(Question.question_type == question_type)
+        if creator_id:
+            query = query.where(Question.creator_id == creator_id)
+        if not include_duplicates:
+            query = query.where(Question.duplicate_of.is_(None))
+        rows = db.session.execute(query.order_by(Question.id).limit(batch_size)).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield ''.join(json.dumps(_export_dict(row), ensure_ascii=False) + '\n' for row in rows)
+
+# ---------------------- 导入 ----------------------
+def _iter_lines(stream):
+    """逐行读取二进制流，返回(行号, 行内容)；超长的行内容为None"""
+    line_no = 0
+    while True:
+        line = stream.readline(MAX_LINE_BYTES + 1)
+        if not line:
+            return
+        line_no += 1
+        if line_no == 1 and line.startswith(codecs.BOM_UTF8):
+            line = line[len(codecs.BOM_UTF8):]
+        if len(line) > MAX_LINE_BYTES:
+            while line and not line.endswith(b'\n'):  # 丢弃该行剩余部分
+                line = stream.readline(MAX_LINE_BYTES)
+            yield line_no, None
+        elif line.strip():
+            yield line_no, line
+
+def _import_row(line, creator_id):
+    """把一行JSON转为questions表的一行；不合法时抛出ValueError（说明原因）"""
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'JSON格式错误（{e.msg}，第{e.colno}列）')
+    if not isinstance(item, dict):
+        raise ValueError('不是JSON对象')
+    q = validate_question(dict(item, type=item.get('type') or item.get('question_type')))
+    if q is None:
+        raise ValueError('题型、题干、选项或答案不合法')
+
+    score_count = item.get('score_count', 1)
+    score_sum = item.get('score_sum', 3.0 * score_count if isinstance(score_count, int) else None)
+    if (not isinstance(score_count, int) or isinstance(score_count, bool) or score_count < 1
+            or not isinstance(score_sum, (int, float)) or not score_count <= score_sum <= 5 * score_count):
+        raise ValueError('评分数据不合法（score_count为正整数，score_sum在1～5倍score_count之间）')
+
+    create_time = datetime.utcnow()
+    if item.get('create_time'):
+        create_time = datetime.fromisoformat(str(item['create_time']))
+    material = item.get('source_material')
+    material = str(material) if material else None
+    if material and len(material) > 500:
+        material = material[:500] + "..."
+    return {
+        'question_type': q['type'],
+        'content': q['content'],
+        'options': json.dumps(q['options'], ensure_ascii=False) if 'options' in q else None,
+        'correct_answer': q['correct_answer'],
+        'source_material': material,
+        'creator_id': creator_id,
+        'score': round(score_sum / score_count, 1),
+        'score_sum': score_sum,
+        'score_count': score_count,
+        'create_time': create_time,
+        'rand_key': random.randrange(RAND_KEY_MAX),
+    }
+
+def _insert_batch(rows, creator_id, dedupe):
+    """
+    插入一批题目并写入指纹/检索索引，然后提交
+    :return: 标记为近似重复的题目数
+    """
+    before = db.session.execute(db.select(func.max(Question.id))).scalar() or 0
+    db.session.execute(Question.__table__.insert(), rows)
+    # MySQL不支持RETURNING：按ID范围取回刚插入的题目；同一用户同时生成的题目也可能被取到（多于本批时），
+    # 它们可能已有指纹，先查出来跳过；检索索引是INSERT OR REPLACE，重复写入无副作用
+    inserted = db.session.execute(
+        db.select(Question.id, Question.question_type, Question.content, Question.options, Question.correct_answer)
+        .where(Question.id > before, Question.creator_id == creator_id).order_by(Question.id)
+    ).all()
+
+    simhashes, documents = [], []
+    for row in inserted:
+        options = json.loads(row.options) if row.options else []
+        simhashes.append((row.id, row.question_type, question_simhash(row.content, options)))
+        documents.append((row.id, row.content, options, row.correct_answer))
+    indexed = {row[0] for row in db.session.execute(db.select(QuestionFingerprint.question_id).where(
+        QuestionFingerprint.question_id.in_([item[0] for item in simhashes])))} if len(simhashes) > len(rows) else set()
+    db.session.execute(QuestionFingerprint.__table__.insert(),
+                       [fingerprint_row(*item) for item in simhashes if item[0] not in indexed])
+    add_documents_to_search_index(documents)
+
+    duplicates = []
+    if dedupe:
+        # 与更早的题目（含本批中ID更小的）近似重复的标记duplicate_of，与dedupe-questions命令一致
+        for question_id, question_type, simhash in simhashes:
+            duplicate_id = find_duplicate(question_type, simhash, before_id=question_id)
+            if duplicate_id is not None:
+                duplicates.append({'question_id': question_id, 'duplicate_id': duplicate_id})
+        if duplicates:
+            table = Question.__table__
+            db.session.execute(table.update().where(table.c.id == bindparam('question_id'))
+                               .values(duplicate_of=bindparam('duplicate_id')), duplicates)
+    db.session.commit()
+    return len(duplicates)
+
+def import_questions_jsonl(stream, creator_id, batch_size=None, dedupe=False):
+    """
+    从JSONL批量导入题目（创建者为creator_id），每batch_size道插入并提交一次
+    :param stream: 二进制文件对象（UTF-8，每行一个JSON对象，格式同导出）
+    :param dedupe: 是否把与题库中已有题目近似重复的标记为重复（每道题多一次指纹查询）
+    :return: {'imported': 入库数, 'duplicates': 标记为重复数, 'skipped': 不合法而跳过的行数, 'errors': 前MAX_ERRORS个出错行的说明}
+    """
+    batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+    result = {'imported': 0, 'duplicates': 0, 'skipped': 0, 'errors': []}
+    batch = []
+    for line_no, line in _iter_lines(stream):
+        try:
+            if line is None:
+                raise ValueError(f'行过长（超过{MAX_LINE_BYTES // 1024}KB）')
+            batch.append(_import_row(line, creator_id))
+        except ValueError as e:  # 包括JSON格式错误、编码错误、时间格式错误
+            result['skipped'] += 1
+            if len(result['errors']) < MAX_ERRORS:
+                result['errors'].append(f'第{line_no}行：{e}')
+            continue
+        if len(batch) >= batch_size:
+            result['duplicates'] += _insert_batch(batch, creator_id, dedupe)
+            result['imported'] += len(batch)
+            batch = []
+    if batch:
+        result['duplicates'] += _insert_batch(batch, creator_id, dedupe)
+        result['imported'] += len(batch)
+    return result
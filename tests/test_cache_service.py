@@ -0,0 +1,25 @@
+import unittest
+from unittest import mock
+
+from config import Config
+from services import cache_service
+from services.cache_service import LRUCache
+
+class LRUCacheTest(unittest.TestCase):
+    def test_entries_expire_with_their_own_ttl(self):
+        cache = LRUCache(10, ttl=60)
+        with mock.patch.object(cache_service.time, 'monotonic', return_value=1000.0) as monotonic:
+            cache.set('default', 1)
+            cache.set('short', 2, 5)
+            monotonic.return_value = 1010.0
+            self.assertEqual(cache.get('default'), 1)
+            self.assertIsNone(cache.get('short'))
+            monotonic.return_value = 1061.0
+            self.assertIsNone(cache.get('default'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_llm_memory_tier_follows_cache_ttl(self):
+        self.assertEqual(cache_service._memory_cache.ttl, Config.LLM_CACHE_TTL)
+
+if __name__ == '__main__':
+    unittest.main()
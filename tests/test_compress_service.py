@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+
+from config import Config
+from services.compress_service import estimate_tokens, prepare_material, strip_boilerplate
+
+def _textbook(chapters=12):
+    # 每章一个标题和几段互不重复的内容，整体远超一块的字符数和token预算
+    parts = []
+    for c in range(1, chapters + 1):
+        parts.append(f'第{c}章 知识点{c}')
+        for p in range(6):
+            parts.append(''.join(f'第{c}章第{p}段第{s}句讲解概念{c * 100 + p * 10 + s}的定义、性质和应用。' for s in range(8)))
+    return '\n\n'.join(parts)
+
+class PrepareMaterialTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(Config, LLM_CHUNK_CHARS=3000, MATERIAL_TOKEN_BUDGET=600,
+                                      MATERIAL_TOKENS_PER_QUESTION=100, MATERIAL_STRIP_BOILERPLATE=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_budget_applies_per_chunk(self):
+        material = _textbook()
+        self.assertGreater(estimate_tokens(material), Config.MATERIAL_TOKEN_BUDGET * 3)
+
+        tasks, report = prepare_material(material, 10)
+        self.assertGreater(len(tasks), 1)
+        self.assertEqual(report['chunks'], len(tasks))
+        self.assertEqual(sum(count for _, count in tasks), 10)
+        self.assertTrue(report['compressed'])
+        for chunk, count in tasks:
+            self.assertLessEqual(estimate_tokens(chunk), max(Config.MATERIAL_TOKEN_BUDGET, count * 100))
+        # 后面的章节仍然发送（压缩不丢掉覆盖面）
+        self.assertIn('第12章', tasks[-1][0])
+        self.assertEqual(report['prompt_tokens'], sum(estimate_tokens(chunk) for chunk, _ in tasks))
+
+    def test_no_compression_without_budget(self):
+        material = _textbook(3)
+        with mock.patch.object(Config, 'MATERIAL_TOKEN_BUDGET', 0):
+            tasks, report = prepare_material(material, 5)
+        self.assertFalse(report['compressed'])
+        self.assertEqual(''.join(chunk for chunk, _ in tasks).count('讲解概念'), 3 * 6 * 8)
+
+    def test_boilerplate_only_material_has_no_tasks(self):
+        material = '\n'.join(f'第 {i} 页 / 共 40 页' for i in range(1, 41))
+        tasks, report = prepare_material(material, 5)
+        self.assertEqual(tasks, [])
+        self.assertEqual(report['prompt_tokens'], 0)
+
+class StripBoilerplateTest(unittest.TestCase):
+    def test_keeps_bare_numbers_outside_page_boundaries(self):
+        text = '新中国成立于\n1949\n比例\n3/4\n正文一段内容。\n\f12\n第二页正文\n- 13 -\n第 3 页 / 共 40 页'
+        self.assertEqual(strip_boilerplate(text), '新中国成立于\n1949\n比例\n3/4\n正文一段内容。\n第二页正文')
+
+if __name__ == '__main__':
+    unittest.main()
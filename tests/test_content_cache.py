@@ -0,0 +1,40 @@
+from collections import OrderedDict
+import unittest
+from unittest import mock
+
+from config import Config
+from services import content_cache
+from services.cache_service import LRUCache
+
+class LocalVersionsTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(content_cache, _local=LRUCache(100), _local_versions=OrderedDict(),
+                                      _version_seq=0, _version_floor=0, _shared=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(Config, 'CONTENT_CACHE_SIZE', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.contents = {}
+
+    def _read(self, key):
+        return content_cache._read_through([key], lambda keys: {k: self.contents[k] for k in keys})[key]
+
+    def test_versions_are_bounded_and_dropped_keys_stay_invalidated(self):
+        self.contents['question:1'] = {'content': 'old'}
+        self.assertEqual(self._read('question:1'), {'content': 'old'})
+
+        self.contents['question:1'] = {'content': 'new'}
+        content_cache.invalidate_questions([1])
+        self.assertEqual(self._read('question:1'), {'content': 'new'})
+
+        content_cache.invalidate_questions(range(2, 10))  # 把question:1的版本号挤出去
+        self.assertLessEqual(len(content_cache._local_versions), Config.CONTENT_CACHE_SIZE)
+        self.assertNotIn('question:1', content_cache._local_versions)
+
+        self.contents['question:1'] = {'content': 'newer'}
+        self.assertEqual(self._read('question:1'), {'content': 'newer'})  # 不会读到丢弃前的旧条目
+        self.assertEqual(self._read('question:1'), {'content': 'newer'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from reportlab import __file__ as _reportlab_file
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+import config
+from config import Config
+
+flask_app = db = None
+_tmp = None
+_patchers = []
+
+def setUpModule():
+    # 独立的SQLite库和导出缓存目录；导出任务和分册渲染都在请求线程中执行
+    global flask_app, db, _tmp
+    _tmp = tempfile.mkdtemp()
+    os.environ.setdefault('LLM_API_KEY', 'sk-test')
+    uri = 'sqlite:///' + os.path.join(_tmp, 'test.db')
+    _patchers.extend([
+        mock.patch.dict(os.environ, {'APP_CONFIG': 'sqlite'}),
+        mock.patch.object(config.config['sqlite'], 'SQLALCHEMY_DATABASE_URI', uri),
+        mock.patch.multiple(Config, PDF_WORKERS=0, EXPORT_JOB_WORKERS=0, PDF_BATCH_SIZE=2,
+                            EXPORT_CACHE_DIR=os.path.join(_tmp, 'exports')),
+    ])
+    for patcher in _patchers:
+        patcher.start()
+    if 'SimHei' not in pdfmetrics.getRegisteredFontNames():
+        # 测试环境没有static/font/SimHei.ttf，用reportlab自带字体代替
+        vera = os.path.join(os.path.dirname(_reportlab_file), 'fonts', 'Vera.ttf')
+        pdfmetrics.registerFont(TTFont('SimHei', vera))
+
+    import app as app_module
+    from migrations import upgrade
+    from models import db as _db
+    flask_app, db = app_module.app, _db
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False,
+                            SQLALCHEMY_DATABASE_URI=uri, PDF_BATCH_SIZE=2)
+    with flask_app.app_context():
+        db.create_all()
+        upgrade()
+
+def tearDownModule():
+    for patcher in reversed(_patchers):
+        patcher.stop()
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+class ExportWrongTest(unittest.TestCase):
+    def setUp(self):
+        from models.question import Question
+        from models.user import User
+        from models.wrong_question import WrongQuestion
+        with flask_app.app_context():
+            user = User(username=f'user{self.id()[-8:]}')
+            user.set_password('secret')
+            db.session.add(user)
+            db.session.flush()
+            for i, qtype in enumerate(['single_choice', 'single_choice', 'fill_blank']):
+                question = Question(question_type=qtype, content=f'Question {i}', correct_answer='A',
+                                    options='["A. 1", "B. 2"]' if qtype == 'single_choice' else None,
+                                    creator_id=user.id)
+                db.session.add(question)
+                db.session.flush()
+                db.session.add(WrongQuestion(user_id=user.id, question_id=question.id))
+            db.session.commit()
+            self.user_id = user.id
+        self.client = flask_app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+
+    def test_large_export_runs_as_job_and_downloads_zip(self):
+        response = self.client.get('/export/wrong')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/export/job/', response.headers['Location'])
+
+        page = self.client.get(response.headers['Location'])
+        self.assertEqual(page.status_code, 200)
+        self.assertIn('/download', page.get_data(as_text=True))
+
+        job_id = int(response.headers['Location'].rstrip('/').rsplit('/', 1)[1])
+        status = self.client.get(f'/api/export/job/{job_id}').get_json()
+        self.assertEqual(status['status'], 'succeeded')
+        self.assertEqual(status['suffix'], '.zip')
+
+        download = self.client.get(f'/export/job/{job_id}/download')
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download.mimetype, 'application/zip')
+        self.assertIn('.zip', download.headers['Content-Disposition'])
+        with zipfile.ZipFile(io.BytesIO(download.get_data())) as archive:
+            names = archive.namelist()
+            self.assertEqual(names, ['错题本_第1册.pdf', '错题本_第2册.pdf'])
+            for name in names:
+                self.assertTrue(archive.read(name).startswith(b'%PDF'))
+
+        # 渲染结果已进入导出缓存：再次导出直接下载同一个zip
+        again = self.client.get('/export/wrong')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.mimetype, 'application/zip')
+        self.assertEqual(again.get_data(), download.get_data())
+
+    def test_small_export_returns_pdf_directly(self):
+        response = self.client.get('/export/wrong?type=fill_blank')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/pdf')
+        self.assertTrue(response.get_data().startswith(b'%PDF'))
+
+    def test_job_of_other_user_is_not_found(self):
+        from models.export_job import ExportJob
+        from models.user import User
+        self.client.get('/export/wrong')
+        with flask_app.app_context():
+            job_id = ExportJob.query.filter_by(user_id=self.user_id).first().id
+            other = User(username=f'other{self.user_id}')
+            other.set_password('secret')
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(other_id)
+        self.assertEqual(self.client.get(f'/export/job/{job_id}').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
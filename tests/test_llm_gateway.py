@@ -0,0 +1,103 @@
+from concurrent.futures import Future
+import time
+import types
+import unittest
+from unittest import mock
+
+from config import Config
+from services import llm_gateway
+from services.llm_gateway import Backend, CircuitBreaker, LLMGateway, LLMUnavailable
+
+class _Completions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return types.SimpleNamespace(choices=[])
+
+def _backend(name='primary'):
+    backend = Backend(name, 'http://127.0.0.1:1/v1', 'sk-test', 'test-model', 'openai')
+    completions = _Completions()
+    backend._client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    return backend, completions
+
+def _open(breaker):
+    # 打开熔断器并让冷却期已经过去
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+    breaker._opened_at -= breaker.cooldown + 1
+
+class BreakerProbeTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(Config, LLM_HEDGE_AFTER=0, LLM_MAX_RETRIES=0, LLM_TIMEOUT=0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rate_limit_timeout_does_not_consume_probe(self):
+        backend, completions = _backend()
+        gateway = LLMGateway([backend])
+        _open(backend.breaker)
+
+        with mock.patch.object(gateway._bucket, 'acquire', return_value=False):
+            with self.assertRaisesRegex(LLMUnavailable, '限流'):
+                gateway.chat([], 0.7)
+        self.assertEqual(backend.breaker.state, 'open')
+
+        gateway.chat([], 0.7)  # 试探请求仍在，发出后熔断器关闭
+        self.assertEqual(completions.calls, 1)
+        self.assertEqual(backend.breaker.state, 'closed')
+
+    def test_hedge_without_permit_does_not_consume_probe(self):
+        primary, _ = _backend('primary')
+        second, completions = _backend('second')
+        gateway = LLMGateway([primary, second])
+        _open(second.breaker)
+
+        with mock.patch.object(gateway._semaphore, 'acquire', return_value=False):
+            future = Future()
+            future.set_result('primary')
+            pool = types.SimpleNamespace(submit=lambda *args: future)
+            # 第一个请求超过LLM_HEDGE_AFTER仍未返回，但拿不到对冲所需的并发名额
+            with mock.patch.object(Config, 'LLM_HEDGE_AFTER', 0.01), \
+                    mock.patch.object(gateway, '_get_hedge_pool', return_value=pool), \
+                    mock.patch.object(llm_gateway, 'wait', return_value=(set(), {future})):
+                self.assertEqual(gateway._attempt_hedged(primary, {}, False), 'primary')
+        self.assertEqual(second.breaker.state, 'open')
+        self.assertTrue(second.breaker.allow())
+        self.assertEqual(completions.calls, 0)
+
+    def test_hedge_finishing_with_primary_is_discarded(self):
+        primary, _ = _backend('primary')
+        second, _ = _backend('second')
+        gateway = LLMGateway([primary, second])
+        futures = []
+        for name in ('primary', 'second'):
+            future = Future()
+            future.set_result((name, None, mock.Mock()))
+            futures.append(future)
+        submitted = iter(futures)
+        pool = types.SimpleNamespace(submit=lambda *args: next(submitted))
+        waits = [(set(), set(futures[:1])), (set(futures), set())]  # 两个请求在同一轮wait里一起返回
+
+        permits = gateway._semaphore._value
+        with mock.patch.object(Config, 'LLM_HEDGE_AFTER', 0.01), \
+                mock.patch.object(gateway, '_get_hedge_pool', return_value=pool), \
+                mock.patch.object(llm_gateway, 'wait', side_effect=lambda *args, **kwargs: waits.pop(0)):
+            winner = gateway._attempt_hedged(primary, {}, True)
+        loser = next(f.result() for f in futures if f.result() is not winner)
+        loser[2].close.assert_called_once_with()
+        winner[2].close.assert_not_called()
+        self.assertEqual(gateway._semaphore._value, permits)
+
+    def test_unreported_probe_times_out(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0.05, probe_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # 试探请求进行中
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())  # 试探请求一直没有结果，再放行一个
+
+if __name__ == '__main__':
+    unittest.main()